@@ -0,0 +1,247 @@
+# answer_similarity.py
+"""Text similarity between a dictated transcript and a case's expected answer.
+
+Local and network-free: texts become hashed character n-gram vectors (3- to
+5-grams inside words, like scikit-learn's ``char_wb`` analyzer, hashed into
+``2**dim_bits`` buckets), weighted by sublinear tf and an IDF fitted on the
+case catalog.  Character n-grams tolerate what dictation does to words
+(plurals, "enhancing"/"enhancement", split compounds) without a stemmer.
+
+Per case, ``compile`` vectorizes the expected answer and every rubric item
+once into a ``CompiledTarget`` (NumPy arrays of tf weights; IDF is applied at
+scoring time, so refitting the IDF never invalidates targets).  Scoring a
+transcript returns:
+
+* ``similarity``: cosine between transcript and expected answer.
+* ``rubric``: per rubric item, the IDF-weighted share of the item's n-grams
+  that occur in the transcript.  Cosine against a long transcript would
+  penalise a short item for everything else the trainee said, so items use
+  coverage instead.
+
+``vectorize`` hashes a whole batch of texts with array operations (a
+polynomial rolling hash over the concatenated UTF-8 bytes), and
+``score_many`` groups transcripts by case and scores each group with one
+matrix product, so regrading thousands of attempts never loops over n-grams
+in Python.
+"""
+import hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_PRIME = 16777619  # FNV 32-bit prime, as the rolling hash multiplier
+_MIX = (0x85ebca6b, 0xc2b2ae35)  # murmur3 fmix32 constants
+
+
+def _word_bytes():
+    # ASCII letters and digits; bytes of multi-byte UTF-8 characters count as
+    # letters, so accented words keep their n-grams
+    table = np.zeros(256, dtype=bool)
+    for c in b"abcdefghijklmnopqrstuvwxyz0123456789":
+        table[c] = True
+    table[128:] = True
+    return table
+
+_WORD_BYTE = _word_bytes()
+
+
+def target_hash(answer: str, rubric: Iterable[str]) -> str:
+    parts = [answer or ""] + [r for r in rubric or () if isinstance(r, str)]
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+
+class CompiledTarget:
+    """Expected answer (row 0) and rubric items (rows 1..) of one case, over the
+    sorted n-gram buckets ``cols`` the case uses."""
+    __slots__ = ("items", "hash", "cols", "rows", "pos", "tf")
+
+    def __init__(self, items: List[str], hash: str, cols, rows, pos, tf):
+        self.items = items
+        self.hash = hash
+        self.cols = cols  # int64 buckets, sorted
+        self.rows = rows  # per entry: 0 = answer, i = rubric item i - 1
+        self.pos = pos    # per entry: index into cols
+        self.tf = tf      # per entry: 1 + log(count)
+
+
+class SimilarityEngine:
+    def __init__(self, dim_bits: int = 18, ngrams: Tuple[int, int] = (3, 5), max_entries: int = 2048):
+        self.dim_bits = dim_bits
+        self.mask = (1 << dim_bits) - 1
+        self.ngrams = ngrams
+        self.max_entries = max_entries
+        self.idf = np.ones(1 << dim_bits, dtype=np.float32)
+        self.fitted_docs = 0
+        self._by_case: "OrderedDict[str, CompiledTarget]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"compiled": 0, "hits": 0, "scored": 0, "fits": 0}
+
+    # ---- vectors -----------------------------------------------------------
+    def vectorize(self, texts: Sequence[str]):
+        """Hashed n-gram counts of every text, CSR-style:
+        ``(indptr, buckets, tf)`` with row i in ``indptr[i]:indptr[i+1]``,
+        buckets sorted within a row and tf = 1 + log(count)."""
+        step = 1 << (32 - self.dim_bits)  # texts per chunk, so (text, bucket) keys fit in 32 bits
+        if len(texts) <= step:
+            return self._vectorize(texts)
+        parts = [self._vectorize(texts[i:i + step]) for i in range(0, len(texts), step)]
+        offsets = np.cumsum([0] + [len(p[1]) for p in parts[:-1]])
+        indptr = np.concatenate([parts[0][0]] + [p[0][1:] + off for p, off in zip(parts[1:], offsets[1:])])
+        return indptr, np.concatenate([p[1] for p in parts]), np.concatenate([p[2] for p in parts])
+
+    def _vectorize(self, texts: Sequence[str]):
+        m = len(texts)
+        encoded = [(" " + (t or "").lower() + " ").encode("utf-8") for t in texts]
+        lens = np.fromiter(map(len, encoded), dtype=np.int64, count=m)
+        raw = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        word = _WORD_BYTE[raw]
+        buf = np.where(word, raw, 32).astype(np.uint32)
+        row = np.repeat(np.arange(m, dtype=np.uint32) << np.uint32(self.dim_bits), lens)
+        # Every text is space-padded, so a window with only word bytes strictly
+        # inside (the char_wb rule) never spans two texts.  Rolling hash: after
+        # step n, h[p] covers bytes p..p+n-1, for every position p at once.
+        lo, hi = self.ngrams
+        total = len(buf)
+        h = buf
+        inside = np.ones(total, dtype=bool)
+        keys = []
+        for n in range(2, hi + 1):
+            h = h[:-1] * np.uint32(_PRIME) ^ buf[n - 1:]
+            inside = inside[:-1] & word[n - 2:total - 1] if n > 2 else inside[:-1]
+            if n < lo:
+                continue
+            g = h ^ (h >> np.uint32(16))
+            g *= np.uint32(_MIX[0])
+            g ^= g >> np.uint32(13)
+            g *= np.uint32(_MIX[1])
+            g ^= g >> np.uint32(16)
+            g &= np.uint32(self.mask)
+            g |= row[:len(g)]
+            keys.append(g[inside])
+        keys = np.concatenate(keys) if keys else np.empty(0, np.uint32)
+        keys.sort()
+        first = np.empty(len(keys), dtype=bool)
+        first[:1] = True
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        starts = np.flatnonzero(first)
+        counts = np.diff(np.append(starts, len(keys)))
+        keys = keys[starts]
+        indptr = np.searchsorted(keys >> np.uint32(self.dim_bits), np.arange(m + 1, dtype=np.uint32))
+        return indptr, (keys & np.uint32(self.mask)).astype(np.int64), (1.0 + np.log(counts)).astype(np.float32)
+
+    def fit(self, documents: Iterable[str], chunk: int = 1000):
+        """Smoothed IDF over ``documents`` (one text per case): log((1+N)/(1+df)) + 1."""
+        df = np.zeros(1 << self.dim_bits, dtype=np.int64)
+        n = 0
+        batch: List[str] = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= chunk:
+                df += np.bincount(self.vectorize(batch)[1], minlength=len(df))
+                n += len(batch)
+                batch = []
+        if batch:
+            df += np.bincount(self.vectorize(batch)[1], minlength=len(df))
+            n += len(batch)
+        self.idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        self.fitted_docs = n
+        self.stats["fits"] += 1
+
+    # ---- targets -----------------------------------------------------------
+    def _build(self, answer: str, rubric: List[str]) -> CompiledTarget:
+        items = [r for r in (rubric or []) if isinstance(r, str)]
+        indptr, buckets, tf = self.vectorize([answer or ""] + items)
+        rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+        cols, pos = np.unique(buckets, return_inverse=True)
+        return CompiledTarget(items, target_hash(answer, items), cols, rows, pos, tf)
+
+    def compile(self, case_id: str, answer: str, rubric: List[str]) -> CompiledTarget:
+        """(Re)compile ``case_id``'s answer and rubric; called when a case is written."""
+        compiled = self._build(answer, rubric)
+        with self._lock:
+            self._by_case[case_id] = compiled
+            self._by_case.move_to_end(case_id)
+            while len(self._by_case) > self.max_entries:
+                self._by_case.popitem(last=False)
+            self.stats["compiled"] += 1
+        return compiled
+
+    def get(self, case_id: str, answer: str, rubric: List[str]) -> CompiledTarget:
+        """Compiled target for ``case_id``, recompiled if the texts changed."""
+        with self._lock:
+            hit = self._by_case.get(case_id)
+            if hit is not None and hit.hash == target_hash(answer, rubric):
+                self._by_case.move_to_end(case_id)
+                self.stats["hits"] += 1
+                return hit
+        return self.compile(case_id, answer, rubric)
+
+    def forget(self, case_id: str):
+        with self._lock:
+            self._by_case.pop(case_id, None)
+
+    # ---- scoring -----------------------------------------------------------
+    def _score_group(self, target: CompiledTarget, qrow, qcol, qw, qnorm) -> Tuple[Any, Any]:
+        """Answer cosine (m,) and rubric coverage (m, items) for m transcripts
+        whose weighted entries are (qrow, qcol, qw)."""
+        idf = self.idf
+        nrows = len(target.items) + 1
+        w = np.zeros((nrows, len(target.cols)), dtype=np.float32)
+        w[target.rows, target.pos] = target.tf * idf[target.cols[target.pos]]
+        q = np.zeros((len(qnorm), len(target.cols)), dtype=np.float32)
+        hit = np.searchsorted(target.cols, qcol)
+        hit[hit == len(target.cols)] = 0
+        found = target.cols[hit] == qcol if len(target.cols) else np.zeros(len(qcol), bool)
+        q[qrow[found], hit[found]] = qw[found]
+        answer = w[0]
+        an = float(np.sqrt(answer @ answer))
+        cos = (q @ answer) / np.maximum(qnorm * an, 1e-12) if an else np.zeros(len(qnorm), np.float32)
+        items = w[1:] ** 2
+        mass = items.sum(axis=1)
+        cover = ((q > 0).astype(np.float32) @ items.T) / np.maximum(mass, 1e-12)
+        return np.clip(cos, 0.0, 1.0), np.clip(cover, 0.0, 1.0)
+
+    def score_many(self, jobs: Sequence[Tuple[str, str, List[str], str]]) -> List[Dict[str, Any]]:
+        """Score ``(case_id, answer, rubric, transcript)`` jobs; results in job order."""
+        if not jobs:
+            return []
+        targets: Dict[str, CompiledTarget] = {}
+        for cid, answer, rubric, _ in jobs:
+            if cid not in targets:
+                targets[cid] = self.get(cid, answer, rubric)
+        indptr, buckets, tf = self.vectorize([t for *_, t in jobs])
+        weights = tf * self.idf[buckets]
+        row_of = np.repeat(np.arange(len(jobs)), np.diff(indptr))
+        qnorm = np.sqrt(np.bincount(row_of, weights=weights.astype(np.float64) ** 2, minlength=len(jobs)))
+        # transcripts grouped by case, entries of each group contiguous
+        case_ids = list(targets)
+        if len(case_ids) == 1:
+            groups = [(case_ids[0], np.arange(len(jobs)), row_of, slice(None))]
+        else:
+            slot = {cid: g for g, cid in enumerate(case_ids)}
+            group = np.fromiter((slot[j[0]] for j in jobs), dtype=np.int64, count=len(jobs))
+            order = np.argsort(group, kind="stable")
+            bounds = np.searchsorted(group[order], np.arange(len(case_ids) + 1))
+            local = np.empty(len(jobs), dtype=np.int64)  # rank of each transcript within its group
+            local[order] = np.arange(len(jobs)) - bounds[group[order]]
+            entry_order = np.argsort(group[row_of], kind="stable")
+            entry_bounds = np.searchsorted(group[row_of][entry_order], np.arange(len(case_ids) + 1))
+            groups = [(cid, order[bounds[g]:bounds[g + 1]], local[row_of[ent]], ent)
+                      for g, cid in enumerate(case_ids)
+                      for ent in (entry_order[entry_bounds[g]:entry_bounds[g + 1]],)]
+        out: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        for cid, members, qrow, ent in groups:
+            cos, cover = self._score_group(targets[cid], qrow, buckets[ent], weights[ent], qnorm[members])
+            for j, c, items in zip(members.tolist(), cos.astype(np.float64).round(4).tolist(),
+                                    cover.astype(np.float64).round(4).tolist()):
+                out[j] = {"similarity": c, "rubric": items}
+        self.stats["scored"] += len(jobs)
+        return out
+
+    def score(self, case_id: str, answer: str, rubric: List[str], transcript: str) -> Dict[str, Any]:
+        return self.score_many([(case_id, answer, rubric, transcript)])[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"cases": len(self._by_case), "dims": 1 << self.dim_bits, "ngrams": list(self.ngrams),
+                "fitted_docs": self.fitted_docs, **self.stats}
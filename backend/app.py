@@ -1,39 +1,97 @@
 # app.py
-import os, time, json, re
+import os, sys, time, json, re, copy, tempfile, hashlib, asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any, Literal
+from typing import List, Optional, Dict, Any, Literal, Tuple
 
 from fastapi import FastAPI, HTTPException, Depends, Query, Request, Header, UploadFile, File, Form
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import RedirectResponse, Response
-from pydantic import BaseModel, EmailStr, Field
-from passlib.context import CryptContext
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 from jose import jwt, JWTError
 
 import logging
 log = logging.getLogger("uvicorn.error")
 
+# Sibling modules are imported by name whether the app is started as
+# `backend.app:app` (Docker) or as `app:app` from inside backend/.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from case_catalog import CaseCatalog, project
+from case_search import SearchIndex
+from case_store import CaseStore, CaseExists
+from llm_gateway import LLMGateway
+from feedback_stream import SectionTracker, sse
+from llm_cache import LLMCache, cache_key
+from s3_signer import UrlSigner
+from media_uploader import MediaUploader
+from image_derivatives import ImageDeriver
+from media_cache import MediaCache
+from password_hasher import PasswordHasher, PoolBusy
+from token_auth import RevocationList, VerifiedTokens
+from metrics import Metrics, MetricsMiddleware, instrument_botocore
+from profiler import ProfilerMiddleware, RequestProfiler
+from mongo_indexes import INDEXES, ensure_indexes, explain_queries
+from rubric_grader import RubricGrader
+from answer_similarity import SimilarityEngine
+from generation_jobs import FileJobStore, JobRunner, MongoJobStore
+from concept_engine import ConceptEngine
+
 # -----------------------------
 # Optional Mongo support
 # -----------------------------
 USE_MONGO = bool(os.getenv("MONGO_URI"))
 if USE_MONGO:
     import motor.motor_asyncio
+    from pymongo import ReturnDocument
     mongo_client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI"))
     db = mongo_client.get_default_database()
 else:
     _users: Dict[str, Dict[str, Any]] = {}
     _attempts: Dict[str, List[Dict[str, Any]]] = {}
+    _rollups: Dict[str, Dict[str, Any]] = {}
+
+# -----------------------------
+# Metrics
+# -----------------------------
+# Prometheus text at /api/metrics.  With METRICS_DIR set, every uvicorn worker
+# writes its numbers there (every METRICS_FLUSH_SEC) and any worker's scrape
+# reports the sum over all of them.
+metrics = Metrics(directory=os.getenv("METRICS_DIR") or None,
+                  flush_every=float(os.getenv("METRICS_FLUSH_SEC", "5")))
+metrics.histogram("llm_request_duration_seconds", "LLM call latency, retries included", ("model", "op", "outcome"))
+metrics.counter("llm_tokens_total", "LLM tokens used", ("model", "kind"))
+
+def _observe_llm(op: str, model: str, outcome: str, seconds: float, usage: Any):
+    metrics.observe("llm_request_duration_seconds", (model, op, outcome), seconds)
+    for kind in ("prompt", "completion"):
+        n = getattr(usage, f"{kind}_tokens", None) if usage is not None else None
+        if n:
+            metrics.inc("llm_tokens_total", (model, kind), n)
 
 # -----------------------------
 # OpenAI (optional)
 # -----------------------------
-try:
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-except Exception:
-    openai_client = None
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Async, bounded, retrying client shared by every LLM route of this worker.
+llm = LLMGateway(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    model=OPENAI_MODEL,
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    timeout=float(os.getenv("LLM_TIMEOUT_SEC", "60")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+    stream_usage=os.getenv("LLM_STREAM_USAGE", "1") != "0",
+)
+llm.observe = _observe_llm
+# Results of the admin generate-mcqs / generate-rubric routes, keyed by prompt.
+llm_cache = LLMCache(
+    ttl=float(os.getenv("LLM_CACHE_TTL_SEC", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+    disk_dir=None if USE_MONGO else os.getenv("LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "board-review-llm-cache")),
+    disk_max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    mongo_collection=db.llm_cache if USE_MONGO else None,
+)
 
 # -----------------------------
 # AWS S3 (optional)
@@ -44,6 +102,44 @@ AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 # Support both S3_BUCKET_NAME (local .env) and S3_BUCKET (AWS App Runner)
 S3_BUCKET = os.getenv("S3_BUCKET_NAME") or os.getenv("S3_BUCKET")
 s3_client = boto3.client("s3", region_name=AWS_REGION, config=BotoConfig(signature_version="s3v4"))
+instrument_botocore(s3_client, metrics, "s3_request_duration_seconds", "s3")
+# Reuses presigned GET URLs until S3_SIGN_REFRESH_FRACTION of their lifetime has passed.
+s3_signer = UrlSigner(
+    s3_client, S3_BUCKET,
+    expires=int(os.getenv("S3_SIGN_TTL_SEC", "3600")),
+    refresh_fraction=float(os.getenv("S3_SIGN_REFRESH_FRACTION", "0.5")),
+)
+# Uploads run in thread pools (never on the event loop); files above one part go
+# up as parallel multipart uploads, UPLOAD_CONCURRENCY parts in flight per file.
+uploader = MediaUploader(
+    s3_client, S3_BUCKET,
+    part_size=int(os.getenv("UPLOAD_PART_MB", "8")) * 1024 * 1024,
+    concurrency=int(os.getenv("UPLOAD_CONCURRENCY", "4")),
+    max_uploads=int(os.getenv("UPLOAD_MAX_ACTIVE", "4")),
+    max_parts=int(os.getenv("UPLOAD_PART_WORKERS", "16")),
+)
+# Local media cache/proxy: with MEDIA_CACHE_DIR set, signed case URLs point at
+# /api/media/<key> (served from a bounded LRU disk cache filled from S3) instead
+# of presigned S3 URLs. MEDIA_ACCEL_PREFIX hands the file to nginx
+# (X-Accel-Redirect to an internal location aliased to MEDIA_CACHE_DIR).
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "")
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "")
+MEDIA_PUBLIC_BASE = os.getenv("MEDIA_PUBLIC_BASE", "/api/media/")
+media_cache = MediaCache(
+    s3_client, S3_BUCKET, MEDIA_CACHE_DIR,
+    max_bytes=int(os.getenv("MEDIA_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+    secret=os.getenv("MEDIA_URL_SECRET") or os.getenv("JWT_SECRET", "dev-secret-change-me"),
+) if MEDIA_CACHE_DIR and S3_BUCKET else None
+if media_cache is not None:
+    s3_signer.proxy = lambda key, expires: media_cache.sign(key, expires, base=MEDIA_PUBLIC_BASE)
+# Thumbnail + display renditions of uploaded images, rendered in a process pool
+# (needs Pillow; IMAGE_DERIVE_WORKERS=0 turns it off).
+image_deriver = ImageDeriver(
+    s3_client, S3_BUCKET,
+    workers=int(os.getenv("IMAGE_DERIVE_WORKERS", "2")),
+    thumb_px=int(os.getenv("IMAGE_THUMB_PX", "256")),
+    display_px=int(os.getenv("IMAGE_DISPLAY_PX", "1600")),
+)
 
 # -----------------------------
 # Auth / Security
@@ -57,22 +153,53 @@ ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split("
 AUTH_MODE = os.getenv("AUTH_MODE", "jwt").lower().replace("_", "")
 API_KEY = os.getenv("API_KEY", "")
 
-# Password hashing
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
-def hash_pw(p: str) -> str: return pwd_ctx.hash(p)
-def verify_pw(p: str, h: str) -> bool: return pwd_ctx.verify(p, h)
+# Password hashing: bcrypt runs in a small process pool (PASSWORD_HASH_WORKERS),
+# never on the event loop.  Raising BCRYPT_ROUNDS rehashes users as they log in.
+passwords = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")),
+)
+pwd_ctx = passwords.context
+
+async def hash_pw(p: str) -> str:
+    try:
+        return await passwords.hash(p)
+    except PoolBusy:
+        raise HTTPException(503, "Too many sign-ins in progress, retry shortly", headers={"Retry-After": "2"})
+
+async def verify_pw(p: str, h: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(matches, upgraded hash or None); one bcrypt computation per call."""
+    try:
+        return await passwords.verify(p, h)
+    except PoolBusy:
+        raise HTTPException(503, "Too many sign-ins in progress, retry shortly", headers={"Retry-After": "2"})
+
+# Verified tokens are cached until their exp; "revoke sessions" cutoffs are shared
+# by all workers (Mongo or REVOCATIONS_FILE) and seen within REVOCATION_REFRESH_SEC.
+verified_tokens = VerifiedTokens(max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")))
+revocations = RevocationList(
+    token_ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    path=None if USE_MONGO else os.getenv("REVOCATIONS_FILE", os.path.join(tempfile.gettempdir(), "board-review-revocations.json")),
+    mongo_collection=db.revocations if USE_MONGO else None,
+    refresh_every=float(os.getenv("REVOCATION_REFRESH_SEC", "5")),
+)
 
 def create_access_token(sub: str) -> str:
-    payload = {"sub": sub, "exp": datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}
+    now = datetime.now(timezone.utc)
+    # Sub-second iat, so a login right after "revoke sessions" is not caught by the cutoff
+    payload = {"sub": sub, "iat": now.timestamp(), "exp": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}
     return jwt.encode(payload, SECRET, algorithm=ALGO)
 
-def _decode_jwt(token: str) -> str:
+def _decode_jwt(token: str) -> Tuple[str, float, float]:
+    """(sub, iat, exp) of a validly signed, unexpired token; iat is 0 for tokens issued without one"""
     try:
         data = jwt.decode(token, SECRET, algorithms=[ALGO])
         sub = data.get("sub")
         if not sub:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return sub
+        exp = data.get("exp")
+        return sub, float(data.get("iat") or 0), float(exp) if exp is not None else time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
@@ -92,7 +219,14 @@ async def current_identity(request: Request, x_api_key: str = Header(default=Non
     if not auth or not auth.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
     token = auth.split(" ", 1)[1]
-    return _decode_jwt(token)
+    claims = verified_tokens.get(token)
+    if claims is None:
+        claims = _decode_jwt(token)
+        verified_tokens.put(token, claims)
+    sub, iat, _ = claims
+    if await revocations.is_revoked(sub, iat):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return sub
 
 def require_admin(email_or_identity: str):
     if ADMIN_EMAILS:
@@ -104,7 +238,39 @@ def require_admin(email_or_identity: str):
 # -----------------------------
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Oral Boards Trainer API", version="0.3")
+async def _metrics_flush_loop():
+    while True:
+        await asyncio.sleep(metrics.flush_every)
+        try:
+            await asyncio.to_thread(metrics.flush)
+        except Exception as e:
+            log.warning("Metrics flush failed: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown for the worker"""
+    if USE_MONGO and os.getenv("MONGO_ENSURE_INDEXES", "1") != "0":
+        made = await ensure_indexes(db)
+        log.info("Mongo indexes ensured: %s", ", ".join(made))
+    app.state.metrics_flush = asyncio.create_task(_metrics_flush_loop()) if metrics.directory else None
+    if os.getenv("JOBS_RUNNER", "1") != "0":
+        job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        if app.state.metrics_flush is not None:
+            app.state.metrics_flush.cancel()
+            try:
+                await app.state.metrics_flush
+            except asyncio.CancelledError:
+                pass
+        image_deriver.shutdown()
+        passwords.shutdown()
+        if metrics.directory:
+            metrics.flush()
+
+app = FastAPI(title="Oral Boards Trainer API", version="0.3", lifespan=lifespan)
 
 _raw_origins = os.getenv("CORS_ORIGIN", "http://localhost:8080")
 _allow_origins = [o.strip() for o in _raw_origins.split(",") if o.strip()]
@@ -115,21 +281,73 @@ app.add_middleware(
     allow_origins=_allow_origins,
     allow_credentials=_allow_credentials,
     allow_methods=["*"],
-    allow_headers=["Content-Type", "Authorization", "X-API-KEY", "x-api-key"],
+    allow_headers=["Content-Type", "Authorization", "X-API-KEY", "x-api-key", "X-Profile"],
+    expose_headers=["X-Next-After", "X-Cache", "ETag", "X-Profile-Id"],
 )
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    log.info(
-        ">>> %s %s origin=%s ACRM=%s ACRH=%s",
-        request.method, request.url.path,
-        request.headers.get("origin"),
-        request.headers.get("access-control-request-method"),
-        request.headers.get("access-control-request-headers"),
-    )
-    resp = await call_next(request)
-    log.info("<<< %s %s %s", request.method, request.url.path, resp.status_code)
-    return resp
+# Compress JSON bodies over COMPRESS_MIN_BYTES; brotli when brotli-asgi is
+# installed and the client accepts br, gzip otherwise. SSE is never buffered and
+# media (already-compressed images/video, Range responses) is passed through.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_EXCLUDED = [r"^/api/feedback/stream", r"^/api/media"]
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True,
+                       excluded_handlers=COMPRESS_EXCLUDED)
+except ImportError:
+    from fastapi.middleware.gzip import GZipMiddleware
+    try:
+        from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
+        _gzip_options = {"exclude_content_types": DEFAULT_EXCLUDED_CONTENT_TYPES + ("image/*", "video/*")}
+    except ImportError:  # older Starlette: only the path exclusions apply
+        _gzip_options = {}
+
+    class _GZip(GZipMiddleware):
+        """GZipMiddleware that skips the COMPRESS_EXCLUDED paths like brotli-asgi does"""
+        _skip = re.compile("|".join(COMPRESS_EXCLUDED))
+
+        def __init__(self, app, **kw):
+            super().__init__(app, **kw)
+            self._inner = app
+
+        async def __call__(self, scope, receive, send):
+            if scope["type"] == "http" and self._skip.match(scope["path"]):
+                return await self._inner(scope, receive, send)
+            await super().__call__(scope, receive, send)
+
+    app.add_middleware(_GZip, minimum_size=COMPRESS_MIN_BYTES, **_gzip_options)
+
+# Per-route latency/status/in-flight metrics; one access-log line for a
+# REQUEST_LOG_SAMPLE fraction of requests, plus every 5xx and slow request.
+app.add_middleware(
+    MetricsMiddleware, metrics=metrics, routes_of=app,
+    log_sample=float(os.getenv("REQUEST_LOG_SAMPLE", "0.01")),
+    slow_ms=float(os.getenv("REQUEST_LOG_SLOW_MS", "1000")),
+)
+
+# Request profiling: admins send "X-Profile: 1" to profile one request (the
+# response's X-Profile-Id names it under /api/admin/profiles); PROFILE_SAMPLE_RATE
+# > 0 also profiles that fraction of all requests and keeps the
+# PROFILE_KEEP_SLOWEST slowest per route.  HTML flame graphs with pyinstrument
+# installed, cProfile pstats without.
+profiler = RequestProfiler(
+    os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "board-review-profiles")),
+    engine=os.getenv("PROFILER", "auto"),
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    keep_slowest=int(os.getenv("PROFILE_KEEP_SLOWEST", "5")),
+    keep_recent=int(os.getenv("PROFILE_KEEP_RECENT", "50")),
+)
+
+async def _profile_caller(scope) -> Optional[str]:
+    request = Request(scope)
+    try:
+        identity = await current_identity(request, request.headers.get("x-api-key"))
+        require_admin(identity)
+    except HTTPException:
+        return None  # the header is ignored for everyone else
+    return identity
+
+app.add_middleware(ProfilerMiddleware, profiler=profiler, authorize=_profile_caller)
 
 @app.get("/", include_in_schema=False)
 def root(): return RedirectResponse("/docs")
@@ -236,6 +454,17 @@ class FeedbackOut(BaseModel):
     feedback: str
     score: Dict[str, Any] = {}
 
+class GradeIn(BaseModel):
+    caseId: str
+    transcript: str = ""
+
+class GradeBatchIn(BaseModel):
+    items: List[GradeIn]
+
+class ConceptsIn(BaseModel):
+    text: str
+    ids: Optional[List[str]] = None
+
 class ChatTurn(BaseModel):
     role: Literal["user", "assistant"]
     content: str = ""
@@ -285,6 +514,10 @@ class MediaItem(BaseModel):
     autoplay: Optional[bool] = False
     loop: Optional[bool] = False
     muted: Optional[bool] = False
+    thumb: Optional[str] = None    # downscaled renditions of an image src
+    display: Optional[str] = None
+    width: Optional[int] = None    # of the original
+    height: Optional[int] = None
 
 class MCQChoice(BaseModel):
     id: str
@@ -325,6 +558,7 @@ class Case(BaseModel):
     references: Optional[List[str]] = []
     mcqs: Optional[MCQSpec] = None
     differential: Optional[Differential] = None
+    answerBlocks: Optional[Dict[str, Any]] = None  # derived from expectedAnswer on write
     
     # MongoDB metadata fields (optional) - added to fix 500 error
     created_at: Optional[int] = None
@@ -349,19 +583,108 @@ async def get_user(email: str) -> Optional[Dict[str, Any]]:
     return _users.get(email)
 
 async def create_user(email: str, password: str):
-    record = {"email": email, "password_hash": hash_pw(password), "createdAt": int(time.time()*1000)}
+    record = {"email": email, "password_hash": await hash_pw(password), "createdAt": int(time.time()*1000)}
     if USE_MONGO:
         await db.users.insert_one(record)
     else:
         _users[email] = record
 
+async def update_password_hash(email: str, old_hash: str, new_hash: str):
+    # Conditional on the old hash so a concurrent password change wins
+    if USE_MONGO:
+        await db.users.update_one({"email": email, "password_hash": old_hash},
+                                  {"$set": {"password_hash": new_hash}})
+    else:
+        user = _users.get(email)
+        if user and user.get("password_hash") == old_hash:
+            user["password_hash"] = new_hash
+
+# Per-user progress rollups: one document per user with running sums per
+# subspecialty, kept current on every attempt so /api/progress never rescans
+# the attempt history.
+#   {"user", "count", "lastTs", "cases": [caseId...],
+#    "per": {<key>: {"name", "attempts", "simSum", "hits", "total"}}}
+def _rollup_key(sub: str) -> str:
+    # Mongo field names may not contain '.' or start with '$'
+    return (sub or "Unknown").replace(".", "\uff0e").replace("$", "\uff04")
+
+def _rollup_add(doc: Dict[str, Any], a: Dict[str, Any]):
+    sub = a.get("subspecialty", "Unknown")
+    p = doc.setdefault("per", {}).setdefault(_rollup_key(sub), {"name": sub, "attempts": 0, "simSum": 0.0, "hits": 0, "total": 0})
+    p["attempts"] += 1
+    p["simSum"]   += a.get("similarity", 0.0)
+    p["hits"]     += a.get("rubricHit", 0)
+    p["total"]    += a.get("rubricTotal", 0)
+    doc["count"] = doc.get("count", 0) + 1
+    doc["lastTs"] = max(doc.get("lastTs", 0), a.get("ts", 0))
+    cases = doc.setdefault("cases", [])
+    if a.get("caseId") not in cases:
+        cases.append(a.get("caseId"))
+
 async def insert_attempt(identity: str, a: Dict[str, Any]):
     a["user"] = identity
     a["ts"] = int(time.time()*1000)
     if USE_MONGO:
         await db.attempts.insert_one(a)
+        k = "per." + _rollup_key(a.get("subspecialty", "Unknown"))
+        await db.progress_rollups.update_one({"user": identity}, {
+            "$inc": {"count": 1, f"{k}.attempts": 1, f"{k}.simSum": a.get("similarity", 0.0),
+                     f"{k}.hits": a.get("rubricHit", 0), f"{k}.total": a.get("rubricTotal", 0)},
+            "$set": {f"{k}.name": a.get("subspecialty", "Unknown")},
+            "$max": {"lastTs": a["ts"]},
+            "$addToSet": {"cases": a.get("caseId")},
+        }, upsert=True)
     else:
         _attempts.setdefault(identity, []).append(a)
+        _rollup_add(_rollups.setdefault(identity, {"user": identity}), a)
+
+async def get_rollup(identity: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    if USE_MONGO:
+        proj = {f: 1 for f in fields} if fields else {}
+        proj["_id"] = 0
+        doc = await db.progress_rollups.find_one({"user": identity}, proj)
+        return doc or {"user": identity}
+    return _rollups.get(identity) or {"user": identity}
+
+async def rebuild_rollups(identity: Optional[str] = None) -> int:
+    """Recompute rollups from stored attempts (all users, or one); returns users rebuilt."""
+    if USE_MONGO:
+        match = {"user": identity} if identity else {}
+        docs: Dict[str, Dict[str, Any]] = {}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"user": "$user", "sub": {"$ifNull": ["$subspecialty", "Unknown"]}},
+                "attempts": {"$sum": 1},
+                "simSum": {"$sum": {"$ifNull": ["$similarity", 0]}},
+                "hits": {"$sum": {"$ifNull": ["$rubricHit", 0]}},
+                "total": {"$sum": {"$ifNull": ["$rubricTotal", 0]}},
+                "lastTs": {"$max": "$ts"},
+                "cases": {"$addToSet": "$caseId"},
+            }},
+        ]
+        async for g in db.attempts.aggregate(pipeline, allowDiskUse=True):
+            user, sub = g["_id"]["user"], g["_id"]["sub"]
+            d = docs.setdefault(user, {"user": user, "count": 0, "lastTs": 0, "cases": [], "per": {}})
+            d["per"][_rollup_key(sub)] = {"name": sub, "attempts": g["attempts"], "simSum": g["simSum"],
+                                          "hits": g["hits"], "total": g["total"]}
+            d["count"] += g["attempts"]
+            d["lastTs"] = max(d["lastTs"], g["lastTs"] or 0)
+            d["cases"] = list(dict.fromkeys(d["cases"] + g["cases"]))
+        if identity:
+            await db.progress_rollups.delete_many({"user": identity})
+        else:
+            await db.progress_rollups.delete_many({})
+        if docs:
+            await db.progress_rollups.insert_many(list(docs.values()))
+        return len(docs)
+    users = [identity] if identity else list(_attempts)
+    for u in users:
+        doc: Dict[str, Any] = {"user": u}
+        for a in _attempts.get(u, []):
+            _rollup_add(doc, a)
+        _rollups[u] = doc
+    return len(users)
 
 async def list_attempts(identity: str) -> List[Dict[str, Any]]:
     if USE_MONGO:
@@ -371,52 +694,123 @@ async def list_attempts(identity: str) -> List[Dict[str, Any]]:
 async def clear_attempts(identity: str):
     if USE_MONGO:
         await db.attempts.delete_many({"user": identity})
+        await db.progress_rollups.delete_one({"user": identity})
     else:
         _attempts[identity] = []
+        _rollups.pop(identity, None)
 
 CASES_PATH = os.getenv("CASES_JSON", os.path.join(os.path.dirname(__file__), "../frontend/data/cases.json"))
 
-def _read_cases_file() -> List[Dict[str, Any]]:
-    try:
-        with open(CASES_PATH, "r") as f:
-            return json.load(f)
-    except Exception:
-        return []
+# BM25 index behind /api/cases/search.  The file catalog feeds it every change
+# (this worker's writes and the others' journal entries); with Mongo the case
+# routes update it and _search_ready() resyncs after other workers' writes.
+search_index = SearchIndex()
+# Parsed, indexed view of CASES_PATH shared by all read routes of this worker.
+_catalog = CaseCatalog(CASES_PATH, check_interval=float(os.getenv("CASES_STAT_INTERVAL", "0.5")),
+                       search=None if USE_MONGO else search_index)
+# Journaled writer: single-case changes are fsync'd appends, folded into
+# CASES_PATH every CASES_COMPACT_EVERY entries.
+_store = CaseStore(
+    _catalog,
+    compact_every=int(os.getenv("CASES_COMPACT_EVERY", "1000")),
+    fsync=os.getenv("CASES_FSYNC", "1") != "0",
+)
+
+# -----------------------------
+# Conditional GET
+# -----------------------------
+# ETags come from cheap version stamps (catalog state, per-user rollup count and
+# last ts), so a matching If-None-Match is answered with 304 before any case or
+# attempt bodies are read.
+async def _cases_changed() -> Optional[int]:
+    """Bump the Mongo catalog version after any write to db.cases; returns the new version"""
+    if USE_MONGO:
+        doc = await db.meta.find_one_and_update({"_id": "cases"}, {"$inc": {"version": 1}},
+                                                upsert=True, return_document=ReturnDocument.AFTER)
+        return doc["version"]
+    return None
 
-def _write_cases_file(items: List[Dict[str, Any]]):
-    os.makedirs(os.path.dirname(CASES_PATH), exist_ok=True)
-    with open(CASES_PATH, "w") as f:
-        json.dump(items, f, indent=2)
+async def _cases_version() -> str:
+    if USE_MONGO:
+        doc = await db.meta.find_one({"_id": "cases"})
+        return str((doc or {}).get("version", 0))
+    return _catalog.etag_token()
+
+async def _progress_version(identity: str) -> str:
+    doc = await get_rollup(identity, ["count", "lastTs"])
+    return f"{identity}:{doc.get('count', 0)}:{doc.get('lastTs', 0)}"
+
+def _not_modified(request: Request, response: Response, *parts: Any) -> Optional[Response]:
+    """Set ETag on ``response``; return a 304 if the client already has it."""
+    etag = '"%s"' % hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:24]
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in (t.strip().removeprefix("W/") for t in inm.split(","))):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Structured answer blocks, parsed once at case-write time and stored on the
+# case as `answerBlocks`; the coach fallback reads them instead of re-parsing.
+#   {"v", "src": hash of expectedAnswer, "diagnosis", "key", "differential",
+#    "management", "needleTokens": [words >= 5 chars of diagnosis + key]}
+ANSWER_BLOCKS_VERSION = 1
+_ANSWER_HEADING_RE = re.compile(r"\b(Diagnosis|Key|Differential|Management)\s*:\s*", re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9]+")
 
 def _split_expected_answer(expected: Optional[str]) -> Dict[str, str]:
     if not expected:
         return {}
     blocks: Dict[str, str] = {}
-    for key in ("Diagnosis", "Key", "Differential", "Management"):
-        m = re.search(
-            rf"{key}\s*:\s*(.+?)(?=(Diagnosis|Key|Differential|Management)\s*:|$)",
-            expected, re.IGNORECASE | re.DOTALL
-        )
-        if m:
-            blocks[key.lower()] = m.group(1).strip()
+    heads = list(_ANSWER_HEADING_RE.finditer(expected))
+    for i, m in enumerate(heads):
+        end = heads[i + 1].start() if i + 1 < len(heads) else len(expected)
+        text = expected[m.end():end].strip()
+        if text:
+            blocks.setdefault(m.group(1).lower(), text)
     return blocks
 
-def _guess_relevant_choices(choices: List[str], expected: Optional[str]) -> List[str]:
-    if not choices or not expected:
-        return []
-    blocks = _split_expected_answer(expected)
+def _answer_hash(expected: Optional[str]) -> str:
+    return hashlib.sha1((expected or "").encode()).hexdigest()[:16]
+
+def _answer_blocks(expected: Optional[str]) -> Dict[str, Any]:
+    blocks: Dict[str, Any] = _split_expected_answer(expected)
     needle = " ".join([blocks.get("diagnosis", ""), blocks.get("key", "")]).lower()
-    words = {w for w in re.findall(r"[a-z0-9]+", needle) if len(w) >= 5}
+    blocks["needleTokens"] = sorted({w for w in _WORD_RE.findall(needle) if len(w) >= 5})
+    blocks["v"] = ANSWER_BLOCKS_VERSION
+    blocks["src"] = _answer_hash(expected)
+    return blocks
+
+def _with_answer_blocks(case: Dict[str, Any]) -> Dict[str, Any]:
+    case["answerBlocks"] = _answer_blocks(case.get("expectedAnswer"))
+    return case
+
+async def _case_answer_blocks(case_id: Optional[str], expected: Optional[str]) -> Dict[str, Any]:
+    """Stored blocks for the case, unless missing, outdated or for a different expectedAnswer"""
+    ab = None
+    if case_id:
+        if USE_MONGO:
+            doc = await db.cases.find_one({"id": case_id}, {"_id": 0, "answerBlocks": 1})
+            ab = (doc or {}).get("answerBlocks")
+        else:
+            ab = (_catalog.get(case_id) or {}).get("answerBlocks")
+    if ab and ab.get("v") == ANSWER_BLOCKS_VERSION and (expected is None or ab.get("src") == _answer_hash(expected)):
+        return ab
+    return _answer_blocks(expected)
+
+def _guess_relevant_choices(choices: List[str], needle_tokens: List[str]) -> List[str]:
+    if not choices or not needle_tokens:
+        return []
+    words = set(needle_tokens)
     scored = []
     for ch in choices:
-        cw = set(re.findall(r"[a-z0-9]+", ch.lower()))
+        cw = set(_WORD_RE.findall(ch.lower()))
         overlap = len(cw & words)
         scored.append((overlap, ch))
     scored.sort(reverse=True)
     return [c for s, c in scored if s > 0][:2]
 
-def _build_coach_reply(req: "MCQChatRequest") -> str:
-    blocks = _split_expected_answer(req.expectedAnswer)
+def _build_coach_reply(req: "MCQChatRequest", blocks: Dict[str, Any]) -> str:
     diag  = blocks.get("diagnosis")
     keys  = blocks.get("key")
     mgmt  = blocks.get("management")
@@ -435,7 +829,7 @@ def _build_coach_reply(req: "MCQChatRequest") -> str:
         lines.append(f"**Close differential:** {diff}")
 
     if req.choices:
-        best = _guess_relevant_choices(req.choices, req.expectedAnswer)
+        best = _guess_relevant_choices(req.choices, blocks.get("needleTokens") or [])
         if best:
             lines.append(f"**Choices that fit the pattern:** {', '.join(best)}")
     if req.selected:
@@ -458,17 +852,9 @@ def health():
 async def register(body: UserCreate):
     if await get_user(body.email):
         raise HTTPException(400, "User already exists")
-    
-    log.info(f"=== REGISTER DEBUG ===")
-    log.info(f"Email: {body.email}")
-    log.info(f"Password length: {len(body.password)}")
 
     await create_user(body.email, body.password)
-    
-    user_check = await get_user(body.email)
-    log.info(f"User created and verified: {user_check is not None}")
-    if user_check:
-        log.info(f"Hash starts with: {user_check.get('password_hash', '')[:20]}...")
+    log.info("Registered %s", body.email)
 
     token = create_access_token(body.email)
     return TokenOut(access_token=token)
@@ -478,85 +864,219 @@ async def login(form: OAuth2PasswordRequestForm = Depends()):
     email = form.username
     user = await get_user(email)
 
-    log.info(f"=== LOGIN DEBUG ===")
-    log.info(f"Email: {email}")
-    log.info(f"Password length: {len(form.password)}")
-    log.info(f"User found: {user is not None}")
-
-    if user:
-        log.info(f"Stored hash exists: {bool(user.get('password_hash'))}")
-        log.info(f"Hash starts with: {user.get('password_hash', '')[:20]}...")
-        
-        try:
-            password_match = verify_pw(form.password, user["password_hash"])
-            log.info(f"Password verification result: {password_match}")
-        except Exception as e:
-            log.error(f"Password verification error: {e}")
-            password_match = False
-    else:
-        log.info("User not found in database")
-
-    if not user or not verify_pw(form.password, user["password_hash"]):
-        log.info("Login failed - returning 401")
+    stored = user.get("password_hash") if user else None
+    ok, new_hash = await verify_pw(form.password, stored)
+    if not ok:
+        log.info("Login failed for %s (%s)", email, "bad password" if user else "unknown user")
         raise HTTPException(401, "Invalid credentials")
-    
+    if new_hash:
+        await update_password_hash(email, stored, new_hash)
+        log.info("Password hash for %s upgraded to current parameters", email)
+
     token = create_access_token(email)
     log.info("Login successful - returning token")
     return TokenOut(access_token=token)
 
+# Scrapers send "Authorization: Bearer $METRICS_TOKEN"; admins can read it with
+# their own credentials. METRICS_PUBLIC=1 opens it to anyone (trusted networks only).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0") == "1"
+
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request, authorization: str = Header(default=None),
+                             x_api_key: str = Header(default=None)):
+    """Prometheus text format, summed over all workers (see METRICS_DIR)"""
+    if not METRICS_PUBLIC and not (METRICS_TOKEN and authorization == f"Bearer {METRICS_TOKEN}"):
+        require_admin(await current_identity(request, x_api_key))
+    body = await asyncio.to_thread(metrics.render)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/me")
 async def me(identity: str = Depends(current_identity)):
     return {"identity": identity, "isAdmin": (not ADMIN_EMAILS) or (identity.lower() in ADMIN_EMAILS)}
 
+# Fields never sent to examinees
+EXAM_HIDDEN_FIELDS = ("expectedAnswer", "rubric", "answerBlocks")
+CASES_PAGE_MAX = int(os.getenv("CASES_PAGE_MAX", "1000"))
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """`fields=id,title,...` -> list of field names (always including id), or None for all"""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    if any(n.startswith("$") or n == "_id" for n in names):
+        raise HTTPException(400, "Invalid fields")
+    return ["id"] + [n for n in names if n != "id"]
+
+def _mongo_projection(fields: Optional[List[str]], hidden=()) -> Dict[str, int]:
+    # Mongo can't mix inclusion and exclusion, so hidden fields are dropped from an inclusion list
+    if fields is not None:
+        proj = {f: 1 for f in fields if f not in hidden}
+    else:
+        proj = {f: 0 for f in hidden}
+    proj["_id"] = 0
+    return proj
+
+def _page_response(response: Response, items: List[Dict[str, Any]], next_after: Optional[str]):
+    if next_after:
+        response.headers["X-Next-After"] = next_after
+    return items
+
+async def _mongo_page(query: Dict[str, Any], proj: Dict[str, Any], limit: Optional[int], sort):
+    cur = db.cases.find(query, proj).sort(sort)
+    if limit:
+        items = await cur.limit(limit + 1).to_list(length=limit + 1)
+        if len(items) > limit:
+            return items[:limit], items[limit - 1].get("id")
+        return items, None
+    return await cur.to_list(length=None), None
+
 # @app.get("/api/cases", response_model=List[Case])
 @app.get("/api/cases")
-async def list_cases(examMode: bool = False,
+async def list_cases(request: Request, response: Response,
+                     examMode: bool = False,
                      include_deleted: bool = Query(default=False),
+                     limit: Optional[int] = Query(None, ge=1, le=CASES_PAGE_MAX),
+                     after: Optional[str] = Query(None, description="Return cases with id after this one"),
+                     fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
                      identity: str = Depends(current_identity)
                      ):
+    """Cases sorted by id. With `limit`, the next page's cursor is sent in X-Next-After."""
+    fl = _parse_fields(fields)
+    hit = _not_modified(request, response, "cases", await _cases_version(), request.url.query)
+    if hit:
+        return hit
+    hidden = EXAM_HIDDEN_FIELDS if examMode else ()
     if USE_MONGO:
         query = {}
         if not include_deleted:
             query["deleted"] = {"$ne": True}
-        cur = db.cases.find(query, {"_id": 0})
-        items = await cur.to_list(length=100000)
+        if after:
+            query["id"] = {"$gt": after}
+        items, nxt = await _mongo_page(query, _mongo_projection(fl, hidden), limit, [("id", 1)])
     else:
-        items = _read_cases_file()
-        if not include_deleted:
-            items = [item for item in items if not item.get("deleted")]
-    items.sort(key=lambda x: x.get("id",""))
-    if examMode:
-        for it in items:
-            it.pop("expectedAnswer", None)
-            it.pop("rubric", None)
-    return items
+        # Already sorted by id; dicts are shared with the catalog, so projections copy
+        items, nxt = _catalog.listed_page(after=after, limit=limit, include_deleted=include_deleted)
+        if fl is not None or hidden:
+            items = [project(it, fl, hidden) for it in items]
+    return _page_response(response, items, nxt)
 
 @app.get("/api/cases/trash")
-async def get_trash(identity: str = Depends(current_identity)):
+async def get_trash(request: Request, response: Response,
+                    limit: Optional[int] = Query(None, ge=1, le=CASES_PAGE_MAX),
+                    after: Optional[str] = None,
+                    fields: Optional[str] = None,
+                    identity: str = Depends(current_identity)):
     """Get all deleted cases"""
+    fl = _parse_fields(fields)
+    hit = _not_modified(request, response, "trash", await _cases_version(), request.url.query)
+    if hit:
+        return hit
     if USE_MONGO:
         # Find cases where deleted = True
-        cur = db.cases.find({"deleted": True}, {"_id": 0})
-        items = await cur.to_list(length=100000)
+        query = {"deleted": True}
+        if after:
+            query["id"] = {"$gt": after}
+        items, nxt = await _mongo_page(query, _mongo_projection(fl), limit, [("id", 1)])
     else:
-        items = _read_cases_file()
-        items = [item for item in items if item.get("deleted")]
-    
-    items.sort(key=lambda x: x.get("id", ""))
-    return items
+        items, nxt = _catalog.deleted_page(after=after, limit=limit)
+        if fl is not None:
+            items = [project(it, fl) for it in items]
+    return _page_response(response, items, nxt)
+
+# -----------------------------
+# Case search
+# -----------------------------
+SEARCH_LIMIT_MAX = 100
+SEARCH_FIELDS = ["id", "title", "subspecialty", "tags"]
+SEARCH_SYNC_SEC = float(os.getenv("SEARCH_SYNC_SEC", "5"))
+_SEARCH_PROJECTION = {"_id": 0, "id": 1, "title": 1, "tags": 1, "subspecialty": 1, "boardPrompt": 1,
+                      "expectedAnswer": 1, "deleted": 1}
+# Mongo: catalog version the index reflects, when it was last compared, running resync
+_search_state: Dict[str, Any] = {"version": None, "checked": 0.0, "task": None}
+
+async def _search_resync(version: int):
+    cur = db.cases.find({}, _SEARCH_PROJECTION)
+    if not len(search_index):
+        await asyncio.to_thread(search_index.rebuild, await cur.to_list(length=None))
+    else:
+        seen = set()
+        async for doc in cur:
+            search_index.put(doc)  # only changed cases are re-tokenized
+            seen.add(doc["id"])
+            if len(seen) % 500 == 0:
+                await asyncio.sleep(0)
+        search_index.retain(seen)
+    _search_state["version"] = version
+
+async def _search_ready():
+    """Bring the index up to date before a query"""
+    if not USE_MONGO:
+        _catalog.refresh()  # replays other workers' journal entries into the index
+        return
+    st = _search_state
+    now = time.monotonic()
+    if st["version"] is not None and now - st["checked"] < SEARCH_SYNC_SEC:
+        return
+    st["checked"] = now
+    doc = await db.meta.find_one({"_id": "cases"})
+    version = (doc or {}).get("version", 0)
+    if version == st["version"]:
+        return
+    if st["task"] is None or st["task"].done():
+        st["task"] = asyncio.create_task(_search_resync(version))
+    if st["version"] is None:
+        await st["task"]  # first query of this worker waits for the build; later ones use the old index
+
+def _search_wrote(version: Optional[int]):
+    """After this worker's own write (already applied to the index): skip the
+    resync unless another worker wrote in between"""
+    if version is not None and _search_state["version"] == version - 1:
+        _search_state["version"] = version
+
+@app.get("/api/cases/search")
+async def search_cases(q: str = Query("", max_length=200, description="Words; the last one and word* match prefixes"),
+                       subspecialty: Optional[List[str]] = Query(None, description="Repeat for several"),
+                       match: str = Query("all", pattern="^(all|any)$"),
+                       limit: int = Query(20, ge=1, le=SEARCH_LIMIT_MAX),
+                       offset: int = Query(0, ge=0, le=10000),
+                       fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+                       identity: str = Depends(current_identity)):
+    """Ranked full-text search over title, tags, subspecialty, prompt and answer.
+
+    Returns BM25-ranked `items` (with `score`), the `total` match count and
+    subspecialty `facets` counted before the subspecialty filter. An empty `q`
+    lists all cases by id. Deleted cases are never returned.
+    """
+    fl = _parse_fields(fields) or SEARCH_FIELDS
+    await _search_ready()
+    t0 = time.perf_counter()
+    res = search_index.search(q, subspecialty, limit=limit, offset=offset, match_all=match == "all")
+    took = (time.perf_counter() - t0) * 1000
+    ids = [cid for cid, _ in res["hits"]]
+    if USE_MONGO:
+        docs = {d["id"]: d for d in await db.cases.find({"id": {"$in": ids}}, _mongo_projection(fl)).to_list(length=None)}
+    else:
+        docs = {cid: project(_catalog.get(cid) or {}, fl) for cid in ids}
+    items = [{**docs[cid], "score": score} for cid, score in res["hits"] if docs.get(cid)]
+    return {"total": res["total"], "items": items, "facets": {"subspecialty": res["facets"]},
+            "tookMs": round(took, 2)}
 
 
 @app.get("/api/cases/{case_id}", response_model=Case)
-async def get_case(case_id: str):
+async def get_case(case_id: str, request: Request, response: Response):
+    hit = _not_modified(request, response, "case", case_id, await _cases_version())
+    if hit:
+        return hit
     if USE_MONGO:
-        doc = await db.cases.find_one({"id": case_id})
+        doc = await db.cases.find_one({"id": case_id}, {"_id": 0})
         if not doc: raise HTTPException(404, "Not found")
         return doc
     else:
-        for it in _read_cases_file():
-            if it.get("id") == case_id:
-                return it
-        raise HTTPException(404, "Not found")
+        it = _catalog.get(case_id)
+        if it is None:
+            raise HTTPException(404, "Not found")
+        return it
 
 @app.get("/api/cases/{case_id}/signed")
 async def get_case_with_signed_urls(
@@ -577,63 +1097,29 @@ async def get_case_with_signed_urls(
         if '_id' in case:
             del case['_id']
     else:
-        cases = _read_cases_file()
-        case = next((dict(c) for c in cases if c.get("id") == case_id), None)
-        if not case:
+        cached = _catalog.get(case_id)
+        if cached is None:
             raise HTTPException(404, "Not found")
+        # Signing rewrites nested media/reference dicts; keep the cache pristine
+        case = copy.deepcopy(cached)
     
-    # Helper function to generate signed URL
-    def sign_s3_url(url: str) -> str:
-        if not url or S3_BUCKET not in url:
-            return url
-        try:
-            # Extract S3 key from URL
-            # https://cm-boards-cases.s3.amazonaws.com/cases/gi-001/image-1.png
-            # -> cases/gi-001/image-1.png
-            s3_key = url.split(f'{S3_BUCKET}.s3.amazonaws.com/')[-1].split('?')[0]
-            signed_url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': S3_BUCKET, 'Key': s3_key},
-                ExpiresIn=3600  # 1 hour
-            )
-            return signed_url
-        except Exception as e:
-            log.error(f"Failed to sign URL {url}: {e}")
-            return url  # fallback to original
-    
-    # Sign images
-    if case.get('images'):
-        case['images'] = [sign_s3_url(img) for img in case['images']]
-    
-    # Sign videos in media array
-    if case.get('media'):
-        for media in case['media']:
-            if media.get('src'):
-                media['src'] = sign_s3_url(media['src'])
-            if media.get('poster'):
-                media['poster'] = sign_s3_url(media['poster'])
-    
-    # Sign references
-    if case.get('references'):
-        for ref in case['references']:
-            if ref.get('url'):
-                ref['url'] = sign_s3_url(ref['url'])
-    
-    return case
+    # Sign images, media src/poster/thumb/display and references in one batch
+    return s3_signer.sign_case(case)
 
 @app.post("/api/cases", response_model=UpsertResult)
 async def upsert_case(body: Case, identity: str = Depends(current_identity)):
     require_admin(identity)
+    doc = _with_answer_blocks(body.dict())
     if USE_MONGO:
-        await db.cases.update_one({"id": body.id}, {"$set": body.dict()}, upsert=True)
-        return UpsertResult(ok=True, id=body.id)
+        await db.cases.update_one({"id": body.id}, {"$set": doc}, upsert=True)
+        version = await _cases_changed()
+        search_index.put(doc)
+        _search_wrote(version)
     else:
-        items = _read_cases_file()
-        idx = next((i for i,x in enumerate(items) if x.get("id")==body.id), -1)
-        if idx >= 0: items[idx] = body.dict()
-        else: items.append(body.dict())
-        _write_cases_file(items)
-        return UpsertResult(ok=True, id=body.id)
+        await asyncio.to_thread(_store.put, doc)  # flock + fsync stay off the event loop
+    grader.compile(body.id, body.rubric or [])
+    similarity.compile(body.id, body.expectedAnswer or "", body.rubric or [])
+    return UpsertResult(ok=True, id=body.id)
 
 @app.delete("/api/cases/{case_id}")
 async def delete_case(case_id: str, identity: str = Depends(current_identity)):
@@ -648,22 +1134,18 @@ async def delete_case(case_id: str, identity: str = Depends(current_identity)):
             }}
         )
         if result.matched_count == 0: raise HTTPException(404, "Not found")
+        version = await _cases_changed()
+        search_index.set_deleted(case_id, True)
+        _search_wrote(version)
         return {"ok": True, "message": f"Case {case_id} moved to trash"}
     else:
-        items = _read_cases_file()
-        found = False
-        for item in items:
-            if item.get("id") == case_id:
-                item["deleted"] = True
-                item["deletedAt"] = datetime.now(timezone.utc).isoformat()
-                item["deletedBy"] = identity
-                found = True
-                break
-        
-        if not found:
+        item = await asyncio.to_thread(_store.update, case_id, {
+            "deleted": True,
+            "deletedAt": datetime.now(timezone.utc).isoformat(),
+            "deletedBy": identity
+        })
+        if item is None:
             raise HTTPException(404, "Case not found")
-        
-        _write_cases_file(items)
         return {"ok": True, "message": f"Case {case_id} moved to trash"}
     
 @app.post("/api/cases/{case_id}/restore")
@@ -683,23 +1165,15 @@ async def restore_case(case_id: str, identity: str = Depends(current_identity)):
         
         if result.matched_count == 0:
             raise HTTPException(404, "Case not found")
+        version = await _cases_changed()
+        search_index.set_deleted(case_id, False)
+        _search_wrote(version)
         
         return {"ok": True, "message": f"Case {case_id} restored"}
     else:
-        items = _read_cases_file()
-        found = False
-        for item in items:
-            if item.get("id") == case_id:
-                item.pop("deleted", None)
-                item.pop("deletedAt", None)
-                item.pop("deletedBy", None)
-                found = True
-                break
-        
-        if not found:
+        item = await asyncio.to_thread(_store.update, case_id, unset=("deleted", "deletedAt", "deletedBy"))
+        if item is None:
             raise HTTPException(404, "Case not found")
-        
-        _write_cases_file(items)
         return {"ok": True, "message": f"Case {case_id} restored"}
 
 @app.delete("/api/cases/{case_id}/permanent")
@@ -712,17 +1186,18 @@ async def permanently_delete_case(case_id: str, identity: str = Depends(current_
         
         if result.deleted_count == 0:
             raise HTTPException(404, "Case not found")
+        version = await _cases_changed()
+        search_index.remove(case_id)
+        _search_wrote(version)
+        grader.forget(case_id)
+        similarity.forget(case_id)
         
         return {"ok": True, "message": f"Case {case_id} permanently deleted"}
     else:
-        items = _read_cases_file()
-        original_count = len(items)
-        items = [x for x in items if x.get("id") != case_id]
-        
-        if len(items) == original_count:
+        if not await asyncio.to_thread(_store.remove, case_id):
             raise HTTPException(404, "Case not found")
-        
-        _write_cases_file(items)
+        grader.forget(case_id)
+        similarity.forget(case_id)
         return {"ok": True, "message": f"Case {case_id} permanently deleted"}
 
 @app.put("/api/cases/{case_id}")
@@ -741,6 +1216,7 @@ async def update_case(case_id: str, request: Request, identity: str = Depends(cu
                 "subspecialty": body.get("subspecialty"),
                 "boardPrompt": body.get("boardPrompt"),
                 "expectedAnswer": body.get("expectedAnswer"),
+                "answerBlocks": _answer_blocks(body.get("expectedAnswer")),
                 "rubric": body.get("rubric", []),
                 "tags": body.get("tags", []),
                 "images": body.get("images", []),
@@ -752,44 +1228,77 @@ async def update_case(case_id: str, request: Request, identity: str = Depends(cu
         
         if result.matched_count == 0:
             raise HTTPException(404, "Case not found")
+        version = await _cases_changed()
+        grader.compile(case_id, body.get("rubric") or [])
+        similarity.compile(case_id, body.get("expectedAnswer") or "", body.get("rubric") or [])
         
         # Return updated case
         updated_case = await db.cases.find_one({"id": case_id}, {"_id": 0})
+        search_index.put(updated_case)
+        _search_wrote(version)
         return updated_case
     else:
-        items = _read_cases_file()
-        found = False
-        for item in items:
-            if item.get("id") == case_id:
-                item.update({
-                    "title": body.get("title"),
-                    "subspecialty": body.get("subspecialty"),
-                    "boardPrompt": body.get("boardPrompt"),
-                    "expectedAnswer": body.get("expectedAnswer"),
-                    "rubric": body.get("rubric", []),
-                    "tags": body.get("tags", []),
-                    "images": body.get("images", []),
-                    "mcqs": body.get("mcqs"),
-                    "updated_at": int(time.time() * 1000),
-                    "updated_by": identity
-                })
-                found = True
-                break
-        
-        if not found:
+        item = await asyncio.to_thread(_store.update, case_id, {
+            "title": body.get("title"),
+            "subspecialty": body.get("subspecialty"),
+            "boardPrompt": body.get("boardPrompt"),
+            "expectedAnswer": body.get("expectedAnswer"),
+            "answerBlocks": _answer_blocks(body.get("expectedAnswer")),
+            "rubric": body.get("rubric", []),
+            "tags": body.get("tags", []),
+            "images": body.get("images", []),
+            "mcqs": body.get("mcqs"),
+            "updated_at": int(time.time() * 1000),
+            "updated_by": identity
+        })
+        if item is None:
             raise HTTPException(404, "Case not found")
-        
-        _write_cases_file(items)
+        grader.compile(case_id, item.get("rubric") or [])
+        similarity.compile(case_id, item.get("expectedAnswer") or "", item.get("rubric") or [])
         return item
 
-@app.post("/api/cases/{case_id}/generate-mcqs")
-async def generate_mcqs(case_id: str, request: Request, identity: str = Depends(current_identity)):
-    """Generate MCQs for a case using LLM"""
-    require_admin(identity)
-    
-    body = await request.json()
-    
-    # Build prompt for MCQ generation
+async def _generate_json(messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                         force: bool, response: Optional[Response], validate) -> Dict[str, Any]:
+    """Run a JSON-returning generation through the LLM result cache.
+
+    `validate` raises ValueError for malformed output, which is never cached.
+    `response` (None for background jobs) gets an X-Cache header.
+    """
+    key = cache_key(OPENAI_MODEL, messages, {"temperature": temperature, "max_tokens": max_tokens})
+    headers = response.headers if response is not None else {}
+    if force:
+        llm_cache.stats["bypass"] += 1
+        headers["X-Cache"] = "BYPASS"
+    else:
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            headers["X-Cache"] = "HIT"
+            return cached
+        headers["X-Cache"] = "MISS"
+
+    content = (await llm.chat(messages, temperature=temperature, max_tokens=max_tokens)).strip()
+
+    # Try to parse JSON - handle markdown code blocks if present
+    if content.startswith('```'):
+        content = content.split('```')[1]
+        if content.startswith('json'):
+            content = content[4:]
+
+    result = json.loads(content)
+    validate(result)
+    await llm_cache.set(key, result)
+    return result
+
+def _check_mcqs(mcqs: Dict[str, Any]):
+    if 'questions' not in mcqs or not isinstance(mcqs['questions'], list):
+        raise ValueError("Invalid MCQ format")
+
+def _check_rubric(result: Dict[str, Any]):
+    if 'rubric' not in result or not isinstance(result['rubric'], list):
+        raise ValueError("Invalid rubric format")
+
+def _mcq_messages(body: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Prompt for MCQ generation from a case's title, subspecialty, history and answer"""
     prompt = f"""Generate 3-5 high-quality multiple choice questions for this radiology case.
 
 Case Title: {body.get('title', '')}
@@ -823,36 +1332,27 @@ Return JSON in this exact format:
 }}
 
 Generate the MCQs now:"""
+    return [
+        {"role": "system", "content": "You are an expert radiology educator creating board-style multiple choice questions. Return only valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+MCQ_GENERATION = {"temperature": 0.7, "max_tokens": 2000, "validate": _check_mcqs}
+
+@app.post("/api/cases/{case_id}/generate-mcqs")
+async def generate_mcqs(case_id: str, request: Request, response: Response,
+                        force: bool = Query(False, description="Skip the result cache"),
+                        identity: str = Depends(current_identity)):
+    """Generate MCQs for a case using LLM"""
+    require_admin(identity)
+    
+    body = await request.json()
 
     try:
-        if not openai_client:
+        if not llm.enabled:
             raise HTTPException(status_code=500, detail="OpenAI client not configured")
         
-        response = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert radiology educator creating board-style multiple choice questions. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Try to parse JSON - handle markdown code blocks if present
-        if content.startswith('```'):
-            content = content.split('```')[1]
-            if content.startswith('json'):
-                content = content[4:]
-        
-        mcqs = json.loads(content)
-        
-        # Validate structure
-        if 'questions' not in mcqs or not isinstance(mcqs['questions'], list):
-            raise ValueError("Invalid MCQ format")
-        
-        return mcqs
+        return await _generate_json(_mcq_messages(body), force=force, response=response, **MCQ_GENERATION)
         
     except json.JSONDecodeError as e:
         log.error(f"MCQ generation JSON parse error: {e}")
@@ -870,7 +1370,7 @@ async def mcq_chat(body: MCQChatRequest, identity: str = Depends(current_identit
         "Contrast the best answer with top distractors when useful."
     )
 
-    if openai_client and os.getenv("OPENAI_API_KEY"):
+    if llm.enabled:
         try:
             msgs = [{"role": "system", "content": system}]
             context_blob = (
@@ -890,24 +1390,16 @@ async def mcq_chat(body: MCQChatRequest, identity: str = Depends(current_identit
             if not any(t.role == "user" for t in body.messages or []):
                 msgs.append({"role": "user", "content": "Briefly explain the best answer and key pitfalls."})
 
-            resp = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=msgs,
-                temperature=0.2,
-                max_tokens=600,
-            )
-            text = (resp.choices[0].message.content or "").strip()
+            text = (await llm.chat(msgs, temperature=0.2, max_tokens=600)).strip()
             if text:
                 return MCQChatResponse(reply=text)
         except Exception as e:
             log.exception("MCQ chat LLM error: %s", e)
 
-    return MCQChatResponse(reply=_build_coach_reply(body))
+    blocks = await _case_answer_blocks(body.caseId, body.expectedAnswer)
+    return MCQChatResponse(reply=_build_coach_reply(body, blocks))
 
-@app.post("/api/feedback", response_model=FeedbackOut)
-async def feedback(body: FeedbackIn, identity: str = Depends(current_identity)):
-    log.info("FEEDBACK by %s case=%s transcript_len=%d rubric=%d",
-             identity, body.caseId, len(body.transcript or ""), len(body.rubric or []))
+def _feedback_messages(body: FeedbackIn) -> List[Dict[str, str]]:
     system = "You are an expert radiology oral-boards examiner. Be precise, supportive, and clinically grounded."
     user = f"""CASE SUMMARY:
 {body.boardPrompt or ''}
@@ -930,23 +1422,239 @@ Respond with:
 3) Rubric mapping (hit/miss with one-line rationale each).
 4) 2–3 sentence coaching paragraph.
 """
-    if openai_client and os.getenv("OPENAI_API_KEY"):
+    return [{"role":"system","content":system},{"role":"user","content":user}]
+
+_FEEDBACK_FALLBACK = "Based on the rubric and transcript, lead clearly with diagnosis, list key findings, discuss complications, and state management."
+_FEEDBACK_DISABLED = "LLM disabled. Set OPENAI_API_KEY to enable model feedback."
+
+@app.post("/api/feedback", response_model=FeedbackOut)
+async def feedback(body: FeedbackIn, identity: str = Depends(current_identity)):
+    log.info("FEEDBACK by %s case=%s transcript_len=%d rubric=%d",
+             identity, body.caseId, len(body.transcript or ""), len(body.rubric or []))
+    if llm.enabled:
         try:
             log.info("LLM call model=%s", OPENAI_MODEL)
-            resp = openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[{"role":"system","content":system},{"role":"user","content":user}],
-                temperature=0.2,
-            )
-            feedback_text = resp.choices[0].message.content
+            feedback_text = await llm.chat(_feedback_messages(body), temperature=0.2)
             log.info("LLM ok: %d chars", len(feedback_text or ""))
         except Exception as e:
             log.exception("LLM error")
-            feedback_text = f"(LLM error: {e})\n\nBased on the rubric and transcript, lead clearly with diagnosis, list key findings, discuss complications, and state management."
+            feedback_text = f"(LLM error: {e})\n\n{_FEEDBACK_FALLBACK}"
     else:
         log.info("LLM disabled (missing client or OPENAI_API_KEY)")
-        feedback_text = "LLM disabled. Set OPENAI_API_KEY to enable model feedback."
-    return FeedbackOut(feedback=feedback_text, score=body.heuristic or {})
+        feedback_text = _FEEDBACK_DISABLED
+    return FeedbackOut(feedback=feedback_text, score=await _feedback_score(body))
+
+@app.post("/api/feedback/stream")
+async def feedback_stream(body: FeedbackIn, identity: str = Depends(current_identity)):
+    """Same as /api/feedback, relayed as Server-Sent Events.
+
+    Events: `token` ({text}) per delta, `section` ({index, key, title, text}) as
+    each of the four prompt sections completes, `error` ({detail}) if the LLM
+    fails mid-stream, and a final `done` carrying the FeedbackOut payload.
+    """
+    log.info("FEEDBACK(stream) by %s case=%s transcript_len=%d rubric=%d",
+             identity, body.caseId, len(body.transcript or ""), len(body.rubric or []))
+
+    async def events():
+        tracker = SectionTracker()
+        if llm.enabled:
+            try:
+                async for delta in llm.stream(_feedback_messages(body), temperature=0.2):
+                    yield sse("token", {"text": delta})
+                    for sec in tracker.feed(delta):
+                        yield sse("section", sec)
+                feedback_text = tracker.text
+                log.info("LLM stream ok: %d chars", len(feedback_text))
+            except Exception as e:
+                log.exception("LLM stream error")
+                yield sse("error", {"detail": str(e)})
+                feedback_text = f"{tracker.text}\n\n(LLM error: {e})\n\n{_FEEDBACK_FALLBACK}".lstrip()
+        else:
+            feedback_text = _FEEDBACK_DISABLED
+            yield sse("token", {"text": feedback_text})
+            tracker.feed(feedback_text)
+        for sec in tracker.finish():
+            yield sse("section", sec)
+        out = FeedbackOut(feedback=feedback_text, score=await _feedback_score(body))
+        yield sse("done", out.dict())
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # let nginx pass frames through unbuffered
+    })
+
+# -----------------------------
+# Heuristic grading
+# -----------------------------
+GRADE_BATCH_MAX = int(os.getenv("GRADE_BATCH_MAX", "5000"))
+# Batches larger than this are scored off the event loop
+GRADE_INLINE_MAX = int(os.getenv("GRADE_INLINE_MAX", "200"))
+
+# Compiled rubrics per case; write routes recompile, readers recompile on rubric change
+grader = RubricGrader(max_entries=int(os.getenv("GRADER_MAX_CASES", "4096")))
+
+async def _case_rubrics(case_ids: List[str]) -> Dict[str, List[str]]:
+    """Stored rubric per case id; unknown ids are left out"""
+    ids = list(dict.fromkeys(case_ids))
+    if USE_MONGO:
+        cur = db.cases.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "rubric": 1})
+        return {d["id"]: d.get("rubric") or [] for d in await cur.to_list(length=None)}
+    out = {}
+    for cid in ids:
+        it = _catalog.get(cid)
+        if it is not None:
+            out[cid] = it.get("rubric") or []
+    return out
+
+async def _feedback_score(body: FeedbackIn) -> Dict[str, Any]:
+    # Score against the stored rubric; the client's own heuristic is not trusted
+    key = body.caseId
+    rubric = (await _case_rubrics([key])).get(key)
+    if rubric is None:  # case not stored server-side (static demo data): use the posted rubric
+        rubric, key = body.rubric or [], "adhoc:" + key
+    return grader.score(key, rubric, body.transcript)
+
+@app.post("/api/grade")
+async def grade_one(body: GradeIn, identity: str = Depends(current_identity)):
+    """Heuristic rubric score of one transcript against the case's stored rubric"""
+    rubric = (await _case_rubrics([body.caseId])).get(body.caseId)
+    if rubric is None:
+        raise HTTPException(404, "Case not found")
+    return grader.score(body.caseId, rubric, body.transcript)
+
+@app.post("/api/grade/batch")
+async def grade_batch(body: GradeBatchIn, identity: str = Depends(current_identity)):
+    """Score many transcripts (e.g. regrading history after a rubric edit).
+
+    Results are in request order; items for unknown cases get {"error": ...}.
+    """
+    if len(body.items) > GRADE_BATCH_MAX:
+        raise HTTPException(413, f"At most {GRADE_BATCH_MAX} items per batch")
+    rubrics = await _case_rubrics([it.caseId for it in body.items])
+
+    def run():
+        out = []
+        for it in body.items:
+            rubric = rubrics.get(it.caseId)
+            if rubric is None:
+                out.append({"caseId": it.caseId, "error": "Case not found"})
+            else:
+                out.append({"caseId": it.caseId, **grader.score(it.caseId, rubric, it.transcript)})
+        return out
+
+    t0 = time.perf_counter()
+    results = run() if len(body.items) <= GRADE_INLINE_MAX else await asyncio.to_thread(run)
+    log.info("GRADE batch by %s: %d items, %d cases in %.1f ms",
+             identity, len(body.items), len(rubrics), (time.perf_counter() - t0) * 1000)
+    return {"results": results}
+
+# -----------------------------
+# Answer similarity
+# -----------------------------
+# IDF is refitted on the catalog when it changed, at most this often
+SIMILARITY_REFIT_SEC = float(os.getenv("SIMILARITY_REFIT_SEC", "600"))
+
+# Hashed n-gram vectors of each case's expected answer and rubric items
+similarity = SimilarityEngine(max_entries=int(os.getenv("SIMILARITY_MAX_CASES", "2048")))
+# catalog version the IDF was fitted on, when, running refit
+_similarity_state: Dict[str, Any] = {"version": None, "fitted": 0.0, "task": None}
+
+async def _similarity_fit(version: str):
+    if USE_MONGO:
+        cur = db.cases.find({"deleted": {"$ne": True}}, {"_id": 0, "expectedAnswer": 1, "rubric": 1})
+        docs = await cur.to_list(length=None)
+    else:
+        docs = _catalog.listed()
+    texts = [" ".join([d.get("expectedAnswer") or ""] + [r for r in d.get("rubric") or [] if isinstance(r, str)])
+             for d in docs]
+    t0 = time.perf_counter()
+    await asyncio.to_thread(similarity.fit, texts)
+    log.info("SIMILARITY idf fitted on %d cases in %.0f ms", len(texts), (time.perf_counter() - t0) * 1000)
+    _similarity_state.update(version=version, fitted=time.monotonic())
+
+async def _similarity_ready():
+    """Fit the IDF before the first score; refit in the background after catalog changes"""
+    st = _similarity_state
+    if st["version"] is not None and time.monotonic() - st["fitted"] < SIMILARITY_REFIT_SEC:
+        return
+    version = await _cases_version()
+    if version == st["version"]:
+        st["fitted"] = time.monotonic()
+        return
+    if st["task"] is None or st["task"].done():
+        st["task"] = asyncio.create_task(_similarity_fit(version))
+    if st["version"] is None:
+        await st["task"]
+
+async def _case_targets(case_ids: List[str]) -> Dict[str, Tuple[str, List[str]]]:
+    """Stored (expectedAnswer, rubric) per case id; unknown ids are left out"""
+    ids = list(dict.fromkeys(case_ids))
+    if USE_MONGO:
+        cur = db.cases.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "expectedAnswer": 1, "rubric": 1})
+        return {d["id"]: (d.get("expectedAnswer") or "", d.get("rubric") or [])
+                for d in await cur.to_list(length=None)}
+    out = {}
+    for cid in ids:
+        it = _catalog.get(cid)
+        if it is not None:
+            out[cid] = (it.get("expectedAnswer") or "", it.get("rubric") or [])
+    return out
+
+@app.post("/api/similarity")
+async def similarity_one(body: GradeIn, identity: str = Depends(current_identity)):
+    """Text similarity of one transcript to the case's expected answer and rubric items.
+
+    `similarity` is the cosine to the expected answer (0-1); `rubric` lists, per
+    rubric item in order, the weighted share of its wording found in the transcript.
+    """
+    await _similarity_ready()
+    target = (await _case_targets([body.caseId])).get(body.caseId)
+    if target is None:
+        raise HTTPException(404, "Case not found")
+    res = similarity.score(body.caseId, *target, body.transcript)
+    return {"caseId": body.caseId, **res, "items": target[1]}
+
+@app.post("/api/similarity/batch")
+async def similarity_batch(body: GradeBatchIn, identity: str = Depends(current_identity)):
+    """Score many transcripts in one vectorized pass (e.g. regrading history).
+
+    Results are in request order; items for unknown cases get {"error": ...}.
+    """
+    if len(body.items) > GRADE_BATCH_MAX:
+        raise HTTPException(413, f"At most {GRADE_BATCH_MAX} items per batch")
+    await _similarity_ready()
+    targets = await _case_targets([it.caseId for it in body.items])
+    jobs = [(it.caseId, *targets[it.caseId], it.transcript) for it in body.items if it.caseId in targets]
+
+    t0 = time.perf_counter()
+    if len(jobs) <= GRADE_INLINE_MAX:
+        scored = iter(similarity.score_many(jobs))
+    else:
+        scored = iter(await asyncio.to_thread(similarity.score_many, jobs))
+    log.info("SIMILARITY batch by %s: %d items, %d cases in %.1f ms",
+             identity, len(body.items), len(targets), (time.perf_counter() - t0) * 1000)
+    results = []
+    for it in body.items:
+        if it.caseId in targets:
+            results.append({"caseId": it.caseId, **next(scored)})
+        else:
+            results.append({"caseId": it.caseId, "error": "Case not found"})
+    return {"results": results}
+
+# -----------------------------
+# Concept detection
+# -----------------------------
+CONCEPTS_PATH = os.getenv("CONCEPTS_PATH", os.path.join(os.path.dirname(__file__), "concepts.json"))
+concept_engine = ConceptEngine.from_file(CONCEPTS_PATH)
+
+@app.get("/api/concepts")
+async def list_concepts(identity: str = Depends(current_identity)):
+    return [{"id": c["id"], "label": c.get("label", c["id"])} for c in concept_engine.concepts]
+
+@app.post("/api/concepts/detect")
+async def detect_concepts(body: ConceptsIn, identity: str = Depends(current_identity)):
+    """Concepts mentioned in a transcript, with negation and the matching quote"""
+    return {"concepts": concept_engine.detect(body.text, body.ids)}
 
 @app.post("/api/attempt")
 async def add_attempt(a: AttemptIn, identity: str = Depends(current_identity)):
@@ -954,7 +1662,11 @@ async def add_attempt(a: AttemptIn, identity: str = Depends(current_identity)):
     return {"ok": True}
 
 @app.get("/api/progress/attempts", response_model=List[AttemptRow])
-async def get_progress_attempts(identity: str = Depends(current_identity)):
+async def get_progress_attempts(request: Request, response: Response,
+                                identity: str = Depends(current_identity)):
+    hit = _not_modified(request, response, "attempts", await _progress_version(identity))
+    if hit:
+        return hit
     rows = await list_attempts(identity)
     out = []
     for r in rows:
@@ -970,23 +1682,20 @@ async def get_progress_attempts(identity: str = Depends(current_identity)):
     return out
 
 @app.get("/api/progress", response_model=ProgressOut)
-async def get_progress(identity: str = Depends(current_identity)):
-    rows = await list_attempts(identity)
-    reviewed = len({r["caseId"] for r in rows})
+async def get_progress(request: Request, response: Response,
+                       identity: str = Depends(current_identity)):
+    rollup = await get_rollup(identity)
+    hit = _not_modified(request, response, "progress", identity, rollup.get("count", 0), rollup.get("lastTs", 0))
+    if hit:
+        return hit
     per: Dict[str, Any] = {}
-    for r in rows:
-        sub = r.get("subspecialty", "Unknown")
-        p = per.setdefault(sub, {"attempts": 0, "meanSim": 0.0, "hits": 0, "total": 0})
-        p["attempts"] += 1
-        p["meanSim"] += r.get("similarity", 0.0)
-        p["hits"]    += r.get("rubricHit", 0)
-        p["total"]   += r.get("rubricTotal", 0)
-    for sub, p in per.items():
-        if p["attempts"]:
-            p["meanSim"] = round((p["meanSim"] / p["attempts"]) * 100)
-        p["meanRubric"] = round((p["hits"] / p["total"]) * 100) if p["total"] else 0
-        p.pop("hits"); p.pop("total")
-    return ProgressOut(reviewedCount=reviewed, per=per)
+    for p in (rollup.get("per") or {}).values():
+        per[p["name"]] = {
+            "attempts": p["attempts"],
+            "meanSim": round((p["simSum"] / p["attempts"]) * 100) if p["attempts"] else 0.0,
+            "meanRubric": round((p["hits"] / p["total"]) * 100) if p["total"] else 0,
+        }
+    return ProgressOut(reviewedCount=len(rollup.get("cases") or []), per=per)
 
 @app.post("/api/progress/clear")
 async def clear_progress(identity: str = Depends(current_identity)):
@@ -1006,7 +1715,7 @@ ALLOWED_PUT_CT = {
 
 @app.get("/api/s3/presign")
 async def s3_presign(
-    op: str = Query(..., regex="^(put|get)$"),
+    op: str = Query(..., pattern="^(put|get)$"),
     key: str = Query(..., description="S3 object key, e.g. cases/gi-001/images/axial1.png"),
     contentType: Optional[str] = Query(None, description="Required for PUT"),
     expiresSec: int = Query(900, ge=60, le=3600),
@@ -1038,15 +1747,71 @@ async def s3_presign(
 
     else:  # get
         try:
-            url = s3_client.generate_presigned_url(
-                ClientMethod="get_object",
-                Params={"Bucket": S3_BUCKET, "Key": key},
-                ExpiresIn=expiresSec
-            )
+            url = s3_signer.sign_key(key, expires=expiresSec)
         except Exception as e:
             raise HTTPException(500, f"S3 error: {e}")
         return {"url": url, "method": "GET"}
 
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _range_length(header: Optional[str], size: int) -> int:
+    """Bytes a single-range request will get (whole file if absent or complex)"""
+    m = _RANGE_RE.match(header or "")
+    if not m or not (m.group(1) or m.group(2)):
+        return size
+    if not m.group(1):
+        return min(size, int(m.group(2)))
+    start = int(m.group(1))
+    end = min(size - 1, int(m.group(2))) if m.group(2) else size - 1
+    return max(0, end - start + 1)
+
+@app.get("/api/media/{key:path}")
+async def media_proxy(key: str, request: Request, exp: int = Query(...), sig: str = Query(...)):
+    """Serve a case asset from the local media cache (Range-capable).
+
+    URLs come signed from /api/cases/{id}/signed when MEDIA_CACHE_DIR is set.
+    """
+    if media_cache is None:
+        raise HTTPException(404, "Media cache not enabled")
+    if not _KEY_RE.match(key) or ".." in key or not key.startswith(("cases/", "references/", "uploads/")):
+        raise HTTPException(400, "Invalid key")
+    if not media_cache.verify(key, exp, sig):
+        raise HTTPException(403, "Invalid or expired signature")
+    try:
+        obj = await media_cache.fetch(key)
+    except Exception as e:
+        code = (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            raise HTTPException(404, "Not found")
+        log.exception("Media cache fill for %s failed", key)
+        raise HTTPException(502, "Could not fetch media")
+    media_cache.served(_range_length(request.headers.get("range"), obj.size))
+    headers = {"Cache-Control": f"private, max-age={max(0, exp - int(time.time()))}",
+               "Accept-Ranges": "bytes"}
+    if obj.etag:
+        headers["ETag"] = obj.etag
+    if MEDIA_ACCEL_PREFIX:
+        # nginx serves the file (Range, sendfile) from its internal location
+        headers["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX + media_cache.relpath(obj)
+        return Response(status_code=200, media_type=obj.content_type, headers=headers)
+    return FileResponse(obj.path, media_type=obj.content_type, headers=headers)
+
+class S3CompleteIn(BaseModel):
+    key: str
+    caseId: Optional[str] = None
+
+@app.post("/api/s3/complete")
+async def s3_complete(body: S3CompleteIn, identity: str = Depends(current_identity)):
+    """Call after a presigned PUT finishes: renders thumb/display for image keys
+    and, with caseId, records them on that case's media entry."""
+    require_admin(identity)
+    if not S3_BUCKET:
+        raise HTTPException(400, "S3_BUCKET not configured")
+    if not _KEY_RE.match(body.key) or ".." in body.key or not body.key.startswith(("cases/", "uploads/")):
+        raise HTTPException(400, "Invalid key")
+    renditions = await _derive_image(body.key, case_id=body.caseId)
+    return {"key": body.key, "url": _s3_url(body.key), **renditions}
+
 # =============================
 # ADMIN ROUTES
 # =============================
@@ -1056,10 +1821,117 @@ def require_admin_user(identity: str = Depends(current_identity)):
     require_admin(identity)
     return identity
 
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+UPLOAD_STATUS_EVERY_SEC = float(os.getenv("UPLOAD_STATUS_EVERY_SEC", "1"))
+
+async def _publish_upload(status: Dict[str, Any]):
+    """Mirror an upload's progress to Mongo so any worker can answer status polls"""
+    if USE_MONGO:
+        await db.uploads.replace_one(
+            {"_id": status["uploadId"]},
+            {**status, "_id": status["uploadId"], "at": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+
+async def _upload_media(file: UploadFile, s3_key: str, extra: Dict[str, Any],
+                        upload_id: Optional[str] = None) -> Dict[str, Any]:
+    """Upload through the pooled uploader, awaiting it without blocking the loop"""
+    if upload_id and not _UPLOAD_ID_RE.match(upload_id):
+        raise HTTPException(400, "upload_id must be 1-64 letters, digits, '-' or '_'")
+    job = uploader.start(file.file, s3_key, extra, upload_id=upload_id)
+    waiter = asyncio.ensure_future(uploader.wait(job))
+    while True:
+        done, _ = await asyncio.wait({waiter}, timeout=UPLOAD_STATUS_EVERY_SEC)
+        if done:
+            break
+        await _publish_upload(job.status())
+    status = waiter.result()
+    await _publish_upload(status)
+    if status["state"] != "done":
+        raise HTTPException(status_code=500, detail=f"Upload failed: {status['error']}")
+    log.info("UPLOAD %s -> %s: %d bytes in %.2fs (%s MB/s, %d parts)", status["uploadId"], s3_key,
+             status["bytesSent"], status["seconds"], status["mbPerSec"], status["partsDone"])
+    return status
+
+@app.get("/api/admin/uploads")
+async def admin_list_uploads(limit: int = Query(50, ge=1, le=256), identity: str = Depends(require_admin_user)):
+    """Recent uploads handled by this worker"""
+    return {"items": uploader.recent(limit)}
+
+@app.get("/api/admin/uploads/{upload_id}")
+async def admin_upload_status(upload_id: str, identity: str = Depends(require_admin_user)):
+    """Progress of one upload: state, bytes/parts sent, checksum, MB/s"""
+    job = uploader.get(upload_id)
+    if job:
+        return job.status()
+    if USE_MONGO:
+        doc = await db.uploads.find_one({"_id": upload_id}, {"_id": 0, "at": 0})
+        if doc:
+            return doc
+    raise HTTPException(404, "Upload not found")
+
+def _s3_url(key: str) -> str:
+    return f"https://{S3_BUCKET}.s3.amazonaws.com/{key}"
+
+def _media_with_renditions(case: Dict[str, Any], src: str, fields: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """The case's media list with ``fields`` set on the entry for ``src``.
+
+    Cases that only list ``images`` get media entries built from them first (the
+    same assets the viewer shows). None if ``src`` is not one of the case's images.
+    """
+    media = [dict(m) for m in case.get("media") or [] if isinstance(m, dict)]
+    if not media:
+        media = [{"type": "image", "src": u, "autoplay": True, "loop": True, "muted": True}
+                 for u in case.get("images") or [] if isinstance(u, str)]
+    hit = False
+    for m in media:
+        if m.get("src") == src:
+            m.update(fields)
+            hit = True
+    return media if hit else None
+
+async def _record_renditions(case_id: str, src: str, fields: Dict[str, Any]) -> bool:
+    """Store rendition URLs on an existing case's media entry for ``src``"""
+    if USE_MONGO:
+        doc = await db.cases.find_one({"id": case_id}, {"_id": 0, "media": 1, "images": 1})
+        media = _media_with_renditions(doc, src, fields) if doc else None
+        if media is None:
+            return False
+        await db.cases.update_one({"id": case_id}, {"$set": {"media": media}})
+        _search_wrote(await _cases_changed())  # media is not indexed
+        return True
+    def apply() -> bool:
+        with _store.locked() as cat:
+            cur = cat.get(case_id)
+            media = _media_with_renditions(cur, src, fields) if cur else None
+            if media is not None:
+                _store.update(case_id, {"media": media})
+            return media is not None
+    return await asyncio.to_thread(apply)
+
+async def _derive_image(s3_key: str, data: Optional[bytes] = None,
+                        case_id: Optional[str] = None) -> Dict[str, Any]:
+    """Render thumb/display for an uploaded image; failures only cost the renditions"""
+    try:
+        out = await image_deriver.derive(s3_key, data)
+    except Exception:
+        log.exception("Rendering derivatives of %s failed", s3_key)
+        return {}
+    if not out:
+        return {}
+    fields = {"thumb": _s3_url(out["thumb"]["key"]), "display": _s3_url(out["display"]["key"]),
+              "width": out["width"], "height": out["height"]}
+    if case_id:
+        fields["recorded"] = await _record_renditions(case_id, _s3_url(s3_key), {
+            k: fields[k] for k in ("thumb", "display", "width", "height")})
+    log.info("DERIVE %s: thumb %d B, display %d B", s3_key, out["thumb"]["bytes"], out["display"]["bytes"])
+    return fields
+
 @app.post("/api/admin/upload-image")
 async def admin_upload_image(
     case_id: str = Form(...),
     file: UploadFile = File(...),
+    upload_id: Optional[str] = Form(None),
     identity: str = Depends(require_admin_user)
 ):
     """Upload an image for a case to S3"""
@@ -1082,28 +1954,24 @@ async def admin_upload_image(
     filename = f"image-{timestamp}.{file_ext}"
     s3_key = f"cases/{case_id}/{filename}"
     
-    try:
-        s3_client.upload_fileobj(
-            file.file,
-            S3_BUCKET,
-            s3_key,
-            ExtraArgs={
-                'ContentType': file.content_type,
-                'CacheControl': 'max-age=31536000'
-            }
-        )
-        
-        url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
-        return {"status": "success", "url": url, "filename": filename, "s3_key": s3_key}
-        
-    except Exception as e:
-        log.exception("Image upload failed")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    done = await _upload_media(file, s3_key, {
+        'ContentType': file.content_type,
+        'CacheControl': 'max-age=31536000'
+    }, upload_id)
+    url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
+    renditions = {}
+    if image_deriver.enabled:
+        await file.seek(0)
+        renditions = await _derive_image(s3_key, await file.read(), case_id)
+    return {"status": "success", "url": url, "filename": filename, "s3_key": s3_key,
+            "uploadId": done["uploadId"], "sha256": done["sha256"], "size": done["bytesSent"],
+            **renditions}
 
 @app.post("/api/admin/upload-video")
 async def admin_upload_video(
     case_id: str = Form(...),
     file: UploadFile = File(...),
+    upload_id: Optional[str] = Form(None),
     identity: str = Depends(require_admin_user)
 ):
     """Upload a video for a case to S3"""
@@ -1125,28 +1993,19 @@ async def admin_upload_video(
     filename = f"video-{timestamp}.{file_ext}"
     s3_key = f"cases/{case_id}/{filename}"
     
-    try:
-        s3_client.upload_fileobj(
-            file.file,
-            S3_BUCKET,
-            s3_key,
-            ExtraArgs={
-                'ContentType': file.content_type,
-                'CacheControl': 'max-age=31536000'
-            }
-        )
-        
-        url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
-        return {"status": "success", "url": url, "filename": filename, "s3_key": s3_key}
-        
-    except Exception as e:
-        log.exception("Video upload failed")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    done = await _upload_media(file, s3_key, {
+        'ContentType': file.content_type,
+        'CacheControl': 'max-age=31536000'
+    }, upload_id)
+    url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
+    return {"status": "success", "url": url, "filename": filename, "s3_key": s3_key,
+            "uploadId": done["uploadId"], "sha256": done["sha256"], "size": done["bytesSent"]}
 
 @app.post("/api/admin/upload-reference")
 async def admin_upload_reference(
     case_id: str = Form(...),
     file: UploadFile = File(...),
+    upload_id: Optional[str] = Form(None),
     identity: str = Depends(require_admin_user)
 ):
     """Upload a reference PDF to S3"""
@@ -1166,24 +2025,14 @@ async def admin_upload_reference(
     safe_filename = file.filename.replace(' ', '-').lower()
     s3_key = f"references/{case_id}/{safe_filename}"
     
-    try:
-        s3_client.upload_fileobj(
-            file.file,
-            S3_BUCKET,
-            s3_key,
-            ExtraArgs={
-                'ContentType': 'application/pdf',
-                'ContentDisposition': f'inline; filename="{file.filename}"',
-                'CacheControl': 'max-age=31536000'
-            }
-        )
-        
-        url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
-        return {"status": "success", "url": url, "filename": safe_filename, "s3_key": s3_key}
-        
-    except Exception as e:
-        log.exception("Reference upload failed")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    done = await _upload_media(file, s3_key, {
+        'ContentType': 'application/pdf',
+        'ContentDisposition': f'inline; filename="{file.filename}"',
+        'CacheControl': 'max-age=31536000'
+    }, upload_id)
+    url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
+    return {"status": "success", "url": url, "filename": safe_filename, "s3_key": s3_key,
+            "uploadId": done["uploadId"], "sha256": done["sha256"], "size": done["bytesSent"]}
 
 @app.post("/api/admin/cases")
 async def admin_create_case(
@@ -1192,7 +2041,7 @@ async def admin_create_case(
 ):
     """Create a new case (admin only)"""
     
-    case_dict = body.dict()
+    case_dict = _with_answer_blocks(body.dict())
     case_dict['created_at'] = int(time.time() * 1000)
     case_dict['updated_at'] = int(time.time() * 1000)
     case_dict['active'] = True
@@ -1203,47 +2052,325 @@ async def admin_create_case(
         case_dict['_id'] = body.id
         try:
             await db.cases.insert_one(case_dict)
+            await _cases_changed()
         except Exception as e:
             log.exception("Failed to insert case")
             raise HTTPException(500, f"Database error: {e}")
     else:
-        items = _read_cases_file()
-        if any(x.get('id') == body.id for x in items):
+        try:
+            await asyncio.to_thread(_store.insert, case_dict)
+        except CaseExists:
             raise HTTPException(400, f"Case {body.id} already exists")
-        items.append(case_dict)
-        _write_cases_file(items)
+    grader.compile(body.id, case_dict.get("rubric") or [])
+    similarity.compile(body.id, case_dict.get("expectedAnswer") or "", case_dict.get("rubric") or [])
     
     return {"status": "success", "case_id": body.id}
 
 @app.get("/api/admin/cases")
 async def admin_list_cases(
+    request: Request,
+    response: Response,
     include_inactive: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=CASES_PAGE_MAX),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
     identity: str = Depends(require_admin_user)
 ):
     """List all cases including metadata (admin only)"""
-    
+    fl = _parse_fields(fields)
+    hit = _not_modified(request, response, "admin", await _cases_version(), request.url.query)
+    if hit:
+        return hit
     if USE_MONGO:
         query = {} if include_inactive else {"active": True}
-        cursor = db.cases.find(query).sort("created_at", -1)
-        cases = await cursor.to_list(length=1000)
+        if after:
+            # Keyset on (created_at desc, id asc)
+            prev = await db.cases.find_one({"id": after}, {"created_at": 1})
+            if not prev:
+                raise HTTPException(400, "Unknown cursor")
+            ca = prev.get("created_at")
+            query["$or"] = [{"created_at": {"$lt": ca}}, {"created_at": ca, "id": {"$gt": after}}]
+        proj = None
+        if fl is not None:
+            proj = {f: 1 for f in fl}
+        cursor = db.cases.find(query, proj).sort([("created_at", -1), ("id", 1)])
+        cases = await cursor.limit(limit + 1).to_list(length=limit + 1) if limit else await cursor.to_list(length=None)
+        nxt = None
+        if limit and len(cases) > limit:
+            cases = cases[:limit]
+            nxt = cases[-1].get("id")
         for c in cases:
             if '_id' in c:
                 c['id'] = str(c['_id'])
                 del c['_id']
-        return cases
     else:
-        items = _read_cases_file()
-        if not include_inactive:
-            items = [x for x in items if x.get('active', True)]
-        return items
+        try:
+            cases, nxt = _catalog.active_page(after=after, limit=limit, include_inactive=include_inactive)
+        except KeyError:
+            raise HTTPException(400, "Unknown cursor")
+        if fl is not None:
+            cases = [project(c, fl) for c in cases]
+    return _page_response(response, cases, nxt)
 
-@app.post("/api/cases/{case_id}/generate-rubric")
-async def generate_rubric(case_id: str, request: Request, identity: str = Depends(current_identity)):
-    """Generate rubric points for a case using LLM"""
-    require_admin(identity)
-    
-    body = await request.json()
-    
+# -----------------------------
+# Bulk import / export (NDJSON)
+# -----------------------------
+CASES_BULK_BATCH = int(os.getenv("CASES_BULK_BATCH", "500"))
+CASES_BULK_MAX_ERRORS = 1000
+_CASE_META_FIELDS = ("created_at", "updated_at", "active", "created_by", "deleted")
+
+async def _ndjson_lines(request: Request):
+    """Yield (line number, raw line) from a streamed request body"""
+    buf = b""
+    n = 0
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            n += 1
+            yield n, line
+    if buf:
+        yield n + 1, buf
+
+def _bulk_doc(obj: Any, identity: str, now: int) -> Dict[str, Any]:
+    """Validate one import line against Case; raises ValueError/ValidationError"""
+    if not isinstance(obj, dict):
+        raise ValueError("line is not a JSON object")
+    doc = Case(**obj).dict()
+    for k in _CASE_META_FIELDS:
+        if doc.get(k) is None:
+            doc.pop(k, None)
+    doc.pop("_id", None)
+    doc["updated_at"] = now
+    return _with_answer_blocks(doc)
+
+def _bulk_insert_defaults(doc: Dict[str, Any], identity: str, now: int) -> Dict[str, Any]:
+    defaults = {"created_at": now, "active": True, "deleted": False, "created_by": identity}
+    return {k: v for k, v in defaults.items() if k not in doc}
+
+async def _bulk_apply_mongo(batch: List[Tuple[int, Dict[str, Any]]], insert_only: bool,
+                            identity: str, now: int, errors: List[Dict[str, Any]]) -> int:
+    from pymongo import InsertOne, UpdateOne
+    from pymongo.errors import BulkWriteError
+    ops = []
+    for _, doc in batch:
+        extra = _bulk_insert_defaults(doc, identity, now)
+        if insert_only:
+            ops.append(InsertOne({**doc, **extra}))  # the unique id index rejects duplicates
+        else:
+            ops.append(UpdateOne({"id": doc["id"]}, {"$set": doc, "$setOnInsert": extra}, upsert=True))
+    try:
+        await db.cases.bulk_write(ops, ordered=False)
+        return len(ops)
+    except BulkWriteError as e:
+        failed = e.details.get("writeErrors") or []
+        for w in failed:
+            line, doc = batch[w["index"]]
+            dup = w.get("code") == 11000
+            errors.append({"line": line, "id": doc["id"], "error": "already exists" if dup else w.get("errmsg", "write failed")})
+        return len(ops) - len(failed)
+
+def _bulk_apply_file(docs: List[Tuple[int, Dict[str, Any]]], insert_only: bool,
+                     identity: str, now: int, errors: List[Dict[str, Any]]) -> int:
+    # One transaction: a single journal append under the store's exclusive lock
+    with _store.locked() as cat:
+        out = []
+        for line, doc in docs:
+            cur = cat.get(doc["id"])
+            if cur is None:
+                out.append({**doc, **_bulk_insert_defaults(doc, identity, now)})
+            elif insert_only:
+                errors.append({"line": line, "id": doc["id"], "error": "already exists"})
+            else:
+                out.append({**{k: cur[k] for k in _CASE_META_FIELDS if k in cur}, **doc})
+        _store.put_many(out)
+    return len(out)
+
+async def _existing_case_ids(ids: List[str]) -> set:
+    """Which of ``ids`` are already taken (what insert mode would reject)"""
+    if USE_MONGO:
+        return {d["id"] async for d in db.cases.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})}
+    return {i for i in ids if _catalog.get(i) is not None}
+
+@app.post("/api/admin/cases/bulk")
+async def admin_bulk_import(
+    request: Request,
+    mode: str = Query("upsert", pattern="^(upsert|insert)$"),
+    dryRun: bool = False,
+    identity: str = Depends(require_admin_user)
+):
+    """Import cases from an NDJSON body (one case per line), streamed.
+
+    Lines are validated against Case in batches of CASES_BULK_BATCH. Mongo gets
+    one unordered bulk_write per batch; the JSON file store gets every valid case
+    in a single journal append. `insert` mode rejects existing ids, and a dry
+    run reports them the same way. Invalid lines are reported in `errors` and
+    never block the rest.
+    """
+    t0 = time.perf_counter()
+    now = int(time.time() * 1000)
+    errors: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    received = applied = 0
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+
+    def fail(line: int, cid: Optional[str], msg: str):
+        if len(errors) < CASES_BULK_MAX_ERRORS:
+            errors.append({"line": line, "id": cid, "error": msg})
+
+    async def flush():
+        nonlocal applied, batch
+        if batch and not dryRun:
+            if USE_MONGO:
+                applied += await _bulk_apply_mongo(batch, mode == "insert", identity, now, errors)
+            else:
+                pending.extend(batch)
+        elif dryRun:
+            taken = await _existing_case_ids([doc["id"] for _, doc in batch]) if mode == "insert" else set()
+            for line, doc in batch:
+                if doc["id"] in taken:
+                    fail(line, doc["id"], "already exists")
+            applied += len(batch) - len(taken)
+        batch = []
+
+    async for line_no, raw in _ndjson_lines(request):
+        if not raw.strip():
+            continue
+        received += 1
+        cid = None
+        try:
+            obj = json.loads(raw)
+            cid = obj.get("id") if isinstance(obj, dict) else None
+            doc = _bulk_doc(obj, identity, now)
+        except ValidationError as e:
+            fail(line_no, cid, "; ".join(f"{'.'.join(map(str, er['loc']))}: {er['msg']}" for er in e.errors()))
+            continue
+        except ValueError as e:
+            fail(line_no, cid, str(e))
+            continue
+        if doc["id"] in seen:
+            fail(line_no, doc["id"], f"duplicate id (also on line {seen[doc['id']]})")
+            continue
+        seen[doc["id"]] = line_no
+        batch.append((line_no, doc))
+        if len(batch) >= CASES_BULK_BATCH:
+            await flush()
+    await flush()
+
+    if pending:
+        applied += await asyncio.to_thread(_bulk_apply_file, pending, mode == "insert", identity, now, errors)
+    if applied and not dryRun:
+        await _cases_changed()
+    errors.sort(key=lambda e: e["line"])
+    log.info("BULK import by %s: %d lines, %d applied, %d errors in %.0f ms",
+             identity, received, applied, len(errors), (time.perf_counter() - t0) * 1000)
+    return {"received": received, "applied": applied, "errors": errors[:CASES_BULK_MAX_ERRORS],
+            "dryRun": dryRun, "mode": mode}
+
+@app.get("/api/admin/cases/export")
+async def admin_bulk_export(include_deleted: bool = True, identity: str = Depends(require_admin_user)):
+    """Stream every case as NDJSON (the format /api/admin/cases/bulk accepts)"""
+    def line(doc: Dict[str, Any]) -> str:
+        return json.dumps({k: v for k, v in doc.items() if k not in ("_id", "answerBlocks")},
+                          ensure_ascii=False, default=str) + "\n"
+
+    async def rows():
+        chunk: List[str] = []
+        if USE_MONGO:
+            query = {} if include_deleted else {"deleted": {"$ne": True}}
+            async for doc in db.cases.find(query, {"_id": 0}).sort("id", 1):
+                chunk.append(line(doc))
+                if len(chunk) >= 200:
+                    yield "".join(chunk)
+                    chunk = []
+        else:
+            for doc in _catalog.listed(include_deleted=include_deleted):
+                chunk.append(line(doc))
+                if len(chunk) >= 200:
+                    yield "".join(chunk)
+                    chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson", headers={
+        "Content-Disposition": 'attachment; filename="cases.ndjson"',
+    })
+
+@app.post("/api/admin/progress/rebuild-rollups")
+async def admin_rebuild_rollups(user: Optional[str] = None, identity: str = Depends(require_admin_user)):
+    """Recompute progress rollups from the attempts collection"""
+    return {"ok": True, "users": await rebuild_rollups(user)}
+
+@app.get("/api/admin/db/explain")
+async def admin_explain_queries(caseId: Optional[str] = None, user: Optional[str] = None,
+                                identity: str = Depends(require_admin_user)):
+    """Query plans of the hot Mongo queries; `collscan: true` means a missing index"""
+    if not USE_MONGO:
+        raise HTTPException(400, "Query plans are only available with the Mongo backend")
+    if not caseId:
+        doc = await db.cases.find_one({}, {"id": 1})
+        caseId = (doc or {}).get("id", "")
+    indexes = {}
+    for coll in sorted({c for c, _, _ in INDEXES}):
+        indexes[coll] = sorted((await db[coll].index_information()).keys())
+    return {"indexes": indexes, "queries": await explain_queries(db, caseId, user or identity)}
+
+@app.get("/api/admin/media-cache")
+async def admin_media_cache_stats(identity: str = Depends(require_admin_user)):
+    """Hit rate, fills and disk usage of the media cache (counters are per worker)"""
+    if media_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(media_cache.snapshot)}
+
+@app.get("/api/admin/llm-cache")
+async def admin_llm_cache_stats(identity: str = Depends(require_admin_user)):
+    """Hit/miss counters for the MCQ/rubric generation cache (this worker)"""
+    return llm_cache.snapshot()
+
+@app.get("/api/admin/profiles")
+async def admin_list_profiles(route: Optional[str] = None,
+                              kind: Optional[str] = Query(None, pattern="^(on-demand|sampled)$"),
+                              identity: str = Depends(require_admin_user)):
+    """Stored request profiles (all workers): on-demand newest first, then the
+    slowest sampled requests per route"""
+    profiles = await asyncio.to_thread(profiler.list, route, kind)
+    return {**profiler.snapshot(), "profiles": profiles}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def admin_get_profile(profile_id: str,
+                            format: Optional[str] = Query(None, pattern="^(raw|text)$",
+                                                          description="text: pstats summary (cProfile profiles)"),
+                            sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls|ncalls)$"),
+                            identity: str = Depends(require_admin_user)):
+    """One profile: the HTML flame graph, the .pstats file (load with
+    ``python -m pstats``), or ``format=text`` for a top-60 table"""
+    meta = profiler.locate(profile_id)
+    if meta is None:
+        raise HTTPException(404, "Profile not found")
+    if meta["format"] == "html":
+        return FileResponse(meta["path"], media_type="text/html")
+    if format == "text":
+        text = await asyncio.to_thread(profiler.pstats_text, meta["path"], sort)
+        return Response(text, media_type="text/plain; charset=utf-8")
+    return FileResponse(meta["path"], media_type="application/octet-stream",
+                        filename=f"{profile_id}.pstats")
+
+@app.post("/api/admin/users/{email}/revoke-sessions")
+async def admin_revoke_sessions(email: str, identity: str = Depends(require_admin_user)):
+    """Sign a user out everywhere: every token issued to them until now stops working"""
+    cutoff = await revocations.revoke(email.strip())
+    log.info("SESSIONS REVOKED for %s by %s", email, identity)
+    return {"ok": True, "email": email.strip(), "revokedBefore": cutoff,
+            "propagatesWithinSec": revocations.refresh_every}
+
+@app.get("/api/admin/auth-cache")
+async def admin_auth_cache_stats(identity: str = Depends(require_admin_user)):
+    """Verified-token cache and revocation filter counters (this worker)"""
+    return {"tokens": verified_tokens.snapshot(), "revocations": revocations.snapshot()}
+
+def _rubric_messages(body: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Prompt for rubric generation from a case's title, subspecialty, history and answer"""
     prompt = f"""Generate a comprehensive grading rubric for this radiology oral boards case.
 
 Case Title: {body.get('title', '')}
@@ -1272,38 +2399,232 @@ Return JSON in this exact format:
 }}
 
 Generate the rubric now:"""
+    return [
+        {"role": "system", "content": "You are an expert radiology educator creating grading rubrics for oral boards. Return only valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+RUBRIC_GENERATION = {"temperature": 0.5, "max_tokens": 800, "validate": _check_rubric}
+
+@app.post("/api/cases/{case_id}/generate-rubric")
+async def generate_rubric(case_id: str, request: Request, response: Response,
+                          force: bool = Query(False, description="Skip the result cache"),
+                          identity: str = Depends(current_identity)):
+    """Generate rubric points for a case using LLM"""
+    require_admin(identity)
+    
+    body = await request.json()
 
     try:
-        if not openai_client:
+        if not llm.enabled:
             raise HTTPException(status_code=500, detail="OpenAI client not configured")
         
-        response = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert radiology educator creating grading rubrics for oral boards. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=800
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        if content.startswith('```'):
-            content = content.split('```')[1]
-            if content.startswith('json'):
-                content = content[4:]
-        
-        result = json.loads(content)
-        
-        if 'rubric' not in result or not isinstance(result['rubric'], list):
-            raise ValueError("Invalid rubric format")
-        
-        return result
+        return await _generate_json(_rubric_messages(body), force=force, response=response, **RUBRIC_GENERATION)
         
     except json.JSONDecodeError as e:
         log.error(f"Rubric generation JSON parse error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to parse LLM response: {str(e)}")
     except Exception as e:
         log.error(f"Rubric generation error: {e}")
-        raise HTTPException(status_code=500, detail=f"Rubric generation failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Rubric generation failed: {str(e)}")
+# -----------------------------
+# Generation jobs
+# -----------------------------
+# Bulk rubric/MCQ generation in the background: one worker at a time runs the
+# queue (see generation_jobs.py), every finished case is checkpointed.
+JOB_MAX_CASES = int(os.getenv("JOB_MAX_CASES", "5000"))
+# kind -> (case field it fills, prompt builder, generation parameters)
+JOB_KINDS = {
+    "rubric": ("rubric", _rubric_messages, RUBRIC_GENERATION),
+    "mcqs": ("mcqs", _mcq_messages, MCQ_GENERATION),
+}
+
+class JobFilter(BaseModel):
+    subspecialty: Optional[List[str]] = None
+
+class JobIn(BaseModel):
+    kind: Literal["rubric", "mcqs"]
+    mode: Literal["stage", "apply"] = "stage"  # stage: keep results on the job for review
+    caseIds: Optional[List[str]] = None
+    filter: Optional[JobFilter] = None  # instead of caseIds: every non-deleted case matching it
+    overwrite: bool = False  # also regenerate cases that already have a rubric / MCQs
+    force: bool = False      # skip the LLM result cache
+
+class JobApplyIn(BaseModel):
+    caseIds: Optional[List[str]] = None  # default: every staged result
+
+def _has_generated(case: Dict[str, Any], field: str) -> bool:
+    if field == "mcqs":
+        return bool((case.get("mcqs") or {}).get("questions"))
+    return bool(case.get(field))
+
+def _mcq_spec(generated: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM questions -> a valid MCQSpec dict: question ids q1, q2, ..., choice ids
+    a, b, ... where missing, and the question's explanation on its correct choices"""
+    questions = []
+    for qi, q in enumerate(generated.get("questions") or [], 1):
+        if not isinstance(q, dict):
+            raise ValueError(f"Invalid MCQ question {qi}")
+        explanation = q.get("explanation")
+        choices = []
+        for ci, ch in enumerate(q.get("choices") or []):
+            if isinstance(ch, str):
+                ch = {"text": ch}
+            correct = bool(ch.get("correct"))
+            choices.append({"id": str(ch.get("id") or chr(97 + ci)), "text": str(ch.get("text", "")),
+                            "correct": correct,
+                            "explain": ch.get("explain") or (explanation if correct else None)})
+        questions.append({"id": f"q{qi}", "stem": str(q.get("stem", "")), "choices": choices,
+                          "multi_select": sum(c["correct"] for c in choices) > 1,
+                          "shuffle_choices": q.get("shuffle_choices", True),
+                          "concept_ids": q.get("concept_ids") or []})
+    return MCQSpec(questions=questions).dict()
+
+async def _set_generated(case_id: str, field: str, value: Any, by: str):
+    fields = {field: value, "updated_at": int(time.time() * 1000), "updated_by": by}
+    if USE_MONGO:
+        case = await db.cases.find_one_and_update({"id": case_id}, {"$set": fields},
+                                                  projection={"_id": 0, "expectedAnswer": 1},
+                                                  return_document=ReturnDocument.AFTER)
+        if case is None:
+            raise LookupError("Case not found")
+        _search_wrote(await _cases_changed())
+    else:
+        case = await asyncio.to_thread(_store.update, case_id, fields)
+        if case is None:
+            raise LookupError("Case not found")
+    if field == "rubric":
+        grader.compile(case_id, value)
+        similarity.compile(case_id, case.get("expectedAnswer") or "", value)
+
+async def _run_job_item(job: Dict[str, Any], case_id: str) -> Dict[str, Any]:
+    if USE_MONGO:
+        case = await db.cases.find_one({"id": case_id}, {"_id": 0})
+    else:
+        case = _catalog.get(case_id)
+    if case is None or case.get("deleted"):
+        raise LookupError("Case not found")
+    field, messages, params = JOB_KINDS[job["kind"]]
+    options = job.get("options") or {}
+    if not options.get("overwrite") and _has_generated(case, field):
+        return {"status": "skipped", "reason": f"case already has {field}"}
+    result = await _generate_json(messages(case), force=bool(options.get("force")), response=None, **params)
+    value = result["rubric"] if field == "rubric" else _mcq_spec(result)
+    if job["mode"] == "apply":
+        await _set_generated(case_id, field, value, job["createdBy"])
+        return {"status": "applied"}
+    return {"status": "staged", "output": value}
+
+# File backend: jobs and their per-case checkpoints live in JOBS_DIR, by default
+# cases.json.jobs/ next to the case file. Keep it on persistent storage shared by
+# all workers, or queued jobs and checkpoints are lost on restart.
+job_store = MongoJobStore(db) if USE_MONGO else FileJobStore(os.getenv("JOBS_DIR", CASES_PATH + ".jobs"))
+job_runner = JobRunner(
+    job_store, _run_job_item,
+    concurrency=int(os.getenv("JOBS_CONCURRENCY", "2")),
+    rate_per_min=float(os.getenv("JOBS_RATE_PER_MIN", "30")),
+    max_failures=int(os.getenv("JOBS_MAX_FAILURES", "5")),
+)
+
+async def _job_case_ids(body: JobIn) -> List[str]:
+    if body.caseIds:
+        return list(dict.fromkeys(body.caseIds))
+    subs = body.filter.subspecialty if body.filter else None
+    if USE_MONGO:
+        query: Dict[str, Any] = {"deleted": {"$ne": True}}
+        if subs:
+            query["subspecialty"] = {"$in": subs}
+        return [d["id"] async for d in db.cases.find(query, {"_id": 0, "id": 1}).sort("id", 1)]
+    return [c["id"] for c in _catalog.listed() if not subs or c.get("subspecialty") in subs]
+
+async def _job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await job_store.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+@app.post("/api/admin/jobs", status_code=202)
+async def submit_job(body: JobIn, identity: str = Depends(require_admin_user)):
+    """Queue rubric or MCQ generation for `caseIds` or every case matching `filter`"""
+    if not llm.enabled:
+        raise HTTPException(status_code=500, detail="OpenAI client not configured")
+    if not body.caseIds and body.filter is None:
+        raise HTTPException(400, "Give caseIds or a filter")
+    case_ids = await _job_case_ids(body)
+    if not case_ids:
+        raise HTTPException(400, "No cases selected")
+    if len(case_ids) > JOB_MAX_CASES:
+        raise HTTPException(413, f"At most {JOB_MAX_CASES} cases per job")
+    job = await job_runner.submit(body.kind, body.mode, case_ids, identity,
+                                  {"overwrite": body.overwrite, "force": body.force})
+    return await job_runner.summary(job)
+
+@app.get("/api/admin/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=500), identity: str = Depends(require_admin_user)):
+    """Recent jobs, newest first, and this worker's runner state"""
+    return {"jobs": [await job_runner.summary(j) for j in await job_store.list(limit)],
+            "runner": job_runner.snapshot()}
+
+@app.get("/api/admin/jobs/{job_id}")
+async def get_job(job_id: str, items: bool = Query(False, description="Include every case's outcome and staged output"),
+                  identity: str = Depends(require_admin_user)):
+    """Progress, throughput (cases/min of running time), ETA and failed cases"""
+    job = await _job_or_404(job_id)
+    outcomes = await job_store.items(job_id)
+    out = await job_runner.summary(job, outcomes)
+    if items:
+        out["items"] = [outcomes[cid] for cid in job["caseIds"] if cid in outcomes]
+    return out
+
+async def _job_transition(job_id: str, status: str, expect: Tuple[str, ...]) -> Dict[str, Any]:
+    job = await job_runner.set_status(job_id, status, expect)
+    if job is None:
+        current = await _job_or_404(job_id)
+        raise HTTPException(409, f"Job is {current['status']}")
+    log.info("JOB %s -> %s", job_id, status)
+    return await job_runner.summary(job)
+
+@app.post("/api/admin/jobs/{job_id}/pause")
+async def pause_job(job_id: str, identity: str = Depends(require_admin_user)):
+    """Stop after the cases in flight; resume continues where it stopped"""
+    return await _job_transition(job_id, "paused", ("queued", "running"))
+
+@app.post("/api/admin/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, identity: str = Depends(require_admin_user)):
+    return await _job_transition(job_id, "cancelled", ("queued", "running", "paused"))
+
+@app.post("/api/admin/jobs/{job_id}/resume")
+async def resume_job(job_id: str, identity: str = Depends(require_admin_user)):
+    """Requeue a paused, cancelled or finished job; failed cases are retried"""
+    return await _job_transition(job_id, "queued", ("paused", "cancelled", "done"))
+
+@app.post("/api/admin/jobs/{job_id}/apply")
+async def apply_job(job_id: str, body: Optional[JobApplyIn] = None, identity: str = Depends(require_admin_user)):
+    """Write staged results onto their cases (all, or `caseIds`)"""
+    job = await _job_or_404(job_id)
+    if job["status"] in ("queued", "running"):
+        raise HTTPException(409, "Pause the job or wait for it to finish first")
+    field = JOB_KINDS[job["kind"]][0]
+    wanted = set(body.caseIds) if body and body.caseIds else None
+    outcomes = await job_store.items(job_id)
+    applied, missing, invalid = [], [], []
+    for cid, it in outcomes.items():
+        if it["status"] != "staged" or (wanted is not None and cid not in wanted):
+            continue
+        try:
+            output = _mcq_spec(it["output"]) if field == "mcqs" else it["output"]
+        except ValueError:
+            invalid.append(cid)
+            continue
+        try:
+            await _set_generated(cid, field, output, identity)
+        except LookupError:
+            missing.append(cid)
+            continue
+        it = {**it, "status": "applied", "appliedBy": identity, "appliedAt": int(time.time() * 1000)}
+        await job_store.record(job_id, it)
+        outcomes[cid] = it
+        applied.append(cid)
+    await job_store.update(job_id, {"counts": dict(Counter(i["status"] for i in outcomes.values()))})
+    log.info("JOB %s: %d staged results applied by %s", job_id, len(applied), identity)
+    return {"applied": applied, "missing": missing, "invalid": invalid}
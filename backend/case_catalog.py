@@ -0,0 +1,365 @@
+# case_catalog.py
+"""In-process cache of the JSON case catalog.
+
+The catalog keeps the parsed ``cases.json`` snapshot in memory together with an
+index by case id and secondary indexes by subspecialty and deleted/active flags.
+Changes written by ``CaseStore`` live in an append-only journal next to the
+snapshot (``cases.json.journal``); the catalog replays only the bytes appended
+since its last read, and re-parses the snapshot only when its (inode, mtime,
+size) signature changes or the journal was replaced by a compaction.  That way
+every uvicorn worker sees writes made by the others on its next stat check.
+
+Returned dicts are shared with the cache and never mutated in place; callers that
+want to modify a case must copy it first.  ``CaseStore`` writes run in worker
+threads, so every index mutation and every reader's walk over the indexes holds
+the catalog lock.
+"""
+import os, json, time, threading
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev boxes: single-process only
+    fcntl = None
+
+FileSig = Optional[Tuple[int, int, int]]
+
+
+def project(doc: Dict[str, Any], fields: Optional[Iterable[str]] = None,
+            exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Copy of ``doc`` limited to ``fields`` (all when None) minus ``exclude``."""
+    if fields is None:
+        out = dict(doc)
+    else:
+        out = {k: doc[k] for k in fields if k in doc}
+    for k in exclude:
+        out.pop(k, None)
+    return out
+
+
+def _file_sig(path: str) -> FileSig:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class CaseCatalog:
+    def __init__(self, path: str, check_interval: float = 0.5, search=None):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.lock_path = path + ".lock"
+        # Seconds between stat() calls; 0 stats on every read.
+        self.check_interval = check_interval
+        # Bumped on every reload or applied change; cheap "did anything change" token.
+        self.version = 0
+        self._lock = threading.RLock()
+        self._sig: FileSig = None
+        self._journal_ino: Optional[int] = None
+        self._journal_pos = 0
+        self.journal_entries = 0
+        self._checked_at = 0.0
+        self._loaded = False
+        # Thread id set by CaseStore while it holds the exclusive file lock.
+        self.write_locked: Optional[int] = None
+        # Optional case_search.SearchIndex fed with every change (writes, journal
+        # replays and reloads), so it stays current on every worker.
+        self.search = search
+        self._reset([])
+
+    # ---- indexing ------------------------------------------------------
+    def _reset(self, items: List[Dict[str, Any]]):
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_sub: Dict[str, Set[str]] = {}
+        self._deleted: Set[str] = set()
+        self._inactive: Set[str] = set()
+        for it in items:
+            if isinstance(it, dict) and it.get("id"):
+                self._index(it, search=False)
+        self._sorted_ids: Optional[List[str]] = None
+        if self.search is not None:
+            self.search.sync(self._by_id.values())  # re-tokenizes only what changed
+
+    def _index(self, it: Dict[str, Any], search: bool = True):
+        cid = it["id"]
+        if cid in self._by_id:
+            self._unindex(cid, keep_slot=True)
+        else:
+            self._sorted_ids = None
+        self._by_id[cid] = it
+        self._by_sub.setdefault(it.get("subspecialty") or "Unknown", set()).add(cid)
+        if it.get("deleted"):
+            self._deleted.add(cid)
+        if not it.get("active", True):
+            self._inactive.add(cid)
+        if search and self.search is not None:
+            self.search.put(it)
+
+    def _unindex(self, cid: str, keep_slot: bool = False):
+        old = self._by_id.get(cid)
+        if old is None:
+            return
+        if not keep_slot:
+            del self._by_id[cid]
+            self._sorted_ids = None
+            if self.search is not None:
+                self.search.remove(cid)
+        ids = self._by_sub.get(old.get("subspecialty") or "Unknown")
+        if ids:
+            ids.discard(cid)
+        self._deleted.discard(cid)
+        self._inactive.discard(cid)
+
+    def apply(self, op: Dict[str, Any]):
+        """Apply one journal operation to the in-memory catalog."""
+        kind = op.get("op")
+        with self._lock:  # writers run in worker threads; readers snapshot under it
+            if kind == "put":
+                self._index(op["case"])
+            elif kind == "set":
+                old = self._by_id.get(op["id"])
+                if old is None:
+                    return
+                new = dict(old)
+                new.update(op.get("set") or {})
+                for k in op.get("unset") or ():
+                    new.pop(k, None)
+                self._index(new)
+            elif kind == "drop":
+                self._unindex(op["id"])
+            else:
+                log.warning("Unknown case journal op %r", kind)
+                return
+            self.version += 1
+
+    # ---- loading -------------------------------------------------------
+    def _shared_lock(self, wait: bool):
+        """fd holding the shared file lock, None if not needed; raises
+        BlockingIOError instead of waiting for a writer unless ``wait``."""
+        holder = self.write_locked
+        if fcntl is None or holder == threading.get_ident():
+            return None
+        if holder is not None:  # another thread of this process is writing
+            if wait:
+                return None  # blocking here could deadlock with its apply()
+            raise BlockingIOError
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | (0 if wait else fcntl.LOCK_NB))
+        except OSError:
+            os.close(fd)
+            raise
+        return fd
+
+    def _load(self) -> bool:
+        """Reload snapshot + journal.  Readers run on the event loop, so once
+        something is loaded a busy lock (another worker compacting or
+        fsyncing) keeps the current snapshot instead of waiting; returns False then."""
+        # Hold the shared file lock so a compaction cannot swap the snapshot
+        # and journal between the two reads.
+        try:
+            fd = self._shared_lock(wait=not self._loaded)
+        except BlockingIOError:
+            return False
+        try:
+            sig = _file_sig(self.path)
+            items: List[Dict[str, Any]] = []
+            if sig is not None:
+                try:
+                    with open(self.path, "r") as f:
+                        items = json.load(f)
+                except Exception as e:
+                    log.error("Failed to load case catalog %s: %s", self.path, e)
+                    items = []
+            self._reset(items if isinstance(items, list) else [])
+            self._sig = sig
+            self._journal_ino = None
+            self._journal_pos = 0
+            self.journal_entries = 0
+            self._read_journal()
+        finally:
+            if fd is not None:
+                os.close(fd)
+        self._loaded = True
+        self.version += 1
+        return True
+
+    def _read_journal(self) -> bool:
+        """Replay journal bytes appended since the last read.
+
+        Returns False when the journal was replaced (compaction) and the
+        snapshot must be reloaded instead.
+        """
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return self._journal_ino is None
+        with f:
+            st = os.fstat(f.fileno())
+            if self._journal_ino is None:
+                self._journal_ino = st.st_ino
+            elif st.st_ino != self._journal_ino or st.st_size < self._journal_pos:
+                return False
+            if st.st_size == self._journal_pos:
+                return True
+            f.seek(self._journal_pos)
+            chunk = f.read(st.st_size - self._journal_pos)
+        # Only consume complete lines; a concurrent append may be half-written.
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self.apply(json.loads(line))
+            except Exception as e:
+                log.error("Skipping bad case journal entry: %s", e)
+            self.journal_entries += 1
+        self._journal_pos += end
+        return True
+
+    def refresh(self, force: bool = False):
+        """Catch up with the snapshot and journal if they changed."""
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            if not self._loaded or _file_sig(self.path) != self._sig or not self._read_journal():
+                self._load()
+
+    def invalidate(self):
+        """Force a full reload on the next read."""
+        with self._lock:
+            self._loaded = False
+
+    def mark_synced(self, journal_pos: int, journal_ino: Optional[int] = None, sig: FileSig = None):
+        """Record that this process itself wrote up to ``journal_pos``."""
+        with self._lock:
+            self._journal_pos = journal_pos
+            if journal_ino is not None:
+                self._journal_ino = journal_ino
+            if sig is not None:
+                self._sig = sig
+
+    def etag_token(self) -> str:
+        """Identifies the on-disk state; equal on every worker that has caught up with it."""
+        self.refresh()
+        ino, mtime, size = self._sig or (0, 0, 0)
+        return "%x-%x-%x-%x-%x" % (ino, mtime, size, self._journal_ino or 0, self._journal_pos)
+
+    # ---- reads ---------------------------------------------------------
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self._by_id.get(case_id)
+
+    def __contains__(self, case_id: str) -> bool:
+        return self.get(case_id) is not None
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._by_id)
+
+    def items(self) -> List[Dict[str, Any]]:
+        """All cases in insertion order."""
+        self.refresh()
+        with self._lock:
+            return list(self._by_id.values())
+
+    def sorted_ids(self) -> List[str]:
+        self.refresh()
+        with self._lock:
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(self._by_id)
+            return self._sorted_ids
+
+    def _pick(self, ids: Iterable[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            by_id = self._by_id
+            return [by_id[i] for i in ids if i in by_id]
+
+    def listed(self, include_deleted: bool = False) -> List[Dict[str, Any]]:
+        """Cases sorted by id, skipping soft-deleted ones unless asked."""
+        ids = self.sorted_ids()
+        if include_deleted:
+            return self._pick(ids)
+        with self._lock:
+            deleted = self._deleted
+            return self._pick(i for i in ids if i not in deleted)
+
+    def _page(self, ids: List[str], after: Optional[str], limit: Optional[int],
+              skip: Set[str] = frozenset()) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # ``ids`` is sorted, so the keyset cursor is a bisect rather than a scan.
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            for i in range(bisect_right(ids, after) if after else 0, len(ids)):
+                cid = ids[i]
+                if cid in skip or cid not in self._by_id:
+                    continue
+                if limit is not None and len(out) == limit:
+                    return out, out[-1]["id"]
+                out.append(self._by_id[cid])
+        return out, None
+
+    def listed_page(self, after: Optional[str] = None, limit: Optional[int] = None,
+                    include_deleted: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Like ``listed`` but starting after id ``after``; returns (items, next cursor)."""
+        ids = self.sorted_ids()
+        with self._lock:
+            return self._page(ids, after, limit, frozenset() if include_deleted else self._deleted)
+
+    def deleted_page(self, after: Optional[str] = None,
+                     limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self.refresh()
+        with self._lock:
+            return self._page(sorted(self._deleted), after, limit)
+
+    def deleted(self) -> List[Dict[str, Any]]:
+        self.refresh()
+        with self._lock:
+            return self._pick(sorted(self._deleted))
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Cases whose ``active`` flag is absent or truthy, in insertion order."""
+        self.refresh()
+        with self._lock:
+            inactive = self._inactive
+            return [x for i, x in self._by_id.items() if i not in inactive]
+
+    def active_page(self, after: Optional[str] = None, limit: Optional[int] = None,
+                    include_inactive: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Insertion-order page for the admin listing; returns (items, next cursor).
+
+        Raises KeyError if the ``after`` case no longer exists.
+        """
+        self.refresh()
+        with self._lock:
+            if after is not None and after not in self._by_id:
+                raise KeyError(after)
+            skip = frozenset() if include_inactive else self._inactive
+            out: List[Dict[str, Any]] = []
+            started = after is None
+            for cid, it in self._by_id.items():
+                if not started:
+                    started = cid == after
+                    continue
+                if cid in skip:
+                    continue
+                if limit is not None and len(out) == limit:
+                    return out, out[-1]["id"]
+                out.append(it)
+        return out, None
+
+    def by_subspecialty(self, sub: str) -> List[Dict[str, Any]]:
+        self.refresh()
+        with self._lock:
+            return self._pick(sorted(self._by_sub.get(sub, ())))
+
+    def subspecialties(self) -> Dict[str, int]:
+        self.refresh()
+        with self._lock:
+            return {k: len(v) for k, v in self._by_sub.items() if v}
@@ -0,0 +1,359 @@
+# case_search.py
+"""Inverted index with BM25 ranking over the case catalog.
+
+Indexed fields are title, tags, subspecialty, boardPrompt and expectedAnswer;
+title/tags/subspecialty terms count more than words in the prompt and answer
+(a simple BM25F: weighted term frequencies, one length norm per case).
+
+Postings are compact ``array`` pairs (case numbers, precomputed BM25 term
+weights), so 50k cases cost tens of MB rather than a dict per posting, and a
+query only touches the postings of its own terms.  The length normalisation
+uses the average case length from the last full build; incremental changes do
+not re-weight other cases until the average drifts by ``renorm_drift``.
+
+``put(case)`` indexes a new or changed case and is a no-op when the indexed
+fields are unchanged, so ``sync`` of a fully reloaded catalog only re-tokenizes
+what differs.  Soft-deleted cases stay indexed but are never returned.
+
+Queries: words must all match (``match_all``) or any may; the last word of the
+query (unless followed by a space) and any word ending in ``*`` match as
+prefixes, expanded to the ``max_expansions`` most common indexed terms.
+Results come with subspecialty facet counts over all matches, computed before
+the subspecialty filter so the other options keep their counts.
+
+Writes may come from worker threads (bulk imports apply the catalog off the
+event loop); one lock serialises them with queries, per case rather than per
+batch, so a query never waits for more than one case's re-index.
+"""
+import heapq, math, re, threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+FIELDS = (("title", 3.0), ("tags", 2.0), ("subspecialty", 2.0), ("boardPrompt", 1.0), ("expectedAnswer", 1.0))
+STOPWORDS = frozenset("""a an and are as at be by for from has have in is it its of on or that the this
+to was were with without which who what when where how than then there these those into no not""".split())
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def _fields(case: Dict[str, Any]) -> Tuple:
+    """The indexed values of a case; equal tuples mean nothing to re-index."""
+    tags = case.get("tags") or ()
+    return (case.get("title") or "", tuple(tags) if isinstance(tags, list) else (str(tags),),
+            case.get("subspecialty") or "", case.get("boardPrompt") or "", case.get("expectedAnswer") or "")
+
+
+class SearchIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_expansions: int = 50, min_prefix: int = 2,
+                 renorm_drift: float = 0.2):
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+        self.min_prefix = min_prefix  # shorter prefixes only match whole words
+        self.renorm_drift = renorm_drift
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._docno: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._fields: List[Optional[Tuple]] = []
+        self._sub: List[str] = []
+        self._len: List[float] = []
+        self._hidden: Set[int] = set()
+        self._post: Dict[str, Tuple[array, array]] = {}
+        self._vocab: List[str] = []          # sorted terms, for prefix expansion
+        self._total_len = 0.0
+        self._avgdl = 0.0                    # pivot the stored weights were computed with
+        self._facets: Counter = Counter()    # subspecialty counts of visible cases
+        self._browse: Optional[List[int]] = None  # visible docnos by id, for empty queries
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._docno)
+
+    # ---- writes --------------------------------------------------------
+    def _terms(self, fields: Tuple) -> Dict[str, float]:
+        tf: Dict[str, float] = {}
+        title, tags, sub, prompt, answer = fields
+        for text, (_, weight) in zip((title, " ".join(map(str, tags)), sub, prompt, answer), FIELDS):
+            for w in tokenize(text):
+                tf[w] = tf.get(w, 0.0) + weight
+        return tf
+
+    def _weight(self, tf: float, dl: float) -> float:
+        return tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / (self._avgdl or dl or 1.0)))
+
+    def _add_postings(self, n: int, tf: Dict[str, float]):
+        dl = self._len[n]
+        for term, f in tf.items():
+            p = self._post.get(term)
+            if p is None:
+                self._post[term] = (array("i", [n]), array("f", [self._weight(f, dl)]))
+                self._vocab.insert(bisect_left(self._vocab, term), term)
+                continue
+            docs, weights = p
+            if not docs or docs[-1] < n:
+                docs.append(n)
+                weights.append(self._weight(f, dl))
+            else:
+                i = bisect_left(docs, n)
+                docs.insert(i, n)
+                weights.insert(i, self._weight(f, dl))
+
+    def _drop_postings(self, n: int, fields: Tuple):
+        for term in self._terms(fields):
+            p = self._post.get(term)
+            if p is None:
+                continue
+            docs, weights = p
+            i = bisect_left(docs, n)
+            if i < len(docs) and docs[i] == n:
+                del docs[i]
+                del weights[i]
+            if not docs:
+                del self._post[term]
+                j = bisect_left(self._vocab, term)
+                if j < len(self._vocab) and self._vocab[j] == term:
+                    del self._vocab[j]
+
+    def _set_visible(self, n: int, visible: bool):
+        if visible == (n not in self._hidden):
+            return
+        if visible:
+            self._hidden.discard(n)
+            self._facets[self._sub[n]] += 1
+        else:
+            self._hidden.add(n)
+            self._facets[self._sub[n]] -= 1
+        self._browse = None
+        self.version += 1
+
+    def put(self, case: Dict[str, Any]):
+        """Index a new or changed case (cheap when the indexed fields are unchanged)."""
+        cid = case.get("id")
+        if not cid:
+            return
+        fields = _fields(case)
+        with self._lock:
+            n = self._docno.get(cid)
+            if n is None:
+                n = self._docno[cid] = len(self._ids)
+                self._ids.append(cid)
+                self._fields.append(None)
+                self._sub.append("")
+                self._len.append(0.0)
+                self._hidden.add(n)  # made visible below
+            elif self._fields[n] == fields:
+                self._set_visible(n, not case.get("deleted"))
+                return
+            else:
+                self._set_visible(n, False)  # facets move with the subspecialty
+                self._drop_postings(n, self._fields[n])
+                self._total_len -= self._len[n]
+            tf = self._terms(fields)
+            self._fields[n] = fields
+            self._sub[n] = fields[2] or "Unknown"
+            self._len[n] = sum(tf.values())
+            self._total_len += self._len[n]
+            if not self._avgdl:
+                self._avgdl = self._len[n] or 1.0
+            self._add_postings(n, tf)
+            self._set_visible(n, not case.get("deleted"))
+            self.version += 1
+            if abs(self._avg() - self._avgdl) > self.renorm_drift * self._avgdl:
+                self._renormalize()
+
+    def remove(self, case_id: str):
+        with self._lock:
+            n = self._docno.pop(case_id, None)
+            if n is None:
+                return
+            self._set_visible(n, False)
+            self._hidden.discard(n)
+            self._drop_postings(n, self._fields[n])
+            self._total_len -= self._len[n]
+            self._ids[n] = None
+            self._fields[n] = None
+            self._len[n] = 0.0
+            self.version += 1
+
+    def set_deleted(self, case_id: str, deleted: bool):
+        with self._lock:
+            n = self._docno.get(case_id)
+            if n is not None:
+                self._set_visible(n, not deleted)
+
+    def sync(self, cases: Iterable[Dict[str, Any]]):
+        """Make the index match ``cases``: a full build when empty, otherwise
+        ``put`` each (unchanged ones cost a tuple compare) and drop the rest."""
+        if not self._docno:
+            return self.rebuild(cases)
+        seen = set()
+        for c in cases:
+            if isinstance(c, dict) and c.get("id"):
+                self.put(c)
+                seen.add(c["id"])
+        self.retain(seen)
+
+    def retain(self, ids: Set[str]):
+        """Drop every case whose id is not in ``ids``."""
+        with self._lock:
+            gone = [cid for cid in self._docno if cid not in ids]
+        for cid in gone:
+            self.remove(cid)
+
+    def rebuild(self, cases: Iterable[Dict[str, Any]]):
+        """Index ``cases`` from scratch with a fresh average-length pivot."""
+        unique: Dict[str, Dict[str, Any]] = {}
+        for c in cases:
+            if isinstance(c, dict) and c.get("id"):
+                unique[c["id"]] = c  # later copy wins, like the catalog
+        with self._lock:
+            self._clear()
+            post: Dict[str, Tuple[array, array]] = {}
+            for cid, c in unique.items():
+                fields = _fields(c)
+                n = self._docno[cid] = len(self._ids)
+                self._ids.append(cid)
+                self._fields.append(fields)
+                self._sub.append(fields[2] or "Unknown")
+                tf = self._terms(fields)
+                self._len.append(sum(tf.values()))
+                for term, f in tf.items():
+                    p = post.get(term)
+                    if p is None:
+                        p = post[term] = (array("i"), array("f"))
+                    p[0].append(n)
+                    p[1].append(f)  # raw frequency; weighted below once the average is known
+                if c.get("deleted"):
+                    self._hidden.add(n)
+                else:
+                    self._facets[self._sub[n]] += 1
+            self._total_len = sum(self._len)
+            self._avgdl = self._avg() or 1.0
+            k1, b = self.k1, self.b
+            norm = [k1 * (1 - b + b * dl / self._avgdl) for dl in self._len]
+            for docs, weights in post.values():
+                for i, (d, f) in enumerate(zip(docs, weights)):
+                    weights[i] = f * (k1 + 1) / (f + norm[d])
+            self._post = post
+            self._vocab = sorted(post)
+            self.version += 1
+
+    def _avg(self) -> float:
+        return self._total_len / len(self._docno) if self._docno else 0.0
+
+    def _renormalize(self):
+        if len(self._docno) >= 1000:
+            log.info("Search index: average case length moved %.0f -> %.0f, re-weighting",
+                     self._avgdl, self._avg())
+        live = [(cid, self._fields[n], n in self._hidden) for cid, n in self._docno.items()]
+        self.rebuild({"id": cid, "title": f[0], "tags": list(f[1]), "subspecialty": f[2], "boardPrompt": f[3],
+                      "expectedAnswer": f[4], "deleted": hidden} for cid, f, hidden in live)
+
+    # ---- queries -------------------------------------------------------
+    def _idf(self, term: str) -> float:
+        df = len(self._post[term][0])
+        return math.log(1 + (len(self._docno) - df + 0.5) / (df + 0.5))
+
+    def _expand(self, prefix: str) -> List[str]:
+        lo = bisect_left(self._vocab, prefix)
+        hi = bisect_right(self._vocab, prefix + "\uffff", lo)
+        terms = self._vocab[lo:hi]
+        if len(terms) > self.max_expansions:
+            terms = heapq.nlargest(self.max_expansions, terms, key=lambda t: len(self._post[t][0]))
+        return terms
+
+    def parse(self, query: str) -> List[Tuple[str, bool]]:
+        """(word, is_prefix) pairs: the trailing word and ``word*`` are prefixes."""
+        q = query.lower()
+        out: List[Tuple[str, bool]] = []
+        end = len(q.rstrip())
+        for m in _WORD.finditer(q):
+            w = m.group()
+            prefix = (m.end() < len(q) and q[m.end()] == "*") or (m.end() == end == len(q))
+            if prefix and len(w) >= self.min_prefix:
+                out.append((w, True))
+            elif w not in STOPWORDS:
+                out.append((w, False))
+        return out
+
+    def _group(self, word: str, prefix: bool) -> Optional[Dict[int, float]]:
+        """docno -> score contribution of one query word (best expansion for prefixes)."""
+        terms = self._expand(word) if prefix else ([word] if word in self._post else [])
+        if not terms:
+            return None
+        if len(terms) == 1:
+            idf = self._idf(terms[0])
+            docs, weights = self._post[terms[0]]
+            return {d: w * idf for d, w in zip(docs, weights)}
+        acc: Dict[int, float] = {}
+        get = acc.get
+        for t in terms:
+            idf = self._idf(t)
+            docs, weights = self._post[t]
+            for d, w in zip(docs, weights):
+                s = w * idf
+                if s > get(d, 0.0):
+                    acc[d] = s
+        return acc
+
+    def search(self, query: str, subspecialties: Optional[Iterable[str]] = None, limit: int = 20,
+               offset: int = 0, match_all: bool = True) -> Dict[str, Any]:
+        """{"total", "hits": [(id, score)], "facets": {subspecialty: count}}"""
+        subs = set(subspecialties or ()) or None
+        words = self.parse(query)
+        with self._lock:
+            if not words:  # browse: visible cases by id
+                if self._browse is None:
+                    self._browse = sorted((n for n in self._docno.values() if n not in self._hidden),
+                                          key=self._ids.__getitem__)
+                facets = {k: v for k, v in self._facets.items() if v > 0}
+                pool = self._browse if subs is None else [n for n in self._browse if self._sub[n] in subs]
+                return {"total": len(pool), "facets": facets,
+                        "hits": [(self._ids[n], 0.0) for n in pool[offset:offset + limit]]}
+
+            groups = []
+            for w, prefix in words:
+                g = self._group(w, prefix)
+                if g is None:
+                    if match_all:
+                        return {"total": 0, "facets": {}, "hits": []}
+                    continue
+                groups.append(g)
+            if not groups:
+                return {"total": 0, "facets": {}, "hits": []}
+            groups.sort(key=len)
+            if match_all:
+                matched = set(groups[0])
+                for g in groups[1:]:
+                    matched &= g.keys()
+            else:
+                matched = set().union(*groups)
+            matched -= self._hidden
+            sub_of = self._sub
+            facets = Counter(sub_of[n] for n in matched)
+            if subs is not None:
+                matched = [n for n in matched if sub_of[n] in subs]
+            if len(groups) == 1:
+                score = groups[0].__getitem__
+            else:
+                scores = {n: sum(g.get(n, 0.0) for g in groups) for n in matched}
+                score = scores.__getitem__
+            top = heapq.nlargest(offset + limit, matched, key=score)[offset:]
+            return {"total": len(matched), "facets": dict(facets),
+                    "hits": [(self._ids[n], round(score(n), 4)) for n in top]}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cases": len(self._docno), "hidden": len(self._hidden), "terms": len(self._post),
+                    "postings": sum(len(d) for d, _ in self._post.values()), "avg_length": round(self._avg(), 1)}
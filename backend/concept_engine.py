@@ -0,0 +1,179 @@
+# concept_engine.py
+"""Single-pass concept detection over transcripts.
+
+The concept dictionary (backend/concepts.json, mirroring frontend/js/concepts.js)
+is compiled into one Aho-Corasick automaton over word tokens.  A concept has:
+
+* ``terms``: phrases that detect it directly;
+* ``near``: co-occurrence rules ``{"a": [...], "b": [...], "window": N}`` that
+  fire when an ``a`` phrase and a ``b`` phrase start within N tokens of each
+  other (0 = anywhere in the text); ``"negatedB": true`` only counts negated
+  ``b`` mentions ("stones ... no hydronephrosis").
+
+Phrase syntax: space-separated tokens, ``a|b`` alternatives, a trailing ``?``
+marks a token optional (``"acute? appendicitis"``).  Text is lower-cased and
+split into words, numbers and the symbols ``>``, ``.`` and ``;``, so
+"peri-appendiceal" matches ``"peri appendiceal"`` and ">6mm" matches ``"> 6 mm"``.
+
+Negation scopes (NegEx-style) are tracked in the same pass: a trigger such as
+"no", "without" or "negative for" opens a scope over the next
+``NEG_SCOPE_TOKENS`` tokens, and a sentence break or "but"/"however" closes it.
+A mention starting inside a scope is negated; a concept is reported as
+``negated`` when all of its evidence was.  As in concepts.js, negated mentions
+still count as the concept being addressed.
+"""
+import json, re
+from collections import deque
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+NEG_SCOPE_TOKENS = 6
+NEGATION_TRIGGERS = ["no", "not", "without", "absent", "negative for", "denies|deny", "free of"]
+SCOPE_TERMINATORS = [".", ";", "but", "however", "although", "except"]
+
+_TOKEN_RE = re.compile(r"[a-z]+|[0-9]+(?:\.[0-9]+)?|[>.;]", re.IGNORECASE)
+
+# slot kinds
+_TERM, _A, _B, _NEG, _STOP = range(5)
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    return [(m.group().lower(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text or "")]
+
+
+def expand_phrase(phrase: str) -> List[Tuple[str, ...]]:
+    """All token sequences a phrase pattern stands for."""
+    choices = []
+    for tok in phrase.lower().split():
+        optional = tok.endswith("?") and len(tok) > 1
+        alts = [t for t in (tok[:-1] if optional else tok).split("|") if t]
+        choices.append(alts + [None] if optional else alts)
+    out = []
+    for combo in product(*choices):
+        seq = tuple(t for t in combo if t is not None)
+        if seq:
+            out.append(seq)
+    return out
+
+
+class ConceptEngine:
+    def __init__(self, concepts: List[Dict[str, Any]]):
+        self.concepts = [c for c in concepts if c.get("id")]
+        # Trie over tokens: goto[state][token] -> state; out[state] -> [(length, slot)]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[Tuple[int, Tuple[int, int, int]]]] = [[]]
+        self.rules: List[Tuple[int, int, bool]] = []  # (concept index, window, negatedB)
+        for phrase in NEGATION_TRIGGERS:
+            self._add(phrase, (_NEG, -1, -1))
+        for phrase in SCOPE_TERMINATORS:
+            self._add(phrase, (_STOP, -1, -1))
+        for ci, c in enumerate(self.concepts):
+            for phrase in c.get("terms") or ():
+                self._add(phrase, (_TERM, ci, -1))
+            for rule in c.get("near") or ():
+                ri = len(self.rules)
+                self.rules.append((ci, int(rule.get("window", 0)), bool(rule.get("negatedB"))))
+                for phrase in rule.get("a") or ():
+                    self._add(phrase, (_A, ci, ri))
+                for phrase in rule.get("b") or ():
+                    self._add(phrase, (_B, ci, ri))
+        self._build_failure_links()
+        self.by_id = {c["id"]: i for i, c in enumerate(self.concepts)}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ConceptEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    # ---- compile -------------------------------------------------------
+    def _add(self, phrase: str, slot: Tuple[int, int, int]):
+        for seq in expand_phrase(phrase):
+            state = 0
+            for tok in seq:
+                nxt = self._goto[state].get(tok)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][tok] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            if (len(seq), slot) not in self._out[state]:
+                self._out[state].append((len(seq), slot))
+
+    def _build_failure_links(self):
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for tok, t in self._goto[s].items():
+                queue.append(t)
+                f = fail[s]
+                while f and tok not in self._goto[f]:
+                    f = fail[f]
+                fail[t] = self._goto[f].get(tok, 0)
+                # Inherit matches ending here via the failure chain (suffix phrases)
+                self._out[t] = self._out[t] + self._out[fail[t]]
+        self._fail = fail
+
+    # ---- scan ----------------------------------------------------------
+    def detect(self, text: str, only: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Concepts found in ``text`` (optionally restricted to ids in ``only``)."""
+        toks = tokenize(text)
+        goto, out, fail = self._goto, self._out, self._fail
+        wanted = None if only is None else {self.by_id[i] for i in only if i in self.by_id}
+        rules = self.rules
+        # concept index -> [count, all negated, (start tok, end tok) of first evidence, via]
+        found: Dict[int, list] = {}
+        last_a: Dict[int, Tuple[int, int, bool]] = {}
+        last_b: Dict[int, Tuple[int, int, bool]] = {}
+        neg_from, neg_until = 0, -1
+        state = 0
+
+        def record(ci, start, end, negated, via):
+            hit = found.get(ci)
+            if hit is None:
+                found[ci] = [1, negated, (start, end), via]
+            else:
+                hit[0] += 1
+                hit[1] = hit[1] and negated
+
+        for i, (tok, _, _) in enumerate(toks):
+            while state and tok not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tok, 0)
+            for length, (kind, ci, ri) in out[state]:
+                start = i - length + 1
+                if kind == _NEG:
+                    neg_from, neg_until = i + 1, i + NEG_SCOPE_TOKENS
+                    continue
+                if kind == _STOP:
+                    neg_until = -1
+                    continue
+                if wanted is not None and ci not in wanted:
+                    continue
+                negated = neg_from <= start <= neg_until
+                if kind == _TERM:
+                    record(ci, start, i, negated, "term")
+                    continue
+                _, window, need_neg_b = rules[ri]
+                if kind == _A:
+                    last_a[ri] = (start, i, negated)
+                    other = last_b.get(ri)
+                else:
+                    if need_neg_b and not negated:
+                        continue
+                    last_b[ri] = (start, i, negated)
+                    other = last_a.get(ri)
+                if other is not None and (window == 0 or abs(start - other[0]) <= window):
+                    a = last_a[ri]
+                    record(ci, min(start, other[0]), max(i, other[1]), a[2], "near")
+
+        results = []
+        for ci, (count, negated, (s, e), via) in sorted(found.items()):
+            c = self.concepts[ci]
+            results.append({
+                "id": c["id"], "label": c.get("label", c["id"]), "hit": True,
+                "negated": negated, "count": count, "via": via,
+                "quote": text[toks[s][1]:toks[e][2]],
+            })
+        return results
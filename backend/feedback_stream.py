@@ -0,0 +1,75 @@
+# feedback_stream.py
+"""Helpers for relaying oral-boards feedback as Server-Sent Events.
+
+The feedback prompt asks the model for four numbered sections.  ``SectionTracker``
+is fed the token stream and reports each section as soon as the next heading (or
+the end of the stream) closes it, so the client can render structured feedback
+before the completion finishes.
+"""
+import json, re
+from typing import Any, Dict, List, Optional
+
+SECTION_KEYS = {1: "done_well", 2: "gaps", 3: "rubric_mapping", 4: "coaching"}
+
+# "1) What was done well", "**2) Gaps**", "### 3. Rubric mapping" at line start
+_HEADING_RE = re.compile(r"^[ \t>#*_]*([1-4])[).][ \t]*(.*)$", re.MULTILINE)
+
+
+def sse(event: str, data: Any) -> str:
+    """Format one SSE frame; ``data`` is JSON-encoded onto a single line."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _clean_title(raw: str) -> str:
+    return raw.strip().strip("*_#: ").rstrip(".:").strip("*_ ")
+
+
+class SectionTracker:
+    def __init__(self):
+        self.text = ""
+        self._scanned = 0          # offset of the first line not yet checked for a heading
+        self._current: Optional[Dict[str, Any]] = None
+        self.sections: List[Dict[str, Any]] = []
+
+    def _close_current(self, end: int) -> Optional[Dict[str, Any]]:
+        cur = self._current
+        self._current = None
+        if cur is None:
+            return None
+        cur["text"] = self.text[cur.pop("_body"):end].strip()
+        self.sections.append(cur)
+        return cur
+
+    def _scan(self, upto: int) -> List[Dict[str, Any]]:
+        done = []
+        for m in _HEADING_RE.finditer(self.text, self._scanned, upto):
+            n = int(m.group(1))
+            # Only accept headings in order, so numbered lists inside a
+            # section ("1) ...") don't split it.
+            expected = (self._current["index"] + 1) if self._current else 1
+            if n != expected:
+                continue
+            closed = self._close_current(m.start())
+            if closed:
+                done.append(closed)
+            self._current = {"index": n, "key": SECTION_KEYS[n],
+                             "title": _clean_title(m.group(2)), "_body": m.end()}
+        self._scanned = upto
+        return done
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """Add streamed text; return sections completed by it."""
+        self.text += delta
+        # Only look at complete lines; a heading may still be arriving.
+        upto = self.text.rfind("\n", self._scanned) + 1
+        if upto <= self._scanned:
+            return []
+        return self._scan(upto)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush the trailing partial line and the last open section."""
+        done = self._scan(len(self.text))
+        closed = self._close_current(len(self.text))
+        if closed:
+            done.append(closed)
+        return done
@@ -0,0 +1,425 @@
+# generation_jobs.py
+"""Background jobs that run one LLM generation over many cases.
+
+An admin submits a job ("generate rubrics for these cases"); its case ids are
+fixed at submit time, so a filter is resolved once.  One worker process at a
+time holds the *runner lease* and works through queued jobs oldest first,
+``concurrency`` cases at a time and at most ``rate_per_min`` cases a minute,
+so a bulk job leaves most of the LLM gateway's slots to interactive requests.
+
+Every finished case is checkpointed as an item record (status, duration,
+staged output or error) as soon as it completes.  A job resumed after a
+restart, or taken over by another worker when the lease holder dies, only
+redoes the cases that were in flight; resuming also retries failed cases.
+The job document holds status and counters, written at most every
+``checkpoint_sec``; admin cancel/pause/resume are compare-and-set updates of
+its ``status`` that the runner notices at its next checkpoint.
+
+Storage, shared by all workers:
+
+* file backend: ``directory/<id>.json`` (the job, atomically replaced under
+  ``jobs.lock``) and ``directory/<id>.items.jsonl`` (appended; the last line
+  per case wins).  The lease is an exclusive ``flock`` on ``runner.lock``,
+  released by the kernel when the holder exits.  File I/O runs in worker
+  threads, and job files are re-parsed only when their stat signature changes.
+* Mongo: ``jobs`` and ``job_items`` collections; the lease is the
+  ``jobs-runner`` document in ``meta``, renewed every ``lease_sec / 3``.
+
+``run_item(job, case_id)`` does the work for one case and returns the item's
+fields (``status`` defaults to "ok"); an exception becomes an "error" item.
+After ``max_failures`` consecutive errors (revoked key, provider outage) the
+job is paused instead of failing every remaining case.
+"""
+import asyncio, contextlib, glob, json, os, socket, threading, time, uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev boxes: single-process only
+    fcntl = None
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+ACTIVE = ("queued", "running")
+FINAL_ITEM = ("ok", "staged", "applied", "skipped")  # not retried on resume
+JOB_SUMMARY_HIDDEN = ("caseIds", "_id")
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class FileJobStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lease_fd: Optional[int] = None
+        # path -> ((mtime_ns, size, ino), job) for the list/next_job scans
+        self._parsed: Dict[str, Any] = {}
+        self._parsed_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str, ext: str = ".json") -> str:
+        return os.path.join(self.directory, job_id + ext)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        fd = os.open(os.path.join(self.directory, "jobs.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, job: Dict[str, Any]):
+        tmp = self._path(job["id"], ".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp, self._path(job["id"]))
+
+    def _create(self, job: Dict[str, Any]):
+        with self._locked():
+            self._write(job)
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        """Every job, re-reading only files that changed since the last scan"""
+        with self._parsed_lock:
+            seen = {}
+            for path in glob.glob(self._path("job-*")):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+                cached = self._parsed.get(path)
+                if cached is not None and cached[0] == sig:
+                    seen[path] = cached
+                    continue
+                job = self._read(os.path.basename(path)[:-5])
+                if job is not None:
+                    seen[path] = (sig, job)
+            self._parsed = seen
+            return [job for _, job in seen.values()]
+
+    def _update(self, job_id: str, fields: Dict[str, Any],
+                expect: Optional[Iterable[str]]) -> Optional[Dict[str, Any]]:
+        with self._locked():
+            job = self._read(job_id)
+            if job is None or (expect is not None and job["status"] not in expect):
+                return None
+            job.update(fields)
+            self._write(job)
+            return job
+
+    def _record(self, job_id: str, item: Dict[str, Any]):
+        with open(self._path(job_id, ".items.jsonl"), "a") as f:
+            f.write(json.dumps(item) + "\n")
+
+    def _items(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self._path(job_id, ".items.jsonl")) as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of a crashed writer
+                    out[item["caseId"]] = item
+        except FileNotFoundError:
+            pass
+        return out
+
+    async def create(self, job: Dict[str, Any]):
+        await asyncio.to_thread(self._create, job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._read, job_id)
+
+    async def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        jobs = await asyncio.to_thread(self._scan)
+        jobs.sort(key=lambda j: j["createdAt"], reverse=True)
+        return [dict(j) for j in jobs[:limit]]
+
+    async def update(self, job_id: str, fields: Dict[str, Any],
+                     expect: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """Set ``fields`` if the job's status is in ``expect``; returns the new job or None."""
+        return await asyncio.to_thread(self._update, job_id, fields, expect)
+
+    async def next_job(self) -> Optional[Dict[str, Any]]:
+        jobs = [j for j in await asyncio.to_thread(self._scan) if j["status"] in ACTIVE]
+        return dict(min(jobs, key=lambda j: j["createdAt"])) if jobs else None
+
+    async def record(self, job_id: str, item: Dict[str, Any]):
+        await asyncio.to_thread(self._record, job_id, item)
+
+    async def items(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        return await asyncio.to_thread(self._items, job_id)
+
+    async def acquire(self, owner: str, lease_sec: float) -> bool:
+        if self._lease_fd is not None or fcntl is None:
+            return True
+        fd = os.open(os.path.join(self.directory, "runner.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lease_fd = fd
+        return True
+
+    async def release(self, owner: str):
+        if self._lease_fd is not None:
+            os.close(self._lease_fd)
+            self._lease_fd = None
+
+
+class MongoJobStore:
+    def __init__(self, db):
+        self.jobs = db.jobs
+        self.items_coll = db.job_items
+        self.meta = db.meta
+
+    async def create(self, job: Dict[str, Any]):
+        await self.jobs.insert_one(dict(job))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        cur = self.jobs.find({}, {"_id": 0, "caseIds": 0}).sort("createdAt", -1).limit(limit)
+        return await cur.to_list(length=limit)
+
+    async def update(self, job_id: str, fields: Dict[str, Any],
+                     expect: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        from pymongo import ReturnDocument
+        query: Dict[str, Any] = {"id": job_id}
+        if expect is not None:
+            query["status"] = {"$in": list(expect)}
+        return await self.jobs.find_one_and_update(query, {"$set": fields}, projection={"_id": 0},
+                                                   return_document=ReturnDocument.AFTER)
+
+    async def next_job(self) -> Optional[Dict[str, Any]]:
+        cur = self.jobs.find({"status": {"$in": list(ACTIVE)}}, {"_id": 0}).sort("createdAt", 1).limit(1)
+        docs = await cur.to_list(length=1)
+        return docs[0] if docs else None
+
+    async def record(self, job_id: str, item: Dict[str, Any]):
+        await self.items_coll.update_one({"job": job_id, "caseId": item["caseId"]},
+                                         {"$set": {**item, "job": job_id}}, upsert=True)
+
+    async def items(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        cur = self.items_coll.find({"job": job_id}, {"_id": 0, "job": 0})
+        return {it["caseId"]: it for it in await cur.to_list(length=None)}
+
+    async def acquire(self, owner: str, lease_sec: float) -> bool:
+        from pymongo.errors import DuplicateKeyError
+        now = time.time()
+        try:
+            await self.meta.update_one(
+                {"_id": "jobs-runner", "$or": [{"owner": owner}, {"until": {"$lt": now}}]},
+                {"$set": {"owner": owner, "until": now + lease_sec}}, upsert=True)
+        except DuplicateKeyError:  # held by a live runner
+            return False
+        return True
+
+    async def release(self, owner: str):
+        await self.meta.update_one({"_id": "jobs-runner", "owner": owner}, {"$set": {"until": 0}})
+
+
+class JobRunner:
+    def __init__(self, store, run_item: Callable[[Dict[str, Any], str], Awaitable[Optional[Dict[str, Any]]]],
+                 concurrency: int = 2, rate_per_min: float = 30.0, poll_sec: float = 2.0,
+                 lease_sec: float = 30.0, checkpoint_sec: float = 1.0, max_failures: int = 5):
+        self.store = store
+        self.run_item = run_item
+        self.concurrency = concurrency
+        self.rate_per_min = rate_per_min
+        self.poll_sec = poll_sec
+        self.lease_sec = lease_sec
+        self.checkpoint_sec = checkpoint_sec
+        self.max_failures = max_failures
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.current: Optional[str] = None  # job id this worker is running
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()  # set by submit/resume in this worker; others poll
+        self._next_slot = 0.0
+        self._pace_lock = asyncio.Lock()
+        self.stats: Dict[str, int] = {"jobs": 0, "items": 0, "errors": 0}
+
+    # ---- lifecycle ---------------------------------------------------------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.store.release(self.owner)
+
+    async def _loop(self):
+        while True:
+            try:
+                if await self.store.acquire(self.owner, self.lease_sec):
+                    job = await self.store.next_job()
+                    if job is not None:
+                        await self._run(job)
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Job runner error")
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll_sec)
+            self._wake.clear()
+
+    # ---- admin actions -----------------------------------------------------
+    async def submit(self, kind: str, mode: str, case_ids: List[str], by: str,
+                     options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        job = {"id": f"job-{uuid.uuid4().hex[:12]}", "kind": kind, "mode": mode,
+               "caseIds": list(dict.fromkeys(case_ids)), "options": options or {}, "status": "queued",
+               "createdBy": by, "createdAt": _now_ms(), "counts": {}, "processed": 0, "runSec": 0.0}
+        job["total"] = len(job["caseIds"])
+        await self.store.create(job)
+        self._wake.set()
+        log.info("JOB %s queued by %s: %s/%s over %d cases", job["id"], by, kind, mode, job["total"])
+        return job
+
+    async def set_status(self, job_id: str, status: str, expect: Iterable[str]) -> Optional[Dict[str, Any]]:
+        fields: Dict[str, Any] = {"status": status}
+        if status == "queued":
+            fields["error"] = None
+        job = await self.store.update(job_id, fields, expect)
+        if job is not None and status == "queued":
+            self._wake.set()
+        return job
+
+    async def summary(self, job: Dict[str, Any], items: Optional[Dict[str, Dict[str, Any]]] = None,
+                      failures: int = 50) -> Dict[str, Any]:
+        """Job document without its case list, plus throughput, ETA and failed cases."""
+        out = {k: v for k, v in job.items() if k not in JOB_SUMMARY_HIDDEN}
+        if items is not None:  # exact; the job's own counts lag by up to checkpoint_sec
+            out["counts"] = dict(Counter(i["status"] for i in items.values()))
+        done = sum(n for s, n in out.get("counts", {}).items() if s in FINAL_ITEM)
+        rate = job["processed"] / job["runSec"] * 60 if job.get("runSec") else None
+        out.update(done=done, remaining=job["total"] - done,
+                   perMinute=round(rate, 1) if rate else None,
+                   etaSec=round((job["total"] - done) / rate * 60) if rate and job["status"] in ACTIVE else None)
+        if items is not None:
+            out["failures"] = [{"caseId": it["caseId"], "error": it.get("error")}
+                               for it in items.values() if it["status"] == "error"][:failures]
+        return out
+
+    # ---- running -----------------------------------------------------------
+    async def _pace(self):
+        if self.rate_per_min <= 0:
+            return
+        async with self._pace_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 60.0 / self.rate_per_min
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _heartbeat(self, stop: asyncio.Event, lost: List[bool]):
+        while not stop.is_set():
+            await asyncio.sleep(self.lease_sec / 3)
+            if not await self.store.acquire(self.owner, self.lease_sec):
+                log.warning("Job runner lease lost; stopping")
+                lost[0] = True
+                stop.set()
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        latest = await self.store.items(job_id)
+        todo = [cid for cid in job["caseIds"] if latest.get(cid, {}).get("status") not in FINAL_ITEM]
+        started = time.monotonic()
+        job = await self.store.update(job_id, {"status": "running", "runner": self.owner,
+                                               "startedAt": job.get("startedAt") or _now_ms(),
+                                               "counts": dict(Counter(i["status"] for i in latest.values()))},
+                                      expect=ACTIVE)
+        if job is None:
+            return  # cancelled meanwhile
+        self.current = job_id
+        self.stats["jobs"] += 1
+        log.info("JOB %s running on %s: %d of %d cases left", job_id, self.owner, len(todo), job["total"])
+
+        base_processed, base_run = job.get("processed", 0), job.get("runSec", 0.0)
+        state = {"processed": 0, "failures": 0, "checkpoint": 0.0, "paused": None}
+        stop = asyncio.Event()
+        lost = [False]
+        queue = list(reversed(todo))
+
+        async def checkpoint(force: bool = False) -> Optional[Dict[str, Any]]:
+            now = time.monotonic()
+            if not force and now - state["checkpoint"] < self.checkpoint_sec:
+                return job
+            state["checkpoint"] = now
+            return await self.store.update(job_id, {
+                "counts": dict(Counter(i["status"] for i in latest.values())),
+                "processed": base_processed + state["processed"],
+                "runSec": round(base_run + now - started, 3),
+                "updatedAt": _now_ms(),
+            }, expect=("running",))
+
+        async def worker():
+            while queue and not stop.is_set():
+                cid = queue.pop()
+                await self._pace()
+                if stop.is_set():
+                    queue.append(cid)
+                    return
+                t0 = time.perf_counter()
+                try:
+                    item = dict(await self.run_item(job, cid) or {})
+                    item.setdefault("status", "ok")
+                except Exception as e:
+                    item = {"status": "error", "error": str(e)[:500] or type(e).__name__}
+                item.update(caseId=cid, ms=round((time.perf_counter() - t0) * 1000), at=_now_ms())
+                await self.store.record(job_id, item)
+                latest[cid] = item
+                state["processed"] += 1
+                self.stats["items"] += 1
+                if item["status"] == "error":
+                    self.stats["errors"] += 1
+                    state["failures"] += 1
+                    if state["failures"] >= self.max_failures and not stop.is_set():
+                        state["paused"] = f"{state['failures']} consecutive failures, last: {item['error']}"
+                        stop.set()
+                else:
+                    state["failures"] = 0
+                if not lost[0] and await checkpoint() is None:
+                    stop.set()  # cancelled or paused by an admin
+
+        beat = asyncio.create_task(self._heartbeat(stop, lost))
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, min(self.concurrency, len(todo))))))
+        finally:
+            beat.cancel()
+            self.current = None
+        if lost[0]:
+            return  # the new lease holder resumes the job
+        if await checkpoint(force=True) is None:
+            log.info("JOB %s stopped by an admin", job_id)
+            return
+        if state["paused"]:
+            await self.store.update(job_id, {"status": "paused", "error": state["paused"]}, expect=("running",))
+            log.warning("JOB %s paused: %s", job_id, state["paused"])
+        else:
+            await self.store.update(job_id, {"status": "done", "finishedAt": _now_ms()}, expect=("running",))
+            log.info("JOB %s done: %d cases in %.1f s", job_id, state["processed"], time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"owner": self.owner, "current": self.current, "concurrency": self.concurrency,
+                "ratePerMin": self.rate_per_min, **self.stats}
@@ -0,0 +1,136 @@
+# image_derivatives.py
+"""Thumbnail and display renditions for case images.
+
+``render`` turns an original PNG/JPEG into a small thumbnail (longest side
+``thumb_px``) and a size-capped display rendition (``display_px``), encoded as
+WebP when Pillow was built with it and progressive JPEG otherwise.  It is a
+plain function over bytes so ``ImageDeriver`` can run it in a process pool:
+decoding and resampling multi-megapixel images is CPU-bound and would stall
+the event loop (and, in threads, the GIL).
+
+Renditions are stored next to the original, ``cases/gi-001/image-1.png`` ->
+``cases/gi-001/image-1.thumb.webp`` / ``image-1.display.webp``.
+
+Pillow is optional; without it ``AVAILABLE`` is False and uploads keep only
+the original.
+"""
+import asyncio, io, multiprocessing, posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+try:
+    from PIL import Image, ImageOps, features
+    AVAILABLE = True
+except ImportError:  # optional dependency
+    Image = ImageOps = features = None
+    AVAILABLE = False
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+
+
+def output_format() -> Tuple[str, str, str]:
+    """(Pillow format, file extension, content type) for renditions."""
+    if AVAILABLE and features.check("webp"):
+        return "WEBP", "webp", "image/webp"
+    return "JPEG", "jpg", "image/jpeg"
+
+
+def derivative_key(key: str, name: str, ext: str) -> str:
+    root, _ = posixpath.splitext(key)
+    return f"{root}.{name}.{ext}"
+
+
+def is_image_key(key: str) -> bool:
+    return posixpath.splitext(key or "")[1].lower() in IMAGE_EXTS
+
+
+def _to_8bit(im):
+    # 16-bit grayscale (common for DICOM exports) would clip in a plain convert
+    if im.mode in ("I;16", "I;16B", "I;16L", "I"):
+        im = im.convert("I").point(lambda v: v * (1 / 256)).convert("L")
+    if im.mode in ("RGBA", "LA", "P"):
+        im = im.convert("RGBA")
+        bg = Image.new("RGB", im.size, (0, 0, 0))
+        bg.paste(im, mask=im.split()[-1])
+        return bg
+    return im if im.mode in ("RGB", "L") else im.convert("RGB")
+
+
+def render(data: bytes, thumb_px: int = 256, display_px: int = 1600,
+           quality: int = 82) -> Dict[str, Any]:
+    """Encode the renditions of one image (runs in a worker process)."""
+    fmt, ext, ctype = output_format()
+    with Image.open(io.BytesIO(data)) as src:
+        width, height = src.size
+        src.draft("RGB", (display_px, display_px))  # JPEG: decode at reduced scale
+        im = _to_8bit(ImageOps.exif_transpose(src))
+        out: Dict[str, Any] = {"width": width, "height": height, "ext": ext,
+                               "contentType": ctype, "renditions": {}}
+        for name, px in (("display", display_px), ("thumb", thumb_px)):
+            if max(im.size) > px:
+                im.thumbnail((px, px), Image.LANCZOS)  # downscales in place, display first
+            buf = io.BytesIO()
+            if fmt == "WEBP":
+                im.save(buf, fmt, quality=quality, method=4)
+            else:
+                im.save(buf, fmt, quality=quality, progressive=True, optimize=True)
+            out["renditions"][name] = (buf.getvalue(), im.width, im.height)
+    return out
+
+
+class ImageDeriver:
+    def __init__(self, client, bucket: Optional[str], workers: int = 2,
+                 thumb_px: int = 256, display_px: int = 1600):
+        self.client = client
+        self.bucket = bucket
+        self.workers = workers
+        self.thumb_px = thumb_px
+        self.display_px = display_px
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return AVAILABLE and self.workers > 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the server process has live threads (uploads, Mongo) unsafe to fork
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def derive(self, key: str, data: Optional[bytes] = None) -> Optional[Dict[str, Any]]:
+        """Render and store the renditions of ``key``; None if disabled or not an image.
+
+        ``data`` is the original's bytes when the caller has them (direct
+        uploads); otherwise the object is fetched from S3 (presigned PUTs).
+        """
+        if not self.enabled or not is_image_key(key):
+            return None
+        if data is None:
+            resp = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+            data = await asyncio.to_thread(resp["Body"].read)
+        loop = asyncio.get_running_loop()
+        try:
+            out = await loop.run_in_executor(self._executor(), render, data, self.thumb_px, self.display_px)
+        except BrokenProcessPool:
+            self.shutdown()  # a worker died (e.g. OOM on a huge image); start fresh next time
+            raise
+        result: Dict[str, Any] = {"width": out["width"], "height": out["height"]}
+        for name, (body, w, h) in out["renditions"].items():
+            dkey = derivative_key(key, name, out["ext"])
+            await asyncio.to_thread(
+                self.client.put_object, Bucket=self.bucket, Key=dkey, Body=body,
+                ContentType=out["contentType"], CacheControl="max-age=31536000",
+            )
+            result[name] = {"key": dkey, "width": w, "height": h, "bytes": len(body)}
+        return result
@@ -0,0 +1,178 @@
+# llm_cache.py
+"""Content-addressed cache for deterministic LLM generations.
+
+Entries are keyed by sha256 of (model, whitespace-normalised messages, sampling
+parameters), so the same admin "generate" click on an unchanged case returns the
+stored result instead of running another completion.
+
+Two tiers:
+
+* an in-process LRU (``max_entries``) checked first, and
+* a shared tier visible to every worker: a directory of JSON files bounded by
+  ``disk_max_bytes`` (oldest files evicted first) or, with Mongo, an
+  ``llm_cache`` collection whose ``expiresAt`` TTL index drops stale entries.
+
+Both tiers honour ``ttl`` seconds.  ``stats`` counts hits per tier and misses.
+"""
+import asyncio, hashlib, json, os, re, tempfile, time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+_WS_RE = re.compile(r"\s+")
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    norm = [{"role": m.get("role", ""), "content": _WS_RE.sub(" ", m.get("content") or "").strip()}
+            for m in messages]
+    blob = json.dumps({"model": model, "messages": norm, "params": params},
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, ttl: float = 7 * 24 * 3600, max_entries: int = 512,
+                 disk_dir: Optional[str] = None, disk_max_bytes: int = 64 * 1024 * 1024,
+                 mongo_collection=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.mongo = mongo_collection
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._mongo_ready = False
+        self.stats: Dict[str, int] = {"hits_memory": 0, "hits_shared": 0, "misses": 0,
+                                      "bypass": 0, "stores": 0, "evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---- memory tier ---------------------------------------------------
+    def _mem_get(self, key: str) -> Optional[Any]:
+        hit = self._mem.get(key)
+        if hit is None:
+            return None
+        expires, value = hit
+        if expires < time.time():
+            del self._mem[key]
+            return None
+        self._mem.move_to_end(key)
+        return value
+
+    def _mem_put(self, key: str, value: Any, expires: float):
+        self._mem[key] = (expires, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # ---- disk tier -----------------------------------------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        try:
+            with open(self._path(key), "r") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if doc.get("expires", 0) < time.time():
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+            return None
+        return doc["expires"], doc["value"]
+
+    def _disk_put(self, key: str, value: Any, expires: float):
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.disk_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"expires": expires, "value": value}, f)
+        os.replace(tmp, self._path(key))
+        self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        total = 0
+        for de in os.scandir(self.disk_dir):
+            if not de.name.endswith(".json"):
+                continue
+            st = de.stat()
+            total += st.st_size
+            entries.append((st.st_mtime, st.st_size, de.path))
+        if total <= self.disk_max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["evictions"] += 1
+            if total <= self.disk_max_bytes:
+                break
+
+    # ---- mongo tier ----------------------------------------------------
+    async def _mongo_setup(self):
+        if not self._mongo_ready:
+            await self.mongo.create_index("expiresAt", expireAfterSeconds=0)
+            self._mongo_ready = True
+
+    async def _mongo_get(self, key: str) -> Optional[tuple]:
+        doc = await self.mongo.find_one({"_id": key})
+        if not doc:
+            return None
+        expires = doc["expiresAt"].replace(tzinfo=timezone.utc).timestamp()
+        if expires < time.time():  # TTL monitor runs only once a minute
+            return None
+        return expires, doc["value"]
+
+    async def _mongo_put(self, key: str, value: Any, expires: float):
+        await self._mongo_setup()
+        await self.mongo.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "expiresAt": datetime.fromtimestamp(expires, timezone.utc)},
+            upsert=True,
+        )
+
+    # ---- public API ----------------------------------------------------
+    async def get(self, key: str) -> Optional[Any]:
+        value = self._mem_get(key)
+        if value is not None:
+            self.stats["hits_memory"] += 1
+            return value
+        hit = None
+        try:
+            if self.mongo is not None:
+                hit = await self._mongo_get(key)
+            elif self.disk_dir:
+                hit = await asyncio.to_thread(self._disk_get, key)
+        except Exception as e:
+            log.warning("LLM cache read failed: %s", e)
+        if hit is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits_shared"] += 1
+        self._mem_put(key, hit[1], hit[0])
+        return hit[1]
+
+    async def set(self, key: str, value: Any):
+        expires = time.time() + self.ttl
+        self._mem_put(key, value, expires)
+        self.stats["stores"] += 1
+        try:
+            if self.mongo is not None:
+                await self._mongo_put(key, value, expires)
+            elif self.disk_dir:
+                await asyncio.to_thread(self._disk_put, key, value, expires)
+        except Exception as e:
+            log.warning("LLM cache write failed: %s", e)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits_memory"] + self.stats["hits_shared"] + self.stats["misses"]
+        hits = self.stats["hits_memory"] + self.stats["hits_shared"]
+        return {**self.stats, "memoryEntries": len(self._mem),
+                "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+                "tier": "mongo" if self.mongo is not None else ("disk" if self.disk_dir else "memory")}
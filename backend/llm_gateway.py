@@ -0,0 +1,186 @@
+# llm_gateway.py
+"""Shared async gateway for chat-completion calls.
+
+All LLM routes go through one ``LLMGateway`` per worker so that:
+
+* calls never block the event loop (``AsyncOpenAI`` instead of the sync client),
+* at most ``max_concurrency`` completions are in flight per worker,
+* every attempt is bounded by ``timeout`` seconds, and
+* transient failures (timeouts, connection errors, 429 and 5xx) are retried
+  with full-jitter exponential backoff.
+
+``stream`` yields content deltas as they arrive; it only retries until the
+stream is open, and then bounds each gap between chunks by the timeout.
+
+``observe``, when set, is called after every ``complete``/``stream`` as
+``observe(op, model, outcome, seconds, usage)`` (usage is the response's
+``usage`` object, or None when the server sent none).
+
+Point ``OPENAI_BASE_URL`` at ``scripts/llm_stub_server.py`` to exercise it offline.
+"""
+import asyncio, random, time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+try:
+    import openai
+    from openai import AsyncOpenAI
+    _RETRYABLE: tuple = (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+        asyncio.TimeoutError,
+    )
+except Exception:  # openai not installed
+    openai = None
+    AsyncOpenAI = None
+    _RETRYABLE = (asyncio.TimeoutError,)
+
+
+class LLMUnavailable(RuntimeError):
+    pass
+
+
+class LLMGateway:
+    def __init__(self, api_key: Optional[str], model: str, base_url: Optional[str] = None,
+                 max_concurrency: int = 8, timeout: float = 60.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, stream_usage: bool = True):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.stream_usage = stream_usage  # ask for a final usage chunk on streams
+        self.observe: Optional[Callable[[str, str, str, float, Any], None]] = None
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.client = None
+        if AsyncOpenAI is not None and api_key:
+            try:
+                # Retries and timeouts are handled here, not by the SDK.
+                self.client = AsyncOpenAI(api_key=api_key, base_url=base_url or None,
+                                          max_retries=0, timeout=timeout)
+            except Exception as e:
+                log.error("Failed to create OpenAI client: %s", e)
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "errors": 0, "timeouts": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    def _observe(self, op: str, model: str, outcome: str, seconds: float, usage: Any = None):
+        if self.observe is not None:
+            try:
+                self.observe(op, model, outcome, seconds, usage)
+            except Exception as e:
+                log.debug("LLM observer failed: %s", e)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _with_retries(self, make_call, timeout: Optional[float]):
+        if not self.enabled:
+            raise LLMUnavailable("OpenAI client not configured")
+        timeout = timeout or self.timeout
+        async with self._sem:
+            self.in_flight += 1
+            try:
+                return await self._attempts(make_call, timeout)
+            finally:
+                self.in_flight -= 1
+
+    async def _attempts(self, make_call, timeout: float):
+        attempt = 0
+        while True:
+            self.stats["calls"] += 1
+            try:
+                return await asyncio.wait_for(make_call(), timeout)
+            except _RETRYABLE as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                if attempt >= self.max_retries:
+                    self.stats["errors"] += 1
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.stats["retries"] += 1
+                log.warning("LLM call failed (%s), retry %d in %.2fs", type(e).__name__, attempt, delay)
+                await asyncio.sleep(delay)
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+
+    async def complete(self, messages: List[Dict[str, str]], *, temperature: Optional[float] = None,
+                       max_tokens: Optional[int] = None, timeout: Optional[float] = None,
+                       model: Optional[str] = None) -> Any:
+        """Return the raw chat-completion response."""
+        kwargs: Dict[str, Any] = {"model": model or self.model, "messages": messages}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        t0 = time.perf_counter()
+        try:
+            resp = await self._with_retries(lambda: self.client.chat.completions.create(**kwargs), timeout)
+        except LLMUnavailable:
+            raise
+        except BaseException as e:
+            outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            self._observe("complete", kwargs["model"], outcome, time.perf_counter() - t0)
+            raise
+        dt = time.perf_counter() - t0
+        log.debug("LLM %s done in %.0f ms", kwargs["model"], dt * 1000)
+        self._observe("complete", kwargs["model"], "ok", dt, getattr(resp, "usage", None))
+        return resp
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Return the text of the first choice ('' if the model sent none)."""
+        resp = await self.complete(messages, **kwargs)
+        return resp.choices[0].message.content or ""
+
+    async def stream(self, messages: List[Dict[str, str]], *, temperature: Optional[float] = None,
+                     max_tokens: Optional[int] = None, timeout: Optional[float] = None,
+                     model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield content deltas of a streamed completion.
+
+        Holds a concurrency slot until the stream is exhausted or closed.
+        """
+        if not self.enabled:
+            raise LLMUnavailable("OpenAI client not configured")
+        timeout = timeout or self.timeout
+        kwargs: Dict[str, Any] = {"model": model or self.model, "messages": messages, "stream": True}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if self.stream_usage:
+            kwargs["stream_options"] = {"include_usage": True}
+        t0, outcome, usage = time.perf_counter(), "error", None
+        async with self._sem:
+            self.in_flight += 1
+            try:
+                resp = await self._attempts(lambda: self.client.chat.completions.create(**kwargs), timeout)
+                chunks = resp.__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            break
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = chunk.usage  # final chunk, no choices
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                    outcome = "ok"
+                finally:
+                    await resp.close()
+            except (GeneratorExit, asyncio.CancelledError):
+                outcome = "cancelled"  # client went away mid-stream
+                raise
+            finally:
+                self.in_flight -= 1
+                self._observe("stream", kwargs["model"], outcome, time.perf_counter() - t0, usage)
@@ -0,0 +1,231 @@
+# media_cache.py
+"""Local disk cache in front of S3 for case images and cine clips.
+
+``MediaCache.fetch(key)`` returns a local file for an S3 object, downloading it
+on a miss.  Objects live under ``root/<2 hex>/<sha1 of key>`` with a ``.meta``
+JSON sidecar (key, content type, ETag, size), so every uvicorn worker sees the
+same cache.  Fills are coalesced twice: concurrent misses in one process await
+the same task, and workers take an ``flock`` on a per-object lock file before
+downloading, so a burst of requests for a cold clip costs one S3 GET.
+
+The directory is bounded by ``max_bytes``.  Hits bump the file's mtime, and
+eviction removes the least recently used files first (whichever worker pushes
+the total over the limit does it under a directory-wide lock).
+
+``sign``/``verify`` make HMAC-signed ``/api/media/<key>?exp=&sig=`` URLs, so
+<img> and <video> tags can fetch through the proxy without an Authorization
+header, like presigned S3 URLs.  Serving (Range requests, X-Accel-Redirect)
+is left to the route.
+"""
+import asyncio, hashlib, hmac, json, mimetypes, os, tempfile, threading, time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: in-process coalescing only
+    fcntl = None
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+
+class CachedObject:
+    __slots__ = ("key", "path", "size", "content_type", "etag", "mtime")
+
+    def __init__(self, key: str, path: str, meta: Dict[str, Any], mtime: float):
+        self.key = key
+        self.path = path
+        self.size = meta["size"]
+        self.content_type = meta.get("contentType") or "application/octet-stream"
+        self.etag = meta.get("etag")
+        self.mtime = mtime
+
+
+class MediaCache:
+    def __init__(self, client, bucket: Optional[str], root: str, max_bytes: int = 2 * 1024 ** 3,
+                 secret: str = "", touch_every: float = 60.0):
+        self.client = client
+        self.bucket = bucket
+        self.root = root
+        self.max_bytes = max_bytes
+        self.secret = secret.encode()
+        self.touch_every = touch_every  # don't rewrite mtime on every hit of a hot file
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._total: Optional[int] = None  # bytes on disk, as last counted by this worker
+        self._lock = threading.Lock()
+        # hits: served from disk; misses: started a fill; coalesced: awaited another
+        # request's fill; filled_elsewhere: a miss another worker filled first
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "coalesced": 0, "filled_elsewhere": 0,
+                                      "fills": 0, "fill_errors": 0, "evictions": 0,
+                                      "bytes_filled": 0, "bytes_served": 0}
+        os.makedirs(root, exist_ok=True)
+
+    # ---- signed URLs -----------------------------------------------------
+    def _sig(self, key: str, exp: int) -> str:
+        return hmac.new(self.secret, f"{key}\n{exp}".encode(), hashlib.sha256).hexdigest()[:32]
+
+    def sign(self, key: str, expires: int, base: str = "/api/media/") -> str:
+        exp = int(time.time()) + expires
+        return f"{base}{quote(key)}?exp={exp}&sig={self._sig(key, exp)}"
+
+    def verify(self, key: str, exp: int, sig: str) -> bool:
+        return exp >= time.time() and hmac.compare_digest(self._sig(key, exp), sig or "")
+
+    # ---- layout ----------------------------------------------------------
+    def _path(self, key: str) -> str:
+        h = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.root, h[:2], h)
+
+    def relpath(self, obj: CachedObject) -> str:
+        """Path of a cached object relative to ``root`` (for X-Accel-Redirect)."""
+        return os.path.relpath(obj.path, self.root).replace(os.sep, "/")
+
+    def _load(self, key: str) -> Optional[CachedObject]:
+        path = self._path(key)
+        try:
+            with open(path + ".meta", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            st = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        if meta.get("key") != key or st.st_size != meta.get("size"):
+            return None
+        if time.time() - st.st_mtime > self.touch_every:
+            try:
+                os.utime(path)  # LRU recency
+            except OSError:
+                pass
+        return CachedObject(key, path, meta, st.st_mtime)
+
+    # ---- fill ------------------------------------------------------------
+    def _fill(self, key: str) -> CachedObject:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            hit = self._load(key)  # another worker may have filled it while we waited
+            if hit is not None:
+                with self._lock:
+                    self.stats["filled_elsewhere"] += 1
+                return hit
+            resp = self.client.get_object(Bucket=self.bucket, Key=key)
+            fd, tmp = tempfile.mkstemp(prefix=".fill-", dir=os.path.dirname(path))
+            size = 0
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    body = resp["Body"]
+                    while True:
+                        buf = body.read(1024 * 1024)
+                        if not buf:
+                            break
+                        f.write(buf)
+                        size += len(buf)
+                os.chmod(tmp, 0o644)  # mkstemp is 0600; nginx serves these via X-Accel-Redirect
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+            meta = {"key": key, "size": size, "etag": resp.get("ETag"),
+                    "contentType": resp.get("ContentType") or mimetypes.guess_type(key)[0]}
+            with open(path + ".meta", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            with self._lock:
+                self.stats["fills"] += 1
+                self.stats["bytes_filled"] += size
+                if self._total is not None:
+                    self._total += size
+            obj = CachedObject(key, path, meta, time.time())
+        finally:
+            os.close(lock_fd)
+        self._maybe_evict()
+        return obj
+
+    async def fetch(self, key: str) -> CachedObject:
+        """Local copy of ``key``, downloading it once on a miss (raises on S3 errors)."""
+        hit = await asyncio.to_thread(self._load, key)
+        if hit is not None:
+            self.stats["hits"] += 1
+            return hit
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut)
+        self.stats["misses"] += 1
+        fut = asyncio.ensure_future(asyncio.to_thread(self._fill, key))
+        self._inflight[key] = fut
+        try:
+            return await asyncio.shield(fut)
+        except Exception:
+            self.stats["fill_errors"] += 1
+            raise
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def served(self, nbytes: int):
+        self.stats["bytes_served"] += nbytes
+
+    # ---- eviction --------------------------------------------------------
+    def _scan(self):
+        files = []
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for de in os.scandir(sub.path):
+                if de.name.startswith(".") or "." in de.name:
+                    continue  # temp files, .meta, .lock
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, de.path))
+        return files
+
+    def _maybe_evict(self):
+        with self._lock:
+            total = self._total
+        if total is not None and total <= self.max_bytes:
+            return
+        lock_fd = os.open(os.path.join(self.root, ".evict.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            files = self._scan()
+            total = sum(size for _, size, _ in files)
+            evicted = 0
+            if total > self.max_bytes:
+                # Evict down to 90% so the next fills don't rescan immediately
+                target = self.max_bytes * 0.9
+                for _, size, path in sorted(files):
+                    if total <= target:
+                        break
+                    for p in (path, path + ".meta"):
+                        try:
+                            os.unlink(p)
+                        except OSError:
+                            pass
+                    total -= size
+                    evicted += 1
+            with self._lock:
+                self._total = total
+                self.stats["evictions"] += evicted
+        finally:
+            os.close(lock_fd)
+
+    def usage(self) -> Tuple[int, int]:
+        files = self._scan()
+        return len(files), sum(size for _, size, _ in files)
+
+    def snapshot(self) -> Dict[str, Any]:
+        s = dict(self.stats)
+        looked = s["hits"] + s["misses"] + s["coalesced"]
+        s["hit_rate"] = round((s["hits"] + s["coalesced"]) / looked, 4) if looked else None
+        s["files"], s["bytes"] = self.usage()
+        s["max_bytes"] = self.max_bytes
+        return s
@@ -0,0 +1,174 @@
+# media_uploader.py
+"""S3 uploads off the event loop, with parallel multipart parts.
+
+``MediaUploader.start`` hands a file object to a bounded thread pool and returns
+an ``UploadJob`` right away; ``await uploader.wait(job)`` lets an async handler
+wait for it without blocking the loop.  Inside the job a single reader thread
+pulls ``part_size`` chunks off the file in order, feeding the SHA-256 of the
+whole object as it goes, and hands each chunk (with its Content-MD5) to a
+shared part pool, keeping at most ``concurrency`` parts of one upload in flight
+so memory stays bounded at ``concurrency * part_size`` per upload.  Files
+smaller than one part go up as a single ``put_object``.  A failed part aborts
+the multipart upload so no orphaned parts are billed.
+
+Every job keeps a progress record (bytes and parts sent, state, checksum,
+throughput) in a small in-process registry for the status endpoint.
+"""
+import asyncio, base64, hashlib, threading, time, uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3's floor for every part but the last
+
+
+class UploadJob:
+    __slots__ = ("id", "key", "state", "bytes_sent", "parts_total", "parts_done", "multipart",
+                 "sha256", "etag", "error", "created", "started", "finished", "future", "_lock")
+
+    def __init__(self, upload_id: str, key: str):
+        self.id = upload_id
+        self.key = key
+        self.state = "queued"  # queued | uploading | done | failed
+        self.bytes_sent = 0
+        self.parts_total = 0
+        self.parts_done = 0
+        self.multipart = False
+        self.sha256: Optional[str] = None
+        self.etag: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def _sent(self, n: int):
+        with self._lock:
+            self.bytes_sent += n
+            self.parts_done += 1
+
+    def status(self) -> Dict[str, Any]:
+        end = self.finished or time.time()
+        secs = (end - self.started) if self.started else 0.0
+        return {
+            "uploadId": self.id,
+            "key": self.key,
+            "state": self.state,
+            "bytesSent": self.bytes_sent,
+            "partsDone": self.parts_done,
+            "partsTotal": self.parts_total,  # grows while the file is still being read
+            "multipart": self.multipart,
+            "sha256": self.sha256,
+            "etag": self.etag,
+            "error": self.error,
+            "seconds": round(secs, 3),
+            "mbPerSec": round(self.bytes_sent / secs / 1e6, 2) if secs else None,
+        }
+
+
+class MediaUploader:
+    def __init__(self, client, bucket: Optional[str], part_size: int = 8 * 1024 * 1024,
+                 concurrency: int = 4, max_uploads: int = 4, max_parts: int = 16, keep: int = 256):
+        self.client = client
+        self.bucket = bucket
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.concurrency = max(1, concurrency)
+        self._jobs_pool = ThreadPoolExecutor(max_workers=max_uploads, thread_name_prefix="s3-upload")
+        self._parts_pool = ThreadPoolExecutor(max_workers=max_parts, thread_name_prefix="s3-part")
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.keep = keep
+
+    # ---- registry --------------------------------------------------------
+    def _register(self, job: UploadJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+
+    def get(self, upload_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(upload_id)
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())[-limit:]
+        return [j.status() for j in reversed(jobs)]
+
+    # ---- upload ----------------------------------------------------------
+    def start(self, fileobj: BinaryIO, key: str, extra: Optional[Dict[str, Any]] = None,
+              upload_id: Optional[str] = None) -> UploadJob:
+        job = UploadJob(upload_id or uuid.uuid4().hex, key)
+        self._register(job)
+        job.future = self._jobs_pool.submit(self._run, job, fileobj, dict(extra or {}))
+        return job
+
+    async def wait(self, job: UploadJob) -> Dict[str, Any]:
+        await asyncio.wrap_future(job.future)
+        return job.status()
+
+    def _run(self, job: UploadJob, fileobj: BinaryIO, extra: Dict[str, Any]):
+        job.started = time.time()
+        job.state = "uploading"
+        sha = hashlib.sha256()
+        upload_id = None
+        try:
+            chunk = fileobj.read(self.part_size)
+            sha.update(chunk)
+            if len(chunk) < self.part_size:
+                job.parts_total = 1
+                resp = self.client.put_object(Bucket=self.bucket, Key=job.key, Body=chunk,
+                                              ContentMD5=_md5_b64(chunk), **extra)
+                job._sent(len(chunk))
+                job.etag = (resp or {}).get("ETag")
+            else:
+                job.multipart = True
+                upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=job.key, **extra)["UploadId"]
+                slots = threading.BoundedSemaphore(self.concurrency)
+                futures: List[Future] = []
+                number = 0
+                while chunk:
+                    number += 1
+                    job.parts_total = number
+                    slots.acquire()
+                    if any(f.done() and f.exception() for f in futures):
+                        slots.release()
+                        break
+                    fut = self._parts_pool.submit(self._part, job, upload_id, number, chunk)
+                    fut.add_done_callback(lambda _f: slots.release())
+                    futures.append(fut)
+                    chunk = fileobj.read(self.part_size)
+                    sha.update(chunk)
+                parts = [f.result() for f in futures]  # re-raises the first failed part
+                resp = self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=job.key, UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+                job.etag = (resp or {}).get("ETag")
+            job.sha256 = sha.hexdigest()
+            job.state = "done"
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            log.exception("S3 upload %s (%s) failed", job.id, job.key)
+            if upload_id:
+                try:
+                    self.client.abort_multipart_upload(Bucket=self.bucket, Key=job.key, UploadId=upload_id)
+                except Exception:
+                    log.warning("Abort of multipart upload %s failed", upload_id)
+        finally:
+            job.finished = time.time()
+
+    def _part(self, job: UploadJob, upload_id: str, number: int, data: bytes) -> Dict[str, Any]:
+        resp = self.client.upload_part(Bucket=self.bucket, Key=job.key, UploadId=upload_id,
+                                       PartNumber=number, Body=data, ContentMD5=_md5_b64(data))
+        job._sent(len(data))
+        return {"PartNumber": number, "ETag": resp["ETag"]}
+
+
+def _md5_b64(data: bytes) -> str:
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
@@ -0,0 +1,353 @@
+# metrics.py
+"""Request, LLM and S3 metrics in Prometheus text format, summed across workers.
+
+``Metrics`` holds counters, gauges and histograms in plain dicts keyed by label
+tuples; recording is a lock and a few additions.  uvicorn runs several worker
+processes, so each worker also writes its state to ``<directory>/worker-<pid>.json``
+every ``flush_every`` seconds, and ``render()`` sums every worker's file:
+
+* counters and histograms are summed over all workers, dead ones included --
+  a dead worker's file is folded into ``archive.json`` so totals never go
+  backwards when a worker is replaced;
+* gauges (requests in flight) are summed over live workers only.
+
+Other workers' numbers are therefore up to ``flush_every`` seconds old.  Without
+a directory only this process is reported.
+
+``MetricsMiddleware`` times requests per route: it wraps each route's ASGI app,
+so the route label is the path template (``/api/cases/{case_id}``) at no
+matching cost, and it writes a sampled one-line access log.
+``instrument_botocore`` times every call of a boto3 client.
+"""
+import bisect, json, os, random, tempfile, threading, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no cross-worker aggregation
+    fcntl = None
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+Labels = Tuple[str, ...]
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metrics:
+    def __init__(self, directory: Optional[str] = None, flush_every: float = 5.0):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        # name -> (type, help, label names, buckets)
+        self._meta: Dict[str, Tuple[str, str, Tuple[str, ...], Tuple[float, ...]]] = {}
+        self._values: Dict[str, Dict[Labels, Any]] = {}  # counter/gauge: float; histogram: [counts, sum, n]
+        self._flushed = False
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # ---- declaration -----------------------------------------------------
+    def _declare(self, kind: str, name: str, help: str, labels: Sequence[str], buckets=()):
+        self._meta[name] = (kind, help, tuple(labels), tuple(buckets))
+        self._values.setdefault(name, {})
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()):
+        self._declare("counter", name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()):
+        self._declare("gauge", name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self._declare("histogram", name, help, labels, buckets)
+
+    # ---- recording -------------------------------------------------------
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0):
+        with self._lock:
+            series = self._values[name]
+            series[labels] = series.get(labels, 0.0) + value
+
+    add = inc  # gauges: add(+1) / add(-1)
+
+    def observe(self, name: str, labels: Labels, value: float):
+        buckets = self._meta[name][3]
+        i = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._values[name]
+            h = series.get(labels)
+            if h is None:
+                h = series[labels] = [[0] * (len(buckets) + 1), 0.0, 0]
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    # ---- cross-worker files ----------------------------------------------
+    # File format: {name: {"type": kind, "series": [[labels, value], ...]}}
+    def dump(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for name, series in self._values.items():
+                kind = self._meta[name][0]
+                if kind == "histogram":
+                    rows = [[list(k), [list(h[0]), h[1], h[2]]] for k, h in series.items()]
+                else:
+                    rows = [[list(k), v] for k, v in series.items()]
+                out[name] = {"type": kind, "series": rows}
+            return out
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, path: str, state: Dict[str, Dict[str, Any]]):
+        fd, tmp = tempfile.mkstemp(prefix=".metrics-", dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _merge(into: Dict[str, Dict[str, Any]], state: Dict[str, Dict[str, Any]], gauges: bool):
+        for name, entry in state.items():
+            kind = entry.get("type")
+            if kind == "gauge" and not gauges:
+                continue  # a dead worker has nothing in flight
+            target = into.setdefault(name, {"type": kind, "series": {}})["series"]
+            for labels, v in entry.get("series", []):
+                key = tuple(labels)
+                if kind == "histogram":
+                    h = target.get(key)
+                    if h is None or len(h[0]) != len(v[0]):
+                        target[key] = [list(v[0]), v[1], v[2]]
+                    else:
+                        h[0] = [a + b for a, b in zip(h[0], v[0])]
+                        h[1] += v[1]
+                        h[2] += v[2]
+                else:
+                    target[key] = target.get(key, 0.0) + v
+
+    @staticmethod
+    def _encode(merged: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return {name: {"type": e["type"], "series": [[list(k), v] for k, v in e["series"].items()]}
+                for name, e in merged.items()}
+
+    def _flock(self) -> int:
+        fd = os.open(self._path(".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _archive(self, paths: List[str], archive: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Fold dead workers' files into archive.json (caller holds the lock)."""
+        if archive is None:
+            archive = {}
+            self._merge(archive, self._read(self._path("archive.json")), gauges=False)
+        for p in paths:
+            self._merge(archive, self._read(p), gauges=False)
+        self._write(self._path("archive.json"), self._encode(archive))
+        for p in paths:
+            try:
+                os.unlink(p)
+            except OSError:
+                pass
+
+    def flush(self):
+        """Write this worker's state for the others to read."""
+        if not self.directory:
+            return
+        own = self._path(f"worker-{self.pid}.json")
+        if not self._flushed:
+            self._flushed = True
+            if os.path.exists(own):  # left by a dead worker that had our pid
+                fd = self._flock()
+                try:
+                    self._archive([own])
+                finally:
+                    os.close(fd)
+        self._write(own, self.dump())
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """{name: {"type", "series": {labels: value}}} summed over every worker."""
+        merged: Dict[str, Dict[str, Any]] = {}
+        if not self.directory:
+            self._merge(merged, self.dump(), gauges=True)
+            return merged
+        self.flush()
+        fd = self._flock()
+        try:
+            archive: Dict[str, Dict[str, Any]] = {}
+            self._merge(archive, self._read(self._path("archive.json")), gauges=False)
+            dead = []
+            for de in os.scandir(self.directory):
+                if not (de.name.startswith("worker-") and de.name.endswith(".json")):
+                    continue
+                try:
+                    pid = int(de.name[7:-5])
+                except ValueError:
+                    continue
+                if pid == self.pid or _pid_alive(pid):
+                    self._merge(merged, self._read(de.path), gauges=True)
+                else:
+                    dead.append(de.path)
+            if dead:
+                self._archive(dead, archive)  # adds them to ``archive`` too
+            self._merge(merged, self._encode(archive), gauges=False)
+        finally:
+            os.close(fd)
+        return merged
+
+    # ---- exposition ------------------------------------------------------
+    def render(self) -> str:
+        merged = self.collect()
+        out: List[str] = []
+        for name, (kind, help, labelnames, buckets) in self._meta.items():
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            for key, v in sorted(merged.get(name, {}).get("series", {}).items()):
+                pairs = [f'{n}="{_escape(str(x))}"' for n, x in zip(labelnames, key)]
+                if kind != "histogram":
+                    out.append(f"{name}{{{','.join(pairs)}}} {_fmt(v)}" if pairs else f"{name} {_fmt(v)}")
+                    continue
+                counts, total, n = v
+                cum = 0
+                for le, c in zip(list(buckets) + [float("inf")], counts):
+                    cum += c
+                    le_pair = 'le="%s"' % _fmt(le)
+                    out.append(f"{name}_bucket{{{','.join(pairs + [le_pair])}}} {cum}")
+                lbl = f"{{{','.join(pairs)}}}" if pairs else ""
+                out.append(f"{name}_sum{lbl} {_fmt(total)}")
+                out.append(f"{name}_count{lbl} {n}")
+        return "\n".join(out) + "\n"
+
+
+class MetricsMiddleware:
+    """Per-route request metrics and a sampled access log (pure ASGI, so streamed
+    responses are timed to their last byte)."""
+
+    def __init__(self, app, metrics: Metrics, routes_of, log_sample: float = 0.01,
+                 slow_ms: float = 1000.0):
+        self.app = app
+        self.metrics = metrics
+        self.routes_of = routes_of  # the FastAPI app whose routes get wrapped
+        self.log_sample = log_sample
+        self.slow_ms = slow_ms
+        self._wrapped = 0
+        metrics.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+        metrics.histogram("http_request_duration_seconds", "Time to last response byte", ("method", "route"))
+        metrics.gauge("http_requests_in_flight", "Requests being handled", ("method", "route"))
+
+    def _wrap_routes(self):
+        routes = self.routes_of.router.routes
+        for route in routes:
+            if getattr(route, "_metrics_wrapped", False) or not hasattr(route, "app"):
+                continue
+            route.app = self._timed(route.app, route.path)
+            route._metrics_wrapped = True
+        self._wrapped = len(routes)
+
+    def _timed(self, inner, path: str):
+        metrics = self.metrics
+
+        async def app(scope, receive, send):
+            if scope["type"] != "http":
+                return await inner(scope, receive, send)
+            key = (scope["method"], path)
+            status = [500]
+
+            async def send_status(msg):
+                if msg["type"] == "http.response.start":
+                    status[0] = msg["status"]
+                await send(msg)
+
+            metrics.add("http_requests_in_flight", key, 1)
+            t0 = time.perf_counter()
+            try:
+                await inner(scope, receive, send_status)
+            finally:
+                dt = time.perf_counter() - t0
+                metrics.add("http_requests_in_flight", key, -1)
+                metrics.observe("http_request_duration_seconds", key, dt)
+                metrics.inc("http_requests_total", key + (str(status[0]),))
+                scope["metrics.route"] = (path, status[0], dt)
+        return app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self._wrapped != len(self.routes_of.router.routes):
+            self._wrap_routes()  # first request, or routes added since
+        status = [500]
+
+        async def send_status(msg):
+            if msg["type"] == "http.response.start":
+                status[0] = msg["status"]
+            await send(msg)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            timed = scope.get("metrics.route")
+            if timed is None:  # no route matched (404/405) or answered by a middleware (CORS preflight)
+                dt = time.perf_counter() - t0
+                timed = ("unmatched", status[0], dt)
+                key = (scope["method"], "unmatched")
+                self.metrics.observe("http_request_duration_seconds", key, dt)
+                self.metrics.inc("http_requests_total", key + (str(status[0]),))
+            route, code, dt = timed
+            ms = dt * 1000
+            if code >= 500 or ms >= self.slow_ms or random.random() < self.log_sample:
+                log.info("request method=%s route=%s path=%s status=%d ms=%.1f",
+                         scope["method"], route, scope["path"], code, ms)
+
+
+def instrument_botocore(client, metrics: Metrics, name: str, service: str):
+    """Observe every call of a boto3 ``client`` (retries included) in histogram ``name``."""
+    metrics.histogram(name, f"{service} API call latency", ("operation", "outcome"))
+
+    def before(model, context, **kwargs):
+        context["metrics_op"] = model.name
+        context["metrics_t0"] = time.perf_counter()
+
+    def after(http_response, model, context, **kwargs):
+        t0 = context.get("metrics_t0")
+        if t0 is not None:
+            ok = http_response is not None and http_response.status_code < 400
+            metrics.observe(name, (model.name, "ok" if ok else "error"), time.perf_counter() - t0)
+
+    def after_error(context, **kwargs):
+        t0 = context.get("metrics_t0")
+        if t0 is not None:
+            op = context.get("metrics_op", "unknown")
+            metrics.observe(name, (op, "error"), time.perf_counter() - t0)
+
+    events = client.meta.events
+    events.register(f"before-parameter-build.{service}", before)
+    events.register(f"after-call.{service}", after)
+    events.register(f"after-call-error.{service}", after_error)
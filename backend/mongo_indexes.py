@@ -0,0 +1,102 @@
+# mongo_indexes.py
+"""Index bootstrap and query-plan checks for the Mongo backend.
+
+``INDEXES`` lists every index the hot queries rely on; ``ensure_indexes`` creates
+them at startup (``create_index`` is a no-op for an index that already exists).
+
+``HOT_QUERIES`` mirrors the queries issued by the routes, and ``explain_queries``
+runs ``explain()`` on each and reports the winning plan's stages, the index
+used and how many documents were examined, flagging collection scans.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+# (collection, keys, options)
+INDEXES: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    ("cases", [("id", 1)], {"unique": True, "name": "id_unique"}),
+    ("cases", [("deleted", 1), ("id", 1)], {"name": "deleted_id"}),
+    ("cases", [("active", 1), ("created_at", -1), ("id", 1)], {"name": "active_created_id"}),
+    ("attempts", [("user", 1), ("ts", 1)], {"name": "user_ts"}),
+    ("progress_rollups", [("user", 1)], {"unique": True, "name": "user_unique"}),
+    ("users", [("email", 1)], {"unique": True, "name": "email_unique"}),
+    ("uploads", [("at", 1)], {"expireAfterSeconds": 86400, "name": "at_ttl"}),
+    ("revocations", [("sub", 1)], {"unique": True, "name": "sub_unique"}),
+    ("revocations", [("expiresAt", 1)], {"expireAfterSeconds": 0, "name": "expires_ttl"}),
+    ("jobs", [("id", 1)], {"unique": True, "name": "id_unique"}),
+    ("jobs", [("status", 1), ("createdAt", 1)], {"name": "status_created"}),
+    ("job_items", [("job", 1), ("caseId", 1)], {"unique": True, "name": "job_case_unique"}),
+]
+
+# name -> (collection, filter, sort); a sample id / user is filled in at explain time
+HOT_QUERIES: Dict[str, Tuple[str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = {
+    "case by id": ("cases", {"id": "$case"}, None),
+    "case listing": ("cases", {"deleted": {"$ne": True}}, [("id", 1)]),
+    "case listing page": ("cases", {"deleted": {"$ne": True}, "id": {"$gt": "$case"}}, [("id", 1)]),
+    "trash": ("cases", {"deleted": True}, [("id", 1)]),
+    "admin listing": ("cases", {"active": True}, [("created_at", -1), ("id", 1)]),
+    "attempts by user": ("attempts", {"user": "$user"}, [("ts", 1)]),
+    "progress rollup": ("progress_rollups", {"user": "$user"}, None),
+    "user by email": ("users", {"email": "$user"}, None),
+    "revocation by user": ("revocations", {"sub": "$user"}, None),
+    "next job": ("jobs", {"status": {"$in": ["queued", "running"]}}, [("createdAt", 1)]),
+}
+
+
+async def ensure_indexes(db) -> List[str]:
+    """Create missing indexes; failures (e.g. duplicate ids) are logged, not raised."""
+    made = []
+    for coll, keys, opts in INDEXES:
+        try:
+            made.append(f"{coll}.{await db[coll].create_index(keys, **opts)}")
+        except Exception as e:
+            log.error("Could not create index %s on %s: %s", opts.get("name"), coll, e)
+    return made
+
+
+def _fill(value: Any, samples: Dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        return {k: _fill(v, samples) for k, v in value.items()}
+    if isinstance(value, str) and value.startswith("$") and value[1:] in samples:
+        return samples[value[1:]]
+    return value
+
+
+def _stages(plan: Dict[str, Any], out: List[Dict[str, Any]]):
+    # Classic plans nest inputStage(s); SBE plans wrap them in queryPlan.
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    out.append({k: plan[k] for k in ("stage", "indexName") if k in plan})
+    for child in ([plan["inputStage"]] if "inputStage" in plan else []) + plan.get("inputStages", []):
+        _stages(child, out)
+    return out
+
+
+def summarize_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    winning = (explain.get("queryPlanner") or {}).get("winningPlan") or {}
+    stages = _stages(winning, [])
+    stats = explain.get("executionStats") or {}
+    return {
+        "stages": [s.get("stage") for s in stages],
+        "indexes": sorted({s["indexName"] for s in stages if "indexName" in s}),
+        "collscan": any(s.get("stage") == "COLLSCAN" for s in stages),
+        "docsExamined": stats.get("totalDocsExamined"),
+        "keysExamined": stats.get("totalKeysExamined"),
+        "nReturned": stats.get("nReturned"),
+        "millis": stats.get("executionTimeMillis"),
+    }
+
+
+async def explain_queries(db, case_id: str = "", user: str = "") -> Dict[str, Any]:
+    samples = {"case": case_id, "user": user}
+    out: Dict[str, Any] = {}
+    for name, (coll, filt, sort) in HOT_QUERIES.items():
+        cur = db[coll].find(_fill(filt, samples))
+        if sort:
+            cur = cur.sort(sort)
+        try:
+            out[name] = {"collection": coll, **summarize_plan(await cur.explain())}
+        except Exception as e:
+            out[name] = {"collection": coll, "error": str(e)}
+    return out
@@ -0,0 +1,108 @@
+# password_hasher.py
+"""bcrypt hashing and verification off the event loop.
+
+A bcrypt verify at the default cost is ~0.3 s of pure CPU, and the ``bcrypt``
+package holds the GIL while it runs, so neither the event loop nor a thread
+pool can overlap it with other requests.  ``PasswordHasher`` runs ``hash`` and
+``verify_and_update`` in a small spawn process pool instead.
+
+``verify`` does a single bcrypt computation per attempt and also reports
+whether the stored hash is out of date (cost or scheme changed in the
+context), returning the replacement hash so the caller can store it -- users
+are migrated to new parameters the next time they log in.  Attempts for
+unknown accounts verify against a dummy hash so they take as long as real ones.
+
+The pool is bounded: at most ``max_pending`` operations may be queued or
+running per process; beyond that ``PoolBusy`` is raised (the API answers 503)
+rather than letting a login storm queue minutes of work.
+"""
+import asyncio, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+
+class PoolBusy(Exception):
+    pass
+
+
+@lru_cache(maxsize=4)
+def make_context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+def _hash(password: str, rounds: int) -> str:
+    return make_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    try:
+        return make_context(rounds).verify_and_update(password, hashed)
+    except (ValueError, TypeError):  # malformed / unknown hash format
+        return False, None
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = 2, rounds: int = 12, max_pending: int = 64):
+        self.workers = workers
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self.context = make_context(rounds)
+        self.stats = {"hashes": 0, "verifies": 0, "rehashes": 0, "rejected": 0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._dummy: Optional[str] = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None  # PASSWORD_HASH_WORKERS=0: default thread pool (still off the loop)
+        if self._pool is None:
+            # spawn: the server process has live threads (uploads, Mongo) unsafe to fork
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise PoolBusy()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        except BrokenProcessPool:
+            self.shutdown()  # a worker died; start fresh next time
+            raise
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        self.stats["hashes"] += 1
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """(matches, new hash to store or None).  ``hashed=None`` for unknown users."""
+        if not hashed:
+            if self._dummy is None:
+                self._dummy = await self.hash("dummy password for unknown accounts")
+            await self._run(_verify_and_update, password, self._dummy, self.rounds)
+            self.stats["verifies"] += 1
+            return False, None
+        ok, new_hash = await self._run(_verify_and_update, password, hashed, self.rounds)
+        self.stats["verifies"] += 1
+        if ok and new_hash:
+            self.stats["rehashes"] += 1
+        return ok, (new_hash if ok else None)
+
+    def snapshot(self):
+        return dict(self.stats, pending=self._pending, workers=self.workers, rounds=self.rounds)
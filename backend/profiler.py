@@ -0,0 +1,302 @@
+# profiler.py
+"""On-demand and sampled profiling of single requests.
+
+``ProfilerMiddleware`` runs a request under a profiler in two cases:
+
+* on demand: the request carries ``X-Profile: 1`` (or ``cprofile`` /
+  ``pyinstrument`` to pick the engine) and ``authorize`` accepts the caller.
+  The response gets an ``X-Profile-Id`` header naming the stored profile.
+* sampled: a ``sample_rate`` fraction of ordinary requests is profiled, and
+  only the ``keep_slowest`` slowest per route are kept, so the directory ends
+  up holding the worst cases of every route.
+
+Engines: pyinstrument (optional dependency) samples the request's own task
+(``async_mode="enabled"``) and stores an HTML flame graph; cProfile is
+deterministic and stores pstats.  cProfile sees everything the worker's event
+loop runs while the request is in flight, other requests included, and costs
+roughly 2x in CPU; pyinstrument only attributes the profiled task.  Each
+worker profiles one request at a time; an on-demand request that finds the
+profiler busy runs normally with ``X-Profile: busy``.
+
+Profiles live in ``directory`` as ``<id>.html``/``<id>.pstats`` plus an
+``<id>.json`` sidecar (route, status, duration, ...), so any uvicorn worker can
+list and serve every worker's profiles.  With no ``X-Profile`` header and
+``sample_rate=0`` a request costs one header scan.
+"""
+import asyncio, contextlib, cProfile, glob, hashlib, io, json, os, pstats, random, re, threading, time, uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev boxes: single-process only
+    fcntl = None
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+    SAMPLING = True
+except ImportError:  # optional dependency: cProfile only
+    SamplingProfiler = None
+    SAMPLING = False
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+ENGINES = ("cprofile", "pyinstrument")
+FORMATS = {"cprofile": "pstats", "pyinstrument": "html"}
+_ID_RE = re.compile(r"^(d|s-[0-9a-f]{8})-[0-9a-f]{16}$")
+
+
+class _Session:
+    """One running profiler."""
+
+    def __init__(self, engine: str, interval: float):
+        self.engine = engine
+        if engine == "pyinstrument":
+            self._p = SamplingProfiler(interval=interval, async_mode="enabled")
+            self._p.start()
+        else:
+            self._p = cProfile.Profile()
+            self._p.enable()
+
+    def stop(self):
+        if self.engine == "pyinstrument":
+            self._p.stop()
+        else:
+            self._p.disable()
+
+    def write(self, path: str):
+        if self.engine == "pyinstrument":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._p.output_html())
+        else:
+            self._p.dump_stats(path)
+
+
+class RequestProfiler:
+    def __init__(self, directory: str, engine: str = "auto", sample_rate: float = 0.0,
+                 keep_slowest: int = 5, keep_recent: int = 50, interval: float = 0.001):
+        if engine == "auto":
+            engine = "pyinstrument" if SAMPLING else "cprofile"
+        elif engine == "pyinstrument" and not SAMPLING:
+            log.warning("PROFILER=pyinstrument but pyinstrument is not installed; using cProfile")
+            engine = "cprofile"
+        if engine not in ENGINES:
+            raise ValueError(f"unknown profiler {engine!r}")
+        self.directory = directory
+        self.engine = engine
+        self.sample_rate = sample_rate
+        self.keep_slowest = keep_slowest  # sampled profiles kept per route
+        self.keep_recent = keep_recent    # on-demand profiles kept
+        self.interval = interval
+        self._active = False              # one profile per worker at a time
+        self._lock = threading.Lock()     # keep/evict decisions: this worker (see _locked)
+        self.stats: Dict[str, int] = {"on_demand": 0, "sampled": 0, "kept": 0, "discarded": 0, "busy": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    # ---- running -----------------------------------------------------------
+    def wants_sample(self) -> bool:
+        return self.sample_rate > 0 and not self._active and random.random() < self.sample_rate
+
+    def start(self, engine: Optional[str] = None) -> Optional[_Session]:
+        if self._active:
+            self.stats["busy"] += 1
+            return None
+        engine = engine if engine in ENGINES and (engine != "pyinstrument" or SAMPLING) else self.engine
+        self._active = True
+        try:
+            return _Session(engine, self.interval)
+        except Exception as e:  # e.g. another profiler/tracer already owns the thread
+            self._active = False
+            log.warning("Profiler did not start: %s", e)
+            return None
+
+    def stop(self, session: _Session):
+        try:
+            session.stop()
+        finally:
+            self._active = False
+
+    # ---- storing -----------------------------------------------------------
+    @staticmethod
+    def new_id(route: Optional[str] = None) -> str:
+        if route is None:
+            return f"d-{uuid.uuid4().hex[:16]}"
+        return f"s-{hashlib.sha1(route.encode()).hexdigest()[:8]}-{uuid.uuid4().hex[:16]}"
+
+    def _path(self, pid: str, ext: str) -> str:
+        return os.path.join(self.directory, pid + ext)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Serialise read-decide-write-evict over this worker's threads and,
+        via ``profiles.lock``, over every worker sharing ``directory``."""
+        with self._lock:
+            fd = os.open(os.path.join(self.directory, "profiles.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _write(self, pid: str, session: _Session, meta: Dict[str, Any]):
+        fmt = FORMATS[session.engine]
+        session.write(self._path(pid, "." + fmt))
+        meta = {**meta, "id": pid, "engine": session.engine, "format": fmt}
+        tmp = self._path(pid, ".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(pid, ".json"))  # the sidecar appears last: listed => complete
+
+    def _remove(self, pid: str):
+        for ext in (".json", ".html", ".pstats"):
+            try:
+                os.unlink(self._path(pid, ext))
+            except FileNotFoundError:
+                pass
+
+    def save_on_demand(self, pid: str, session: _Session, meta: Dict[str, Any]):
+        self.stats["on_demand"] += 1
+        self._write(pid, session, meta)
+        self.stats["kept"] += 1
+        with self._locked():
+            kept = sorted(glob.glob(self._path("d-*", ".json")), key=os.path.getmtime)
+            for path in kept[:max(0, len(kept) - self.keep_recent)]:
+                self._remove(os.path.basename(path)[:-5])
+
+    def save_sampled(self, pid: str, session: _Session, meta: Dict[str, Any]):
+        """Keep the profile if it is among the route's ``keep_slowest`` slowest
+        (over all workers: the decision reads the route's sidecars under
+        ``profiles.lock``)."""
+        self.stats["sampled"] += 1
+        with self._locked():
+            prefix = pid.rsplit("-", 1)[0]
+            kept: List[Tuple[float, str]] = []
+            for path in glob.glob(self._path(prefix + "-*", ".json")):
+                try:
+                    with open(path) as f:
+                        kept.append((float(json.load(f)["ms"]), os.path.basename(path)[:-5]))
+                except (OSError, ValueError, KeyError):
+                    continue
+            kept.sort()
+            if len(kept) >= self.keep_slowest and (not kept or meta["ms"] <= kept[0][0]):
+                self.stats["discarded"] += 1
+                return
+            self._write(pid, session, meta)
+            self.stats["kept"] += 1
+            for _, old in kept[:max(0, len(kept) + 1 - self.keep_slowest)]:
+                self._remove(old)
+
+    # ---- reading -----------------------------------------------------------
+    def list(self, route: Optional[str] = None, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        out = []
+        for de in os.scandir(self.directory):
+            if not de.name.endswith(".json"):
+                continue
+            try:
+                with open(de.path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue  # evicted while listing
+            if route and meta.get("route") != route:
+                continue
+            if kind and meta.get("kind") != kind:
+                continue
+            out.append(meta)
+        out.sort(key=lambda m: (m.get("kind") != "on-demand", -m["ts"] if m.get("kind") == "on-demand" else -m["ms"]))
+        return out
+
+    def locate(self, pid: str) -> Optional[Dict[str, Any]]:
+        """Sidecar of a stored profile plus its file ``path``; None if unknown."""
+        if not _ID_RE.match(pid):
+            return None
+        try:
+            with open(self._path(pid, ".json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta["path"] = self._path(pid, "." + meta["format"])
+        return meta if os.path.exists(meta["path"]) else None
+
+    @staticmethod
+    def pstats_text(path: str, sort: str = "cumulative", limit: int = 60) -> str:
+        buf = io.StringIO()
+        stats = pstats.Stats(path, stream=buf)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return buf.getvalue()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"engine": self.engine, "sampling_available": SAMPLING, "sample_rate": self.sample_rate,
+                "keep_slowest": self.keep_slowest, "keep_recent": self.keep_recent, **self.stats}
+
+
+class ProfilerMiddleware:
+    """Profiles ``X-Profile`` requests from callers ``authorize`` accepts, and a
+    sampled fraction of all requests (pure ASGI, so streamed responses are
+    profiled to their last byte).  ``authorize(scope)`` returns the caller's
+    identity, or None to ignore the header."""
+
+    def __init__(self, app, profiler: RequestProfiler,
+                 authorize: Callable[[Dict[str, Any]], Awaitable[Optional[str]]]):
+        self.app = app
+        self.profiler = profiler
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        want = None
+        for k, v in scope["headers"]:
+            if k == b"x-profile":
+                want = v.decode("latin-1").strip().lower()
+                break
+        if want and want not in ("0", "false", "off"):
+            identity = await self.authorize(scope)
+            if identity is not None:
+                return await self._profiled(scope, receive, send, want, identity)
+        elif self.profiler.wants_sample():
+            return await self._profiled(scope, receive, send, None, None)
+        await self.app(scope, receive, send)
+
+    async def _profiled(self, scope, receive, send, want: Optional[str], identity: Optional[str]):
+        prof = self.profiler
+        on_demand = want is not None
+        session = prof.start(want)
+        if session is None:
+            if not on_demand:
+                return await self.app(scope, receive, send)
+
+            async def send_busy(msg):
+                if msg["type"] == "http.response.start":
+                    msg = {**msg, "headers": list(msg.get("headers", [])) + [(b"x-profile", b"busy")]}
+                await send(msg)
+            return await self.app(scope, receive, send_busy)
+
+        pid = prof.new_id() if on_demand else None
+        status = [500]
+
+        async def send_status(msg):
+            if msg["type"] == "http.response.start":
+                status[0] = msg["status"]
+                if pid:
+                    msg = {**msg, "headers": list(msg.get("headers", [])) + [(b"x-profile-id", pid.encode())]}
+            await send(msg)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            prof.stop(session)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            meta = {"kind": "on-demand" if on_demand else "sampled", "route": route, "method": scope["method"],
+                    "path": scope["path"], "status": status[0], "ms": round(ms, 2), "ts": int(time.time() * 1000),
+                    "pid": os.getpid(), "by": identity}
+            try:
+                if on_demand:
+                    await asyncio.to_thread(prof.save_on_demand, pid, session, meta)
+                    log.info("PROFILE %s %s %s %.1f ms by %s -> %s", meta["method"], route, status[0], ms, identity, pid)
+                else:
+                    await asyncio.to_thread(prof.save_sampled, prof.new_id(route), session, meta)
+            except Exception as e:
+                log.warning("Saving profile failed: %s", e)
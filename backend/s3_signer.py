@@ -0,0 +1,135 @@
+# s3_signer.py
+"""Presigned-URL signing with reuse.
+
+``UrlSigner`` parses S3 object URLs into keys once, keeps signed GET URLs per
+(bucket, key, lifetime) and hands the same URL back until ``refresh_fraction``
+of its lifetime has passed, so every URL it returns is still valid for at least
+``(1 - refresh_fraction) * expires`` seconds.  Stable URLs also let browsers
+reuse their HTTP cache across page loads instead of seeing a new query string
+every time.
+
+With ``proxy`` set (a ``(key, expires) -> url`` callable), keys are signed for
+the backend media cache instead of S3; reuse works the same way.
+
+``sign_case`` signs every image, media src/poster/thumb/display and reference of
+a case in one pass, signing each distinct key only once.
+"""
+import threading, time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+MEDIA_URL_FIELDS = ("src", "poster", "thumb", "display")
+
+
+@lru_cache(maxsize=16384)
+def parse_s3_url(url: str, bucket: str) -> Optional[str]:
+    """Return the object key if ``url`` points into ``bucket``, else None.
+
+    Understands s3://bucket/key, virtual-hosted (bucket.s3[.region].amazonaws.com/key)
+    and path-style (s3[.region].amazonaws.com/bucket/key) URLs; query strings
+    such as ``?v=4`` or an old signature are dropped.
+    """
+    if not url or not bucket:
+        return None
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = unquote(parts.path.lstrip("/"))
+    if parts.scheme == "s3":
+        return (path or None) if host == bucket.lower() else None
+    if not host.endswith(".amazonaws.com"):
+        return None
+    if host.startswith(bucket.lower() + ".s3"):
+        return path or None
+    if host.startswith("s3") and path.startswith(bucket + "/"):
+        return path[len(bucket) + 1:] or None
+    return None
+
+
+class UrlSigner:
+    def __init__(self, client, bucket: Optional[str], expires: int = 3600,
+                 refresh_fraction: float = 0.5, max_entries: int = 20000,
+                 proxy: Optional[Callable[[str, int], str]] = None):
+        self.client = client
+        self.proxy = proxy
+        self.bucket = bucket
+        self.expires = expires
+        self.refresh_fraction = refresh_fraction
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, str, int], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "signed": 0, "errors": 0}
+
+    def sign_key(self, key: str, expires: Optional[int] = None) -> str:
+        """Presigned GET URL for ``key``, reused while it is fresh enough."""
+        expires = expires or self.expires
+        ck = (self.bucket, key, expires)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(ck)
+            if hit and now - hit[1] < expires * self.refresh_fraction:
+                self._cache.move_to_end(ck)
+                self.stats["hits"] += 1
+                return hit[0]
+        if self.proxy is not None:
+            url = self.proxy(key, expires)
+        else:
+            url = self.client.generate_presigned_url(
+                "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires
+            )
+        with self._lock:
+            self._cache[ck] = (url, now)
+            self._cache.move_to_end(ck)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self.stats["signed"] += 1
+        return url
+
+    def sign_url(self, url: str, expires: Optional[int] = None) -> str:
+        """Sign an S3 object URL from our bucket; other URLs pass through."""
+        key = parse_s3_url(url, self.bucket) if isinstance(url, str) else None
+        if not key:
+            return url
+        try:
+            return self.sign_key(key, expires)
+        except Exception as e:
+            self.stats["errors"] += 1
+            log.error(f"Failed to sign URL {url}: {e}")
+            return url  # fallback to original
+
+    def sign_many(self, urls: Iterable[str], expires: Optional[int] = None) -> Dict[str, str]:
+        """Map each distinct URL to its signed form."""
+        return {u: self.sign_url(u, expires) for u in dict.fromkeys(urls) if u}
+
+    def sign_case(self, case: Dict[str, Any], expires: Optional[int] = None) -> Dict[str, Any]:
+        """Rewrite asset URLs of ``case`` in place with signed ones."""
+        media = case.get("media") or []
+        refs = case.get("references") or []
+        urls = list(case.get("images") or [])
+        for m in media:
+            if isinstance(m, dict):
+                urls.extend(m.get(f) for f in MEDIA_URL_FIELDS if m.get(f))
+        for r in refs:
+            urls.append(r.get("url") if isinstance(r, dict) else r)
+        signed = self.sign_many((u for u in urls if isinstance(u, str)), expires)
+        if not signed:
+            return case
+
+        if case.get("images"):
+            case["images"] = [signed.get(u, u) for u in case["images"]]
+        for m in media:
+            if isinstance(m, dict):
+                for f in MEDIA_URL_FIELDS:
+                    if m.get(f):
+                        m[f] = signed.get(m[f], m[f])
+        if refs:
+            case["references"] = [
+                ({**r, "url": signed.get(r["url"], r["url"])} if r.get("url") else r)
+                if isinstance(r, dict) else signed.get(r, r)
+                for r in refs
+            ]
+        return case
@@ -0,0 +1,225 @@
+# token_auth.py
+"""Verified-token cache and session revocation for bearer-token auth.
+
+``VerifiedTokens`` is an LRU of tokens whose HS256 signature has already been
+checked, mapping the token string to its (sub, iat, exp) claims.  Entries
+expire at the token's own ``exp``, so a cache hit is exactly as valid as a
+fresh ``jwt.decode`` -- polling endpoints skip the signature check and JSON
+parsing on every request after the first.
+
+``RevocationList`` records "every token of <sub> issued at or before <t> is
+revoked" cutoffs (what an admin "sign out everywhere" needs; tokens carry no
+server-side session).  The authoritative list is shared by all workers: a
+JSON file (written under ``flock`` and atomically replaced) or, with Mongo, a
+``revocations`` collection whose ``expiresAt`` TTL index drops a cutoff once
+every token it could affect has expired.  Each worker keeps a local Bloom
+filter of revoked subjects, rebuilt every ``refresh_every`` seconds, so the
+common case -- a user who was never revoked -- is answered with a few bit
+probes and no I/O; only Bloom hits look up the exact cutoff.  Other workers
+pick up a revocation within ``refresh_every`` seconds.
+"""
+import asyncio, hashlib, json, math, os, tempfile, time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: single-process use only
+    fcntl = None
+
+import logging
+log = logging.getLogger("uvicorn.error")
+
+Claims = Tuple[str, float, float]  # (sub, iat, exp)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        d = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, item: str):
+        for p in self._positions(item):
+            self._array[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._array[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    @classmethod
+    def of(cls, items: Iterable[str], error_rate: float = 0.001) -> "BloomFilter":
+        items = list(items)
+        bf = cls(capacity=max(1024, 2 * len(items)), error_rate=error_rate)
+        for it in items:
+            bf.add(it)
+        return bf
+
+
+class VerifiedTokens:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, Claims]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, token: str) -> Optional[Claims]:
+        claims = self._mem.get(token)
+        if claims is None:
+            self.stats["misses"] += 1
+            return None
+        if claims[2] <= time.time():
+            del self._mem[token]
+            self.stats["expired"] += 1
+            return None
+        self._mem.move_to_end(token)
+        self.stats["hits"] += 1
+        return claims
+
+    def put(self, token: str, claims: Claims):
+        if self.max_entries <= 0:
+            return
+        self._mem[token] = claims
+        self._mem.move_to_end(token)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        looked = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self._mem),
+                "hitRate": round(self.stats["hits"] / looked, 4) if looked else None}
+
+
+class RevocationList:
+    def __init__(self, token_ttl: float, path: Optional[str] = None, mongo_collection=None,
+                 refresh_every: float = 5.0):
+        self.token_ttl = token_ttl  # longest token lifetime: how long a cutoff matters
+        self.path = path
+        self.mongo = mongo_collection
+        self.refresh_every = refresh_every
+        self._bloom = BloomFilter.of(())
+        self._cutoffs: Dict[str, float] = {}  # exact cutoffs known locally (file: all; Mongo: looked up)
+        self._loaded_at = 0.0
+        self._file_mtime: Optional[float] = None
+        self._refreshing: Optional[asyncio.Future] = None
+        self.stats: Dict[str, int] = {"checks": 0, "bloom_hits": 0, "lookups": 0,
+                                      "revoked": 0, "refreshes": 0}
+
+    # ---- file backend ----------------------------------------------------
+    def _read_file(self) -> Dict[str, float]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {s: c for s, c in data.items() if c + self.token_ttl > now}
+
+    def _write_file(self, sub: str, cutoff: float) -> Dict[str, float]:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            data = self._read_file()  # also drops cutoffs older than any live token
+            data[sub] = max(cutoff, data.get(sub, 0))
+            fd, tmp = tempfile.mkstemp(prefix=".revocations-", dir=os.path.dirname(os.path.abspath(self.path)))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+            return data
+        finally:
+            os.close(lock_fd)
+
+    # ---- refresh ---------------------------------------------------------
+    async def _reload(self):
+        if self.mongo is not None:
+            now = datetime.now(timezone.utc)
+            subs = [d["sub"] async for d in self.mongo.find({"expiresAt": {"$gt": now}}, {"_id": 0, "sub": 1})]
+            self._cutoffs = {}
+            self._bloom = BloomFilter.of(subs)
+        elif self.path:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._file_mtime or time.time() - self._loaded_at > self.token_ttl:
+                self._cutoffs = await asyncio.to_thread(self._read_file)
+                self._bloom = BloomFilter.of(self._cutoffs)
+                self._file_mtime = mtime
+        self._loaded_at = time.time()
+        self.stats["refreshes"] += 1
+
+    async def refresh(self, force: bool = False):
+        if not force and time.time() - self._loaded_at < self.refresh_every:
+            return
+        if self._refreshing is None:  # one reload at a time per worker
+            self._refreshing = asyncio.ensure_future(self._reload())
+        fut = self._refreshing
+        try:
+            await asyncio.shield(fut)
+        except Exception as e:
+            log.warning("Revocation list refresh failed: %s", e)
+            self._loaded_at = time.time()  # keep serving the last good filter; retry later
+        finally:
+            if self._refreshing is fut:
+                self._refreshing = None
+
+    # ---- public API ------------------------------------------------------
+    async def _cutoff(self, sub: str) -> Optional[float]:
+        if sub in self._cutoffs or self.mongo is None:
+            return self._cutoffs.get(sub)
+        self.stats["lookups"] += 1
+        doc = await self.mongo.find_one({"sub": sub}, {"_id": 0, "before": 1})
+        cutoff = doc["before"] if doc else None
+        if cutoff is not None:
+            self._cutoffs[sub] = cutoff  # cleared on the next reload
+        return cutoff
+
+    async def is_revoked(self, sub: str, iat: float) -> bool:
+        """True if tokens of ``sub`` issued at ``iat`` were revoked (iat 0: token has no iat)."""
+        await self.refresh()
+        self.stats["checks"] += 1
+        if sub not in self._bloom:
+            return False
+        self.stats["bloom_hits"] += 1
+        cutoff = await self._cutoff(sub)
+        if cutoff is not None and iat <= cutoff:
+            self.stats["revoked"] += 1
+            return True
+        return False
+
+    async def revoke(self, sub: str, before: Optional[float] = None) -> float:
+        """Revoke every token of ``sub`` issued at or before ``before`` (default: now)."""
+        cutoff = float(before if before is not None else time.time())
+        if self.mongo is not None:
+            await self.mongo.update_one(
+                {"sub": sub},
+                {"$max": {"before": cutoff},
+                 "$set": {"expiresAt": datetime.fromtimestamp(cutoff + self.token_ttl, timezone.utc)}},
+                upsert=True,
+            )
+            self._cutoffs.pop(sub, None)
+        elif self.path:
+            self._cutoffs = await asyncio.to_thread(self._write_file, sub, cutoff)
+            try:
+                self._file_mtime = os.stat(self.path).st_mtime
+            except OSError:
+                self._file_mtime = None
+        else:
+            self._cutoffs[sub] = max(cutoff, self._cutoffs.get(sub, 0))
+        self._bloom.add(sub)  # effective immediately in this worker
+        return cutoff
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "subjects": self._bloom.count, "bloomBits": self._bloom.bits,
+                "bloomHashes": self._bloom.hashes,
+                "backend": "mongo" if self.mongo is not None else ("file" if self.path else "memory")}
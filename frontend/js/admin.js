@@ -2,6 +2,7 @@ import { CONFIG } from './config.js';
 
 // Store uploaded files
 let uploadedImages = [];
+let imageRenditions = {};  // image url -> {thumb, display, width, height} from the upload
 let uploadedVideos = [];
 let uploadedReferences = [];
 
@@ -118,20 +119,43 @@ function suggestNextCaseId() {
 }
 
 // Upload file to S3
-async function uploadFile(file, endpoint, caseId) {
+async function uploadFile(file, endpoint, caseId, onProgress) {
+    const uploadId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
     const formData = new FormData();
     formData.append('file', file);
     formData.append('case_id', caseId);
+    formData.append('upload_id', uploadId);
 
     const token = localStorage.getItem('jwt');
-    
-    const response = await fetch(`${CONFIG.API_BASE}${endpoint}`, {
-        method: 'POST',
-        headers: {
-            'Authorization': `Bearer ${token}`
-        },
-        body: formData
-    });
+
+    // Poll the server-side S3 transfer while the request is pending
+    let poll = null;
+    if (onProgress) {
+        poll = setInterval(async () => {
+            try {
+                const r = await fetch(`${CONFIG.API_BASE}/api/admin/uploads/${uploadId}`, {
+                    headers: { 'Authorization': `Bearer ${token}` }
+                });
+                if (r.ok) {
+                    const status = await r.json();
+                    onProgress(Math.min(1, status.bytesSent / (file.size || 1)), status);
+                }
+            } catch (_) { /* progress is best-effort */ }
+        }, 1000);
+    }
+
+    let response;
+    try {
+        response = await fetch(`${CONFIG.API_BASE}${endpoint}`, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`
+            },
+            body: formData
+        });
+    } finally {
+        if (poll) clearInterval(poll);
+    }
 
     if (!response.ok) {
         const error = await response.json();
@@ -194,20 +218,27 @@ async function handleImageFiles(files) {
         uploadedContainer.appendChild(tempDiv);
 
         try {
-            const result = await uploadFile(file, '/api/admin/upload-image', caseId);
+            const result = await uploadFile(file, '/api/admin/upload-image', caseId, (frac) => {
+                tempDiv.innerHTML = `<span>Uploading ${file.name}... ${Math.round(frac * 100)}%</span>`;
+            });
             
             // Remove temp div
             uploadedContainer.removeChild(tempDiv);
             
             // Add to uploaded images
             uploadedImages.push(result.url);
+            if (result.thumb) {
+                imageRenditions[result.url] = {
+                    thumb: result.thumb, display: result.display, width: result.width, height: result.height
+                };
+            }
             
             // Show uploaded file
             const fileDiv = document.createElement('div');
             fileDiv.className = 'uploaded-file';
             fileDiv.innerHTML = `
                 <div style="display: flex; align-items: center; flex: 1;">
-                    <img src="${result.url}" alt="${result.filename}" crossorigin="anonymous">
+                    <img src="${result.thumb || result.url}" alt="${result.filename}" crossorigin="anonymous">
                     <span>${result.filename}</span>
                 </div>
                 <button type="button" class="btn ghost btn-sm" onclick="removeImage('${result.url}')">Remove</button>
@@ -239,8 +270,16 @@ function setupVideoUpload() {
                 return;
             }
 
+            const tempDiv = document.createElement('div');
+            tempDiv.className = 'uploaded-file';
+            tempDiv.innerHTML = `<span>Uploading ${file.name}...</span>`;
+            uploadedContainer.appendChild(tempDiv);
+
             try {
-                const result = await uploadFile(file, '/api/admin/upload-video', caseId);
+                const result = await uploadFile(file, '/api/admin/upload-video', caseId, (frac) => {
+                    tempDiv.innerHTML = `<span>Uploading ${file.name}... ${Math.round(frac * 100)}%</span>`;
+                });
+                uploadedContainer.removeChild(tempDiv);
                 uploadedVideos.push(result.url);
                 
                 const fileDiv = document.createElement('div');
@@ -251,6 +290,7 @@ function setupVideoUpload() {
                 `;
                 uploadedContainer.appendChild(fileDiv);
             } catch (error) {
+                uploadedContainer.removeChild(tempDiv);
                 alert(`Failed to upload video: ${error.message}`);
             }
         }
@@ -303,6 +343,7 @@ function setupReferenceUpload() {
 // Remove functions (make global)
 window.removeImage = function(url) {
     uploadedImages = uploadedImages.filter(u => u !== url);
+    delete imageRenditions[url];
     refreshUploadedFiles();
 }
 
@@ -398,15 +439,23 @@ async function submitCase(e) {
             references: uploadedReferences
         };
 
-        // Add videos if any
-        if (uploadedVideos.length > 0) {
-            caseData.media = uploadedVideos.map(url => ({
-                type: 'video',
-                src: url,
-                autoplay: true,
-                loop: true,
-                muted: true
-            }));
+        // Media entries: images (with their thumb/display renditions) then videos.
+        // The viewer shows media instead of images whenever media is non-empty.
+        if (uploadedVideos.length > 0 || Object.keys(imageRenditions).length > 0) {
+            caseData.media = [
+                ...uploadedImages.map(url => ({
+                    type: 'image',
+                    src: url,
+                    ...(imageRenditions[url] || {})
+                })),
+                ...uploadedVideos.map(url => ({
+                    type: 'video',
+                    src: url,
+                    autoplay: true,
+                    loop: true,
+                    muted: true
+                }))
+            ];
         }
 
         // Submit to backend
@@ -461,6 +510,7 @@ function showStatus(type, message) {
 window.resetForm = function() {
     document.getElementById('caseForm').reset();
     uploadedImages = [];
+    imageRenditions = {};
     uploadedVideos = [];
     uploadedReferences = [];
     document.getElementById('uploadedImages').innerHTML = '';
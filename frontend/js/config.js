@@ -4,6 +4,7 @@ export const CONFIG = {
   API_BASE: '', 
   CASES_URL: 'data/cases.json',     // later: /api/cases
   FEEDBACK_API: `api/feedback`,    // now points to backend
+  FEEDBACK_STREAM_API: `api/feedback/stream`,  // SSE variant; set '' to disable streaming
   MCQ_CHAT_API: `api/mcq/chat`,
   TRANSCRIBE: 'webspeech',          // 'webspeech' | 'aws'
   FEEDBACK_MODE: 'hybrid',         // 'llm' | 'heuristic | 'hybrid'
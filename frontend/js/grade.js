@@ -166,8 +166,46 @@ export function letter(h) {
   return 'F';
 }
 
+/* ========== SSE reader for /api/feedback/stream ========== */
+// Resolves with the `done` payload (same shape as /api/feedback); calls
+// onToken(fullTextSoFar) as tokens arrive and onSection(section) per section.
+async function readFeedbackStream(res, { onToken, onSection } = {}) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  let text = '';
+  let done = null;
+  for (;;) {
+    const { value, done: eof } = await reader.read();
+    if (eof) break;
+    buf += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buf.indexOf('\n\n')) >= 0) {
+      const frame = buf.slice(0, sep);
+      buf = buf.slice(sep + 2);
+      let event = 'message', data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      const payload = data ? JSON.parse(data) : {};
+      if (event === 'token') {
+        text += payload.text || '';
+        onToken?.(text);
+      } else if (event === 'section') {
+        onSection?.(payload);
+      } else if (event === 'error') {
+        console.warn('[LLM] stream error', payload.detail);
+      } else if (event === 'done') {
+        done = payload;
+      }
+    }
+  }
+  return done || { feedback: text, score: {} };
+}
+
 /* ========== LLM grading (primary method) ========== */
-export async function gradeWithLLM({ caseObj, transcript, heur }) {
+export async function gradeWithLLM({ caseObj, transcript, heur, onToken, onSection }) {
   const payload = buildLLMPayload({ caseObj, transcript, heur });
 
   // If FEEDBACK_MODE is heuristic only, skip LLM
@@ -184,11 +222,14 @@ export async function gradeWithLLM({ caseObj, transcript, heur }) {
     headers['x-api-key'] = CONFIG.API_KEY;
   }
   
-  console.debug('[LLM] POST', CONFIG.FEEDBACK_API);
+  // Stream tokens when the caller can render them progressively
+  const streaming = Boolean(onToken && CONFIG.FEEDBACK_STREAM_API);
+  const url = streaming ? CONFIG.FEEDBACK_STREAM_API : CONFIG.FEEDBACK_API;
+  console.debug('[LLM] POST', url);
 
   let res;
   try {
-    res = await fetch(CONFIG.FEEDBACK_API, {
+    res = await fetch(url, {
       method: 'POST',
       headers,
       body: JSON.stringify(payload)
@@ -216,7 +257,9 @@ export async function gradeWithLLM({ caseObj, transcript, heur }) {
     };
   }
   
-  const data = await res.json();
+  const data = streaming
+    ? await readFeedbackStream(res, { onToken, onSection })
+    : await res.json();
   console.log('[LLM] Raw response received:', JSON.stringify(data, null, 2));
   
   // Check if LLM returns structured score data
@@ -59,7 +59,7 @@ async function fetchAttempts() {
   }
 
   try {
-    const r = await fetch('/api/progress/attempts', { headers, cache:'no-store' });
+    const r = await fetch('/api/progress/attempts', { headers, cache:'no-cache' });
     console.log('[Progress] API /attempts response:', r.status);
     if (r.ok) {
       const data = await r.json();
@@ -71,7 +71,7 @@ async function fetchAttempts() {
   }
 
   try {
-    const r2 = await fetch('/api/progress', { headers, cache:'no-store' });
+    const r2 = await fetch('/api/progress', { headers, cache:'no-cache' });
     console.log('[Progress] API /progress response:', r2.status);
     if (r2.ok) {
       const sum = await r2.json();
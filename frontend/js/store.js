@@ -5,7 +5,7 @@ let filters = { subs: new Set(), query: '' };
 
 export async function loadCases(url = CONFIG.CASES_URL){
   try{
-    const r = await fetch(url, {cache:'no-store'});
+    const r = await fetch(url, {cache:'no-cache'});
     CASES = r.ok ? await r.json() : [];
   }catch{ CASES = []; }
 }
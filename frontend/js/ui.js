@@ -125,7 +125,7 @@ function setToggleChecked(on){
 function getThumbSrc(c){
   if (Array.isArray(c.media) && c.media.length){
     for (const m of c.media){
-      if (m.type === 'image' && m.src) return m.src;
+      if (m.type === 'image' && m.src) return m.thumb || m.src;
       if (m.poster) return m.poster;
     }
   }
@@ -1790,7 +1790,8 @@ document.getElementById('gradeBtn')?.addEventListener('click', async () => {
     const llm = await mod.gradeWithLLM({
       caseObj, 
       transcript: tr, 
-      heur: null
+      heur: null,
+      onToken: (text) => { if (vFeedback) vFeedback.textContent = text; }
     });
 
     // Use LLM score for everything
@@ -1,6 +1,7 @@
 // Canvas + Video viewer: zoom/pan/brightness/contrast + image/video thumbs
 let currentCase = null, currentIdx = 0, assets = [];
 let scale=1, panX=0, panY=0, bright=0, cont=0, isPanning=false, startX=0, startY=0, img=null, rawImg=null;
+let fullRes = true;            // false while the canvas shows an image's display rendition
 
 let videoEl = null;            // created on demand
 let canvasPlaceholder = null;  // where the canvas was when we swap it out
@@ -35,6 +36,8 @@ function getAssets(caseObj){
     return caseObj.media.map(m => ({
       type: m.type || (isVideoSrc(m.src) ? 'video' : 'image'),
       src: m.src,
+      thumb: m.thumb || null,      // small rendition for the strip
+      display: m.display || null,  // size-capped rendition for first paint
       poster: m.poster || null,
       caption: m.caption || '',
       autoplay: m.autoplay !== false,  // default true
@@ -45,7 +48,7 @@ function getAssets(caseObj){
   // legacy fallback: images[]
   return (caseObj.images||[]).map(src => ({
     type: isVideoSrc(src) ? 'video' : 'image',
-    src, poster: null, caption: '', autoplay: true, loop: true, muted: true
+    src, thumb: null, display: null, poster: null, caption: '', autoplay: true, loop: true, muted: true
   }));
 }
 
@@ -218,8 +221,9 @@ export function openViewer(caseObj){
     const imgEl = document.createElement('img');
 
     if (a.type === 'image') {
-      imgEl.src = a.src;
+      imgEl.src = a.thumb || a.src;
       imgEl.crossOrigin = 'anonymous'; // IMPORTANT for CORS
+      imgEl.loading = 'lazy';
     } else {
       imgEl.src = a.poster || 'data:image/svg+xml;utf8,' + encodeURIComponent(
         '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 80 60"><rect width="80" height="60" fill="#222"/><polygon points="30,20 58,30 30,40" fill="#fff"/></svg>'
@@ -265,6 +269,7 @@ export function setZoom(v){
     applyVideoTransform();
   } else if (assets[currentIdx].type==='image') {
     draw();
+    if (scale > 1) loadFullRes();
   }
 }
 
@@ -386,7 +391,8 @@ async function loadAsset(){
 
   img = null; rawImg = null;
   try {
-    rawImg = await loadImg(a.src);
+    fullRes = !a.display;
+    rawImg = await loadImg(a.display || a.src);
     // Fit-to-view and nudge down a little
     const vw = canvas.clientWidth  || canvas.width  || 1;
     const vh = canvas.clientHeight || canvas.height || 1;
@@ -403,6 +409,24 @@ async function loadAsset(){
   }
 }
 
+// Zoomed past 1 image px per screen px on the display rendition: swap in the
+// original, rescaling so the view does not jump.
+async function loadFullRes(){
+  const a = assets[currentIdx];
+  if (fullRes || !a || !a.display) return;
+  fullRes = true;
+  try {
+    const orig = await loadImg(a.src);
+    if (assets[currentIdx] !== a) return;   // user moved on
+    scale *= (rawImg.naturalWidth || rawImg.width) / (orig.naturalWidth || orig.width || 1);
+    rawImg = orig;
+    img = await toProcessed(rawImg, bright, cont);
+    draw();
+  } catch(e) {
+    console.error('Full-resolution load error', e);
+  }
+}
+
 // ---------- interactions ----------
 canvas.addEventListener('mousedown', (e)=>{
   if(!assets.length || assets[currentIdx].type!=='image') return;
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Render thumb/display renditions for images of existing cases.
+
+Uploads made after renditions were introduced get them at upload time; this
+walks every case, and for each image in our bucket whose media entry has no
+``thumb`` yet, renders the renditions from the S3 original and records them on
+the case.  Uses the same environment as the API (S3_BUCKET, MONGO_URI, ...):
+
+    python scripts/backfill_renditions.py [--dry-run] [--case gi-001]
+"""
+import argparse, asyncio, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+
+def pending(app, case):
+    """Image URLs of ``case`` (in our bucket) that have no renditions yet."""
+    from s3_signer import parse_s3_url
+    from image_derivatives import is_image_key
+    media = [m for m in case.get("media") or [] if isinstance(m, dict)]
+    if media:
+        urls = [m.get("src") for m in media if m.get("type", "image") == "image" and not m.get("thumb")]
+    else:
+        urls = list(case.get("images") or [])
+    out = []
+    for u in urls:
+        key = parse_s3_url(u, app.S3_BUCKET) if isinstance(u, str) else None
+        if key and is_image_key(key):
+            out.append((u, key))
+    return out
+
+
+async def run(app, only, dry_run):
+    if app.USE_MONGO:
+        cases = [c async for c in app.db.cases.find({"id": only} if only else {}, {"_id": 0})]
+    else:
+        cases = [c for c in app._catalog.items() if not only or c.get("id") == only]
+    todo = [(c["id"], u, key) for c in cases for u, key in pending(app, c)]
+    done = failed = 0
+    if not dry_run:
+        for case_id, url, key in todo:
+            fields = await app._derive_image(key)
+            if fields and await app._record_renditions(case_id, url, {
+                    k: fields[k] for k in ("thumb", "display", "width", "height")}):
+                done += 1
+            else:
+                failed += 1
+            print(f"  {case_id}: {key} {'ok' if fields else 'FAILED'}")
+    app.image_deriver.shutdown()
+    return len(cases), len(todo), done, failed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true", help="only count images that need renditions")
+    ap.add_argument("--case", help="only this case id")
+    args = ap.parse_args()
+    import app
+    if not app.S3_BUCKET:
+        sys.exit("S3_BUCKET not configured")
+    if not app.image_deriver.enabled:
+        sys.exit("Pillow is not installed (or IMAGE_DERIVE_WORKERS=0)")
+    seen, n, done, failed = asyncio.run(run(app, args.case, args.dry_run))
+    if args.dry_run:
+        print(f"{seen} cases, {n} images need renditions")
+    else:
+        print(f"{seen} cases, {done} images rendered, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Rebuild per-user progress rollups from the attempts collection.
+
+Run once after deploying rollups (or any time they drift), with the same
+environment as the API:
+
+    MONGO_URI=mongodb://... python scripts/backfill_rollups.py [--user someone@example.org]
+"""
+import argparse, asyncio, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--user", help="only rebuild this user's rollup")
+    args = ap.parse_args()
+    import app
+    if not app.USE_MONGO:
+        print("MONGO_URI not set: in-memory attempts are not persisted, nothing to backfill")
+        return
+    n = asyncio.run(app.rebuild_rollups(args.user))
+    print(f"rebuilt rollups for {n} user(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""End-to-end latency/throughput of every API route, offline.
+
+Builds a synthetic catalog (--cases) and attempt histories (--users x
+--attempts), stubs OpenAI (scripts/llm_stub_server.py) and S3
+(scripts/local_s3.py), then drives each route for --requests requests at
+--concurrency and reports p50/p95/p99 latency and requests/s per route.
+
+  --backend file    JSON case file + in-memory users/attempts
+  --backend mongo   mongomock_motor in each process, or --mongo-uri for a real mongod
+  --mode inproc     httpx.ASGITransport straight into the app (no sockets)
+  --mode uvicorn    real HTTP against `uvicorn --workers N`
+
+Bearer-token auth (AUTH_MODE=jwt) is on, so every route pays the auth path.
+Results can be stored as a baseline and later runs compared against it;
+baselines are small sorted JSON files in scripts/bench_baselines/, so a
+regression also shows up as a diff in review:
+
+    python scripts/bench_api.py --backend file --mode inproc --save
+    python scripts/bench_api.py --backend file --mode inproc --compare
+    python scripts/bench_api.py --backend mongo --mode uvicorn --workers 2 --only 'cases|progress'
+
+--compare exits 1 when a route's p50 or p95 is more than --tolerance (and more
+than --min-delta-ms) slower than the baseline.  Needs httpx (and mongomock-motor
+for --backend mongo without --mongo-uri) in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, fcntl, json, os, platform, random, re, shutil, socket, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(HERE, "..", "backend")
+BASELINES = os.path.join(HERE, "bench_baselines")
+BUCKET = "bench-bucket"
+JWT_SECRET = "bench-secret"
+PASSWORD = "bench-password"
+SUBS = ["Neuroradiology", "Musculoskeletal Radiology", "Gastrointestinal Radiology",
+        "Genitourinary Radiology", "Ultrasound", "Thoracic Radiology", "Breast Imaging", "Pediatric Radiology"]
+ADMIN_ROUTES = {"GET /api/cases/trash?limit=50", "GET /api/admin/cases?limit=50", "GET /api/s3/presign",
+                "PUT /api/cases/{id}", "POST /api/cases/{id}/generate-rubric", "GET /api/metrics"}  # driven as users[0]
+FINDINGS = ["wall thickening", "fat stranding", "restricted diffusion", "ring enhancement", "mass effect",
+            "calcification", "free fluid", "lymphadenopathy", "periosteal reaction", "air-fluid level"]
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+def synth_cases(n: int, rng: random.Random):
+    out = []
+    for i in range(n):
+        cid = f"bench-{i:06d}"
+        sub = SUBS[i % len(SUBS)]
+        found = rng.sample(FINDINGS, 4)
+        out.append({
+            "id": cid,
+            "title": f"Synthetic {sub.split()[0].lower()} case {i}",
+            "subspecialty": sub,
+            "tags": ["synthetic", sub.split()[0].lower()],
+            "boardPrompt": f"A {rng.randint(20, 85)}-year-old presents with pain. Describe the findings.",
+            "expectedAnswer": (f"Diagnosis: condition {i % 97}. Key: {found[0]} and {found[1]}. "
+                               f"Differential: {found[2]}, {found[3]}. Management: surgical consult."),
+            "rubric": [f"mentions {f}" for f in found],
+            "images": [f"https://{BUCKET}.s3.amazonaws.com/cases/{cid}/image-{k}.png" for k in range(2)],
+            "media": [{"type": "image", "src": f"https://{BUCKET}.s3.amazonaws.com/cases/{cid}/image-{k}.png"}
+                      for k in range(2)],
+            "deleted": (i % 50 == 49),
+            "active": True,
+        })
+    return out
+
+
+def synth_attempts(users, cases, per_user: int, rng: random.Random):
+    now = int(time.time() * 1000)
+    out = []
+    for u in users:
+        for k in range(per_user):
+            c = cases[rng.randrange(len(cases))]
+            total = len(c["rubric"])
+            out.append({"user": u, "caseId": c["id"], "subspecialty": c["subspecialty"],
+                        "similarity": round(rng.random(), 3), "rubricHit": rng.randint(0, total),
+                        "rubricTotal": total, "letter": rng.choice("ABCDF"),
+                        "ts": now - (per_user - k) * 60000})
+    return out
+
+
+def write_data(root: str, args):
+    rng = random.Random(args.seed)
+    cases = synth_cases(args.cases, rng)
+    users = [f"bench{i}@example.org" for i in range(args.users)]
+    attempts = synth_attempts(users, cases, args.attempts, rng)
+    with open(os.path.join(root, "cases.json"), "w") as f:
+        json.dump(cases, f)
+    with open(os.path.join(root, "seed.json"), "w") as f:
+        json.dump({"users": users, "attempts": attempts, "images": [c["id"] for c in cases[:8]]}, f)
+    return cases, users
+
+
+# ---------------------------------------------------------------------------
+# Served app (imported by each uvicorn worker as bench_api:served_app)
+# ---------------------------------------------------------------------------
+def _import_backend():
+    if os.getenv("BENCH_API_MONGOMOCK") == "1":
+        import mongomock_motor, motor.motor_asyncio
+
+        class MockClient(mongomock_motor.AsyncMongoMockClient):
+            def get_default_database(self, *a, **kw):  # upstream returns the sync database
+                return self[os.environ["MONGO_URI"].rsplit("/", 1)[-1]]
+        motor.motor_asyncio.AsyncIOMotorClient = MockClient
+    sys.path.insert(0, BACKEND)
+    sys.path.insert(0, HERE)
+    import app as backend
+    from local_s3 import LocalS3
+    root = os.environ["BENCH_API_DATA"]
+    s3 = LocalS3(os.path.join(root, "s3"))
+    backend.s3_client = s3
+    for holder in (backend.s3_signer, backend.uploader, backend.image_deriver, backend.media_cache):
+        if holder is not None:
+            holder.client = s3
+    return backend
+
+
+async def seed(backend):
+    """Load the synthetic data into this process; shared stores are filled once."""
+    root = os.environ["BENCH_API_DATA"]
+    with open(os.path.join(root, "seed.json")) as f:
+        data = json.load(f)
+    shared = not backend.USE_MONGO or os.getenv("BENCH_API_MONGOMOCK") != "1"
+    lock_fd = os.open(os.path.join(root, ".seed.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        marker = os.path.join(root, ".seeded")
+        if not shared or not os.path.exists(marker):
+            with open(os.path.join(root, "cases.json")) as f:
+                cases = [backend._with_answer_blocks(c) for c in json.load(f)]
+            if backend.USE_MONGO:
+                await backend.db.cases.delete_many({})
+                await backend.db.cases.insert_many(cases)
+                await backend.db.users.delete_many({})
+                await backend.db.attempts.delete_many({})
+                await backend.db.attempts.insert_many([dict(a) for a in data["attempts"]])
+            else:
+                tmp = os.path.join(root, ".cases.tmp")
+                with open(tmp, "w") as f:
+                    json.dump(cases, f)
+                os.replace(tmp, backend.CASES_PATH)
+            for cid in data["images"]:
+                for k in range(2):
+                    backend.s3_client.put_object(Bucket=BUCKET, Key=f"cases/{cid}/image-{k}.png",
+                                                 Body=os.urandom(64 * 1024), ContentType="image/png")
+            for u in data["users"]:
+                await backend.create_user(u, PASSWORD)
+            if backend.USE_MONGO:
+                await backend.rebuild_rollups()
+            if shared:
+                open(marker, "w").close()
+        if not backend.USE_MONGO:  # users and attempts live in each worker's memory
+            if not backend._users:
+                for u in data["users"]:
+                    await backend.create_user(u, PASSWORD)
+            backend._attempts.clear()
+            for a in data["attempts"]:
+                backend._attempts.setdefault(a["user"], []).append(dict(a))
+            await backend.rebuild_rollups()
+    finally:
+        os.close(lock_fd)
+
+
+def __getattr__(name):
+    if name == "served_app":
+        backend = _import_backend()
+
+        async def seed_worker():
+            await seed(backend)
+        backend.app.router.on_startup.append(seed_worker)
+        globals()["served_app"] = backend.app
+        return backend.app
+    raise AttributeError(name)
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+def scenarios(ctx):
+    """(name, kind, make) with make(rng) -> (method, path, kwargs)."""
+    cases, live = ctx["cases"], [c for c in ctx["cases"] if not c["deleted"]]
+    pick = lambda rng: rng.choice(live)
+    transcript = ("CT of the abdomen shows wall thickening and fat stranding around the appendix. "
+                  "Most likely acute appendicitis; differential includes diverticulitis. Surgical consult.")
+
+    def feedback_body(rng):
+        c = pick(rng)
+        return {"caseId": c["id"], "boardPrompt": c["boardPrompt"], "expectedAnswer": c["expectedAnswer"],
+                "rubric": c["rubric"], "transcript": transcript}
+
+    def attempt(rng):
+        c = pick(rng)
+        return ("POST", "/api/attempt", {"json": {"caseId": c["id"], "subspecialty": c["subspecialty"],
+                                                  "similarity": rng.random(), "rubricHit": 2,
+                                                  "rubricTotal": 4, "letter": "B"}})
+
+    def put_case(rng):
+        c = dict(pick(rng))
+        c["title"] = f"{c['title'].split(' #')[0]} #{rng.randint(0, 999)}"
+        return ("PUT", f"/api/cases/{c['id']}", {"json": c})
+
+    return [
+        ("GET /api/health", "read", lambda rng: ("GET", "/api/health", {})),
+        ("GET /api/me", "read", lambda rng: ("GET", "/api/me", {})),
+        ("GET /api/cases", "read", lambda rng: ("GET", "/api/cases", {})),
+        ("GET /api/cases?limit=50", "read", lambda rng: ("GET", "/api/cases?limit=50", {})),
+        ("GET /api/cases?examMode&fields", "read",
+         lambda rng: ("GET", "/api/cases?limit=50&examMode=true&fields=title,subspecialty", {})),
+        ("GET /api/cases/trash?limit=50", "read", lambda rng: ("GET", "/api/cases/trash?limit=50", {})),
+        ("GET /api/cases/{id}", "read", lambda rng: ("GET", f"/api/cases/{pick(rng)['id']}", {})),
+        ("GET /api/cases/{id}/signed", "read", lambda rng: ("GET", f"/api/cases/{pick(rng)['id']}/signed", {})),
+        ("GET /api/admin/cases?limit=50", "read", lambda rng: ("GET", "/api/admin/cases?limit=50", {})),
+        ("GET /api/progress", "read", lambda rng: ("GET", "/api/progress", {})),
+        ("GET /api/progress/attempts", "read", lambda rng: ("GET", "/api/progress/attempts", {})),
+        ("GET /api/concepts", "read", lambda rng: ("GET", "/api/concepts", {})),
+        ("POST /api/concepts/detect", "read",
+         lambda rng: ("POST", "/api/concepts/detect", {"json": {"text": transcript}})),
+        ("POST /api/grade", "read",
+         lambda rng: ("POST", "/api/grade", {"json": {"caseId": pick(rng)["id"], "transcript": transcript}})),
+        ("POST /api/grade/batch", "read",
+         lambda rng: ("POST", "/api/grade/batch", {"json": {"items": [
+             {"caseId": pick(rng)["id"], "transcript": transcript} for _ in range(8)]}})),
+        ("GET /api/s3/presign", "read",
+         lambda rng: ("GET", f"/api/s3/presign?op=get&key=cases/{pick(rng)['id']}/image-0.png", {})),
+        ("GET /api/media/{key}", "read", lambda rng: ("GET", rng.choice(ctx["media_urls"]), {})),
+        ("GET /api/metrics", "read", lambda rng: ("GET", "/api/metrics", {})),
+        ("POST /api/attempt", "write", attempt),
+        ("PUT /api/cases/{id}", "write", put_case),
+        ("POST /api/auth/login", "auth",
+         lambda rng: ("POST", "/api/auth/login", {"data": {"username": rng.choice(ctx["users"]),
+                                                           "password": PASSWORD}})),
+        ("POST /api/feedback", "llm", lambda rng: ("POST", "/api/feedback", {"json": feedback_body(rng)})),
+        ("POST /api/feedback/stream", "llm",
+         lambda rng: ("POST", "/api/feedback/stream", {"json": feedback_body(rng)})),
+        ("POST /api/mcq/chat", "llm", lambda rng: ("POST", "/api/mcq/chat", {"json": {
+            "caseId": pick(rng)["id"], "question": "Which finding is most specific?",
+            "choices": ["a", "b", "c", "d"], "selected": ["a"],
+            "messages": [{"role": "user", "content": "Why is (a) right?"}]}})),
+        ("POST /api/cases/{id}/generate-rubric", "llm",
+         lambda rng: ("POST", f"/api/cases/{pick(rng)['id']}/generate-rubric?force=true",
+                      {"json": {"title": "t", "subspecialty": "GI", "boardPrompt": "p", "expectedAnswer": "a"}})),
+    ]
+
+
+def token_for(user: str) -> str:
+    from jose import jwt
+    now = int(time.time())
+    return jwt.encode({"sub": user, "iat": now, "exp": now + 24 * 3600}, JWT_SECRET, algorithm="HS256")
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else 0.0
+
+
+async def drive(client, ctx, args):
+    rng = random.Random(args.seed)
+    tokens = {u: token_for(u) for u in ctx["users"]}
+    # Signed /api/media URLs come from the app (the proxy signs them)
+    r = await client.get(f"/api/cases/{ctx['images'][0]}/signed",
+                         headers={"Authorization": f"Bearer {tokens[ctx['users'][0]]}"})
+    r.raise_for_status()
+    ctx["media_urls"] = [i for i in r.json().get("images", []) if i.startswith("/api/media/")] or ["/api/health"]
+    only = re.compile(args.only) if args.only else None
+    results = {}
+    for name, kind, make in scenarios(ctx):
+        if only and not only.search(name):
+            continue
+        if kind == "llm" and args.skip_llm:
+            continue
+        n = max(1, args.requests // (4 if kind in ("llm", "auth") else 1))
+
+        async def one(lat, errors):
+            method, path, kw = make(rng)
+            user = ctx["users"][0] if name in ADMIN_ROUTES else rng.choice(ctx["users"])
+            headers = {"Authorization": f"Bearer {tokens[user]}"}
+            t0 = time.perf_counter()
+            resp = await client.request(method, path, headers=headers, **kw)
+            lat.append(time.perf_counter() - t0)
+            if resp.status_code >= 400:
+                errors.append(f"{resp.status_code} {resp.text[:120]}")
+
+        async def batch(count):
+            lat, errors = [], []
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def guarded():
+                async with sem:
+                    await one(lat, errors)
+            t0 = time.perf_counter()
+            await asyncio.gather(*(guarded() for _ in range(count)))
+            return time.perf_counter() - t0, lat, errors
+
+        await batch(max(2, n // 10))  # warm-up: caches, pools, connections
+        wall, lat, errors = await batch(n)
+        ms = [x * 1e3 for x in lat]
+        results[name] = {"kind": kind, "n": n, "errors": len(errors),
+                         "p50_ms": round(pct(ms, 0.50), 2), "p95_ms": round(pct(ms, 0.95), 2),
+                         "p99_ms": round(pct(ms, 0.99), 2), "rps": round(n / wall, 1)}
+        line(name, results[name])
+        if errors:
+            print(f"      first error: {errors[0]}")
+    return results
+
+
+def line(name, r, base=None):
+    s = (f"  {name:40s} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} ms {r['rps']:8.1f} rps"
+         f"{'  ERR ' + str(r['errors']) if r['errors'] else ''}")
+    print(s)
+
+
+# ---------------------------------------------------------------------------
+# Runners
+# ---------------------------------------------------------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_http(url: str, timeout: float = 60.0):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def run_inproc(ctx, args):
+    import httpx
+    backend = _import_backend()
+
+    async def go():
+        await seed(backend)
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await drive(client, ctx, args)
+    try:
+        return asyncio.run(go())
+    finally:
+        backend.passwords.shutdown()
+        backend.image_deriver.shutdown()
+
+
+def run_uvicorn(ctx, args, env):
+    import httpx
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench_api:served_app", "--app-dir", HERE, "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        env=env)
+    try:
+        wait_http(f"http://127.0.0.1:{port}/api/health")
+        time.sleep(1.0)  # let every worker finish its startup seeding
+
+        async def go():
+            limits = httpx.Limits(max_connections=args.concurrency * 2)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+                return await drive(client, ctx, args)
+        return asyncio.run(go())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def compare(results, baseline, params, tolerance, min_delta_ms):
+    print(f"\ncompared with baseline ({baseline['meta'].get('recorded')}, {baseline['meta'].get('machine')}):")
+    differ = {k: v for k, v in baseline["meta"].get("params", {}).items() if params.get(k) != v}
+    if differ:
+        print(f"  note: baseline was recorded with {differ}")
+    print(f"  {'route':40s} {'p50':>8s} {'p95':>8s} {'rps':>8s}")
+    regressed = []
+    for name, r in results.items():
+        b = baseline["routes"].get(name)
+        if not b:
+            print(f"  {name:40s}      new")
+            continue
+        d = {k: (r[k] - b[k]) / b[k] if b[k] else 0.0 for k in ("p50_ms", "p95_ms", "rps")}
+        flag = ""
+        if any(d[k] > tolerance and r[k] - b[k] > min_delta_ms for k in ("p50_ms", "p95_ms")):
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"  {name:40s} {d['p50_ms']:+7.0%} {d['p95_ms']:+7.0%} {d['rps']:+7.0%}{flag}")
+    for name in baseline["routes"]:
+        if name not in results:
+            print(f"  {name:40s}  not run")
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", choices=["file", "mongo"], default="file")
+    ap.add_argument("--mongo-uri", help="real mongod (default: mongomock_motor in-process)")
+    ap.add_argument("--mode", choices=["inproc", "uvicorn"], default="inproc")
+    ap.add_argument("--workers", type=int, default=2, help="uvicorn workers (--mode uvicorn)")
+    ap.add_argument("--cases", type=int, default=2000)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--attempts", type=int, default=200, help="attempt history per user")
+    ap.add_argument("--requests", type=int, default=400, help="per route (LLM and login routes run 1/4)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--llm-latency-ms", type=float, default=50)
+    ap.add_argument("--skip-llm", action="store_true")
+    ap.add_argument("--only", help="regex over route names")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--save", nargs="?", const="", help="store results as a baseline (default name: backend-mode)")
+    ap.add_argument("--compare", nargs="?", const="", help="compare with a stored baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed p50/p95 slowdown for --compare")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0,
+                    help="ignore slowdowns smaller than this (sub-millisecond routes are noisy)")
+    args = ap.parse_args()
+    label = f"{args.backend}{'' if args.backend == 'file' or args.mongo_uri else '-mock'}-{args.mode}"
+
+    root = tempfile.mkdtemp(prefix="bench-api-")
+    cases, users = write_data(root, args)
+    with open(os.path.join(root, "seed.json")) as f:
+        images = json.load(f)["images"]
+    ctx = {"cases": cases, "users": users, "images": images}
+
+    env = {
+        "BENCH_API_DATA": root, "CASES_JSON": os.path.join(root, "cases.json"),
+        "AUTH_MODE": "jwt", "JWT_SECRET": JWT_SECRET, "ADMIN_EMAILS": users[0], "BCRYPT_ROUNDS": "4",
+        "S3_BUCKET": BUCKET, "MEDIA_CACHE_DIR": os.path.join(root, "media-cache"),
+        "METRICS_DIR": os.path.join(root, "metrics"), "REQUEST_LOG_SAMPLE": "0",
+        "REVOCATIONS_FILE": os.path.join(root, "revocations.json"),
+        "LLM_CACHE_DIR": os.path.join(root, "llm-cache"),
+        "OPENAI_API_KEY": "stub", "PASSWORD_HASH_MAX_PENDING": "1024",
+    }
+    os.environ.pop("MONGO_URI", None)
+    os.environ.pop("MEDIA_ACCEL_PREFIX", None)
+    if args.backend == "mongo":
+        env["MONGO_URI"] = args.mongo_uri or "mongodb://bench/bench"
+        if not args.mongo_uri:
+            env["BENCH_API_MONGOMOCK"] = "1"
+            if args.mode == "uvicorn":
+                print("note: mongomock is per process; each worker seeds and serves its own copy")
+
+    stub = None
+    if not args.skip_llm:
+        port = free_port()
+        stub_env = dict(os.environ, STUB_LATENCY_MS=str(args.llm_latency_ms), STUB_TTFT_MS=str(args.llm_latency_ms / 4),
+                        STUB_JITTER_MS="0")
+        stub = subprocess.Popen([sys.executable, "-m", "uvicorn", "llm_stub_server:app", "--app-dir", HERE,
+                                 "--port", str(port), "--log-level", "warning"], env=stub_env)
+        env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.update(env)
+    try:
+        if stub:
+            wait_http(f"http://127.0.0.1:{port}/docs")
+        print(f"{label}: {args.cases} cases, {args.users} users x {args.attempts} attempts, "
+              f"{args.requests} requests/route at concurrency {args.concurrency}"
+              f"{f', {args.workers} workers' if args.mode == 'uvicorn' else ''}")
+        print(f"  {'route':40s} {'p50':>8s} {'p95':>8s} {'p99':>8s}    {'rps':>8s}")
+        if args.mode == "inproc":
+            results = run_inproc(ctx, args)
+        else:
+            results = run_uvicorn(ctx, args, dict(os.environ))
+    finally:
+        if stub:
+            stub.terminate()
+            stub.wait()
+        shutil.rmtree(root, ignore_errors=True)
+
+    name = lambda v: os.path.join(BASELINES, f"{v or label}.json")
+    params = {k: getattr(args, k) for k in ("cases", "users", "attempts", "requests", "concurrency", "workers",
+                                           "llm_latency_ms")}
+    status = 0
+    if args.compare is not None:
+        try:
+            with open(name(args.compare)) as f:
+                baseline = json.load(f)
+        except OSError:
+            sys.exit(f"no baseline at {name(args.compare)}; record one with --save")
+        regressed = compare(results, baseline, params, args.tolerance, args.min_delta_ms)
+        if regressed:
+            print(f"\n{len(regressed)} route(s) slower than the baseline by more than {args.tolerance:.0%}")
+            status = 1
+    if args.save is not None:
+        os.makedirs(BASELINES, exist_ok=True)
+        doc = {"meta": {"recorded": time.strftime("%Y-%m-%d"), "label": label,
+                        "machine": f"{platform.machine()}, {os.cpu_count()} CPU(s), Python {platform.python_version()}",
+                        "params": params},
+               "routes": results}
+        with open(name(args.save), "w") as f:
+            json.dump(doc, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {os.path.relpath(name(args.save))}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
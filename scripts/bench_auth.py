@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Per-request bearer-token auth overhead, before and after the token cache.
+
+Two measurements, each for the previous dependency (full ``jwt.decode`` on
+every request) and the current ``current_identity`` (verified-token LRU plus
+a revocation Bloom-filter probe):
+
+  dependency   the auth dependency alone, called --calls times with a ready
+               Request (microseconds per call)
+  end to end   --requests GETs of a protected route through the in-process app,
+               --concurrency at a time (requests/s)
+
+--revoked users (out of --users) have their sessions revoked first, so the
+Bloom-hit path is exercised and revoked tokens are checked to be rejected.
+
+    python scripts/bench_auth.py --users 200 --calls 50000 --requests 4000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--revoked", type=int, default=10)
+    ap.add_argument("--calls", type=int, default=50000)
+    ap.add_argument("--requests", type=int, default=4000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-auth-")
+    cases = os.path.join(root, "cases.json")
+    with open(cases, "w") as f:
+        json.dump([], f)
+    os.environ.update(CASES_JSON=cases, AUTH_MODE="jwt", REVOCATIONS_FILE=os.path.join(root, "revocations.json"))
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    import httpx
+    from fastapi import Depends, Request
+    from starlette.requests import Request as StarletteRequest
+
+    users = [f"bench{i}@example.org" for i in range(args.users)]
+    revoked_users = users[:args.revoked]
+    async def revoke_all():
+        for u in revoked_users:
+            await backend.revocations.revoke(u)
+    asyncio.run(revoke_all())
+    time.sleep(1.1)  # tokens below are issued after the cutoff second
+    tokens = [backend.create_access_token(u) for u in users]
+
+    async def identity_decode(request: Request) -> str:  # the previous dependency
+        auth = request.headers.get("authorization") or ""
+        return backend._decode_jwt(auth.split(" ", 1)[1])[0]
+
+    @backend.app.get("/bench/me-decode")
+    async def me_decode(identity: str = Depends(identity_decode)):
+        return {"identity": identity}
+
+    def request_for(token):
+        return StarletteRequest({"type": "http", "method": "GET", "path": "/api/me", "query_string": b"",
+                                 "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+    reqs = [request_for(t) for t in tokens]
+
+    async def dependency(fn):
+        for i in range(min(len(reqs), 100)):  # warm the cache
+            await fn(reqs[i])
+        t0 = time.perf_counter()
+        for i in range(args.calls):
+            await fn(reqs[i % len(reqs)])
+        return (time.perf_counter() - t0) / args.calls * 1e6
+
+    async def end_to_end(path):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def one(i):
+                async with sem:
+                    r = await client.get(path, headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+                    assert r.status_code == 200, r.text
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            return args.requests / (time.perf_counter() - t0)
+
+    async def run():
+        # Tokens issued before a revocation must be rejected
+        old = backend.create_access_token(users[-1])
+        await backend.revocations.revoke(users[-1])
+        try:
+            await backend.current_identity(request_for(old))
+            raise AssertionError("revoked token accepted")
+        except backend.HTTPException as e:
+            assert e.status_code == 401
+        await asyncio.sleep(1.1)
+        tokens[-1] = backend.create_access_token(users[-1])
+        reqs[-1] = request_for(tokens[-1])
+
+        before = await dependency(identity_decode)
+        after = await dependency(lambda r: backend.current_identity(r, None))
+        rps_before = await end_to_end("/bench/me-decode")
+        rps_after = await end_to_end("/api/me")
+        return before, after, rps_before, rps_after
+
+    before, after, rps_before, rps_after = asyncio.run(run())
+    print(f"{args.users} users ({args.revoked + 1} with revoked sessions), {args.calls} dependency calls, "
+          f"{args.requests} requests x{args.concurrency}")
+    print(f"  dependency   decode every request {before:7.1f} us/call   cached + revocation check {after:7.1f} us/call"
+          f"   ({before / after:.1f}x)")
+    print(f"  end to end   decode every request {rps_before:7.0f} req/s    cached + revocation check {rps_after:7.0f} req/s")
+    print(f"  tokens {backend.verified_tokens.snapshot()}")
+    print(f"  revocations {backend.revocations.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
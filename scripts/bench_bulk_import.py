@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Seeding time: one POST /api/admin/cases per case vs one NDJSON bulk import.
+
+Runs the in-process app on an empty JSON file catalog, imports --cases synthetic
+cases both ways, then times the streaming NDJSON export.
+
+    python scripts/bench_bulk_import.py --cases 2000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+from bench_catalog import synth_cases
+
+CASE_FIELDS = ("id", "title", "subspecialty", "tags", "images", "boardPrompt", "expectedAnswer", "rubric")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=2000)
+    args = ap.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-bulk-"), "cases.json")
+    with open(path, "w") as f:
+        json.dump([], f)
+    os.environ.update(CASES_JSON=path, AUTH_MODE="off")
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    import httpx
+
+    cases = [{k: c[k] for k in CASE_FIELDS if k in c} for c in synth_cases(args.cases)]
+    one_by_one = [dict(c, id=c["id"] + "-single") for c in cases]
+    body = "".join(json.dumps(c) + "\n" for c in cases).encode()
+
+    async def run():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            t0 = time.perf_counter()
+            for c in one_by_one:
+                r = await client.post("/api/admin/cases", json=c)
+                assert r.status_code == 200, r.text
+            t_single = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            r = await client.post("/api/admin/cases/bulk?mode=insert", content=body,
+                                  headers={"Content-Type": "application/x-ndjson"})
+            t_bulk = time.perf_counter() - t0
+            result = r.json()
+            assert r.status_code == 200 and not result["errors"], r.text
+
+            t0 = time.perf_counter()
+            r = await client.get("/api/admin/cases/export")
+            t_export = time.perf_counter() - t0
+            return t_single, t_bulk, result["applied"], t_export, r.text.count("\n"), len(r.content)
+
+    t_single, t_bulk, applied, t_export, rows, size = asyncio.run(run())
+    print(f"{args.cases} cases, JSON file store")
+    print(f"  POST /api/admin/cases x{args.cases}  {t_single * 1e3:9.0f} ms   {args.cases / t_single:8.0f} cases/s")
+    print(f"  POST /api/admin/cases/bulk       {t_bulk * 1e3:9.0f} ms   {applied / t_bulk:8.0f} cases/s   "
+          f"({t_single / t_bulk:.0f}x)")
+    print(f"  GET  /api/admin/cases/export     {t_export * 1e3:9.0f} ms   {rows} rows, {size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
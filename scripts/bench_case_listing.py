@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Payload size and latency of first-page case listings on a large catalog.
+
+Compares the full /api/cases list against keyset pages (`limit`, `after`) and
+`fields=` projections, on the JSON file backend and, with --mongo, on an
+in-memory mongomock_motor database.
+
+    python scripts/bench_case_listing.py --cases 10000 --runs 20 [--mongo]
+
+Needs httpx (and mongomock-motor for --mongo) in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, statistics, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from bench_catalog import synth_cases
+
+QUERIES = [
+    ("full list", "/api/cases"),
+    ("full list, examMode", "/api/cases?examMode=true"),
+    ("limit=50", "/api/cases?limit=50"),
+    ("limit=50, examMode", "/api/cases?limit=50&examMode=true"),
+    ("limit=50, fields=id,title,subspecialty", "/api/cases?limit=50&fields=title,subspecialty"),
+    ("trash, limit=50", "/api/cases/trash?limit=50"),
+]
+
+
+async def measure(app, path, runs):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        times, size = [], 0
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            times.append(time.perf_counter() - t0)
+            assert r.status_code == 200, (path, r.status_code)
+            size = len(r.content)
+        return statistics.median(times), size
+
+
+async def walk(app, limit):
+    """Page through the whole listing to check the cursor visits every case once."""
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        seen, after = [], None
+        while True:
+            params = {"limit": limit, "fields": "id"}
+            if after:
+                params["after"] = after
+            r = await client.get("/api/cases", params=params)
+            seen.extend(x["id"] for x in r.json())
+            after = r.headers.get("x-next-after")
+            if not after:
+                return seen
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=10000)
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--mongo", action="store_true", help="use mongomock_motor instead of the JSON file")
+    args = ap.parse_args()
+
+    cases = synth_cases(args.cases)
+    os.environ["AUTH_MODE"] = "off"
+    if args.mongo:
+        import mongomock_motor, motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+        os.environ["MONGO_URI"] = "mongodb://bench/bench"
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-listing-"), "cases.json")
+        with open(path, "w") as f:
+            json.dump(cases, f, indent=2)
+        os.environ["CASES_JSON"] = path
+        os.environ.pop("MONGO_URI", None)
+    sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+    import app as backend
+
+    if args.mongo:
+        backend.db = backend.mongo_client["bench"]
+        asyncio.run(backend.db.cases.insert_many([dict(c) for c in cases]))
+
+    print(f"{'mongo' if args.mongo else 'file'} backend, {args.cases} cases")
+    for name, q in QUERIES:
+        t, size = asyncio.run(measure(backend.app, q, args.runs))
+        print(f"  {name:40s} {size / 1024:10.1f} KiB {t * 1e3:9.2f} ms")
+
+    seen = asyncio.run(walk(backend.app, 500))
+    expected = sorted(c["id"] for c in cases if not c["deleted"])
+    print(f"  paged walk (limit=500): {len(seen)} ids, matches full list: {seen == expected}")
+
+
+if __name__ == "__main__":
+    main()
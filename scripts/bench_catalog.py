@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark case reads against a synthetic catalog on the JSON file backend.
+
+Compares the old read path (re-parse cases.json + linear scan) with the
+in-process CaseCatalog, then drives the ASGI app in-process for requests/sec.
+
+    python scripts/bench_catalog.py --cases 10000 --requests 2000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, random, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SUBS = ["Neuroradiology", "Musculoskeletal Radiology", "Gastrointestinal Radiology",
+        "Genitourinary Radiology", "Ultrasound", "Thoracic Radiology"]
+
+
+def synth_cases(n: int):
+    out = []
+    for i in range(n):
+        sub = SUBS[i % len(SUBS)]
+        out.append({
+            "id": f"syn-{i:06d}",
+            "title": f"Synthetic case {i}",
+            "subspecialty": sub,
+            "tags": ["synthetic", sub.split()[0].lower()],
+            "images": [f"https://example-bucket.s3.amazonaws.com/cases/syn-{i:06d}/image-{k}.png" for k in range(3)],
+            "boardPrompt": "A 45-year-old presents with abdominal pain. " * 3,
+            "expectedAnswer": "Diagnosis: something. Key: findings. Differential: a, b, c. Management: consult. " * 4,
+            "rubric": [f"mentions finding {k}" for k in range(8)],
+            "deleted": (i % 50 == 0),
+        })
+    return out
+
+
+def timeit(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+async def drive(app, paths, n, concurrency):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(path):
+            async with sem:
+                r = await client.get(path)
+                assert r.status_code == 200, (path, r.status_code)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(random.choice(paths)) for _ in range(n)))
+        return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=10000)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-catalog-")
+    path = os.path.join(tmp, "cases.json")
+    cases = synth_cases(args.cases)
+    with open(path, "w") as f:
+        json.dump(cases, f, indent=2)
+    print(f"catalog: {args.cases} cases, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    os.environ["CASES_JSON"] = path
+    os.environ["AUTH_MODE"] = "off"
+    os.environ.pop("MONGO_URI", None)
+    sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+    import app as backend
+
+    ids = [c["id"] for c in cases]
+
+    def old_get():
+        cid = random.choice(ids)
+        with open(path) as f:
+            items = json.load(f)
+        for it in items:
+            if it.get("id") == cid:
+                return it
+
+    def new_get():
+        return backend._catalog.get(random.choice(ids))
+
+    backend._catalog.refresh(force=True)
+    old = timeit(old_get, 20)
+    new = timeit(new_get, 20000)
+    print(f"get one case   parse+scan: {old * 1e3:9.3f} ms   catalog: {new * 1e6:9.3f} us   ({old / new:,.0f}x)")
+
+    paths = [f"/api/cases/{random.choice(ids)}" for _ in range(1000)]
+    rps = asyncio.run(drive(backend.app, paths, args.requests, args.concurrency))
+    print(f"GET /api/cases/{{id}}        {rps:10.0f} req/s")
+
+    rps = asyncio.run(drive(backend.app, ["/api/cases/trash"], max(50, args.requests // 20), args.concurrency))
+    print(f"GET /api/cases/trash        {rps:10.0f} req/s")
+
+    rps = asyncio.run(drive(backend.app, ["/api/cases"], max(20, args.requests // 100), 4))
+    print(f"GET /api/cases (full list)  {rps:10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Scan time of the concept engine against a per-concept regex loop.
+
+Builds a synthetic dictionary (--concepts, each with a few phrases and one
+co-occurrence rule) and long synthetic dictations, then times:
+
+  per-concept   what concepts.js does: build a regex per concept from its
+                phrases on every call, search the text, and rescan a window
+                around each hit for co-occurrence and preceding negation
+  engine        one Aho-Corasick pass (backend/concept_engine.py)
+
+    python scripts/bench_concepts.py --concepts 1000 --words 5000 --runs 5
+"""
+import argparse, os, random, re, statistics, sys, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+
+from concept_engine import ConceptEngine
+
+NEG = re.compile(r"\b(no|not|without|absent|negative\s+for|denies?|deny|free\s+of)\b", re.I)
+
+
+def lexicon(rng, n):
+    syll = ["ap", "pen", "dic", "ul", "ar", "ne", "phro", "cal", "ci", "no", "sis", "hep", "at", "ic", "ven",
+            "tri", "cu", "lar", "my", "o", "ma", "os", "te", "lith", "ure", "ter", "cor", "ti", "cal", "med"]
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(syll) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synth_concepts(rng, words, n):
+    out = []
+    for i in range(n):
+        terms = [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(rng.randint(2, 5))]
+        out.append({"id": f"c.{i}", "label": f"Concept {i}", "terms": terms,
+                    "near": [{"a": [rng.choice(words)], "b": [rng.choice(words)], "window": 15}]})
+    return out
+
+
+def synth_text(rng, words, n):
+    filler = "the is a with of and in there no this likely right left without".split()
+    out = []
+    for _ in range(n):
+        out.append(rng.choice(words) if rng.random() < 0.25 else rng.choice(filler))
+        if rng.random() < 0.06:
+            out[-1] += "."
+    return " ".join(out)
+
+
+def per_concept(text, concepts):
+    hits = {}
+    for c in concepts:
+        pat = re.compile("|".join(r"\b%s\b" % r"\s+".join(map(re.escape, t.split())) for t in c["terms"]), re.I)
+        m = pat.search(text)
+        if m:
+            neg = bool(NEG.search(text[max(0, m.start() - 40):m.start()]))
+            hits[c["id"]] = neg
+            continue
+        for rule in c.get("near", ()):
+            a = re.compile(r"\b(%s)\b" % "|".join(map(re.escape, rule["a"])), re.I)
+            b = re.compile(r"\b(%s)\b" % "|".join(map(re.escape, rule["b"])), re.I)
+            for m in a.finditer(text):
+                if b.search(text[max(0, m.start() - 90):m.end() + 90]):
+                    hits[c["id"]] = False
+                    break
+    return hits
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concepts", type=int, default=1000)
+    ap.add_argument("--words", type=int, default=5000)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    rng = random.Random(11)
+    words = lexicon(rng, 3000)
+    concepts = synth_concepts(rng, words, args.concepts)
+    text = synth_text(rng, words, args.words)
+
+    t0 = time.perf_counter()
+    engine = ConceptEngine(concepts)
+    t_compile = time.perf_counter() - t0
+    found = engine.detect(text)
+    print(f"{args.concepts} concepts, {len(engine._goto)} automaton states (compiled in {t_compile * 1e3:.0f} ms); "
+          f"dictation {args.words} words / {len(text) / 1024:.0f} KiB; engine finds {len(found)} concepts")
+
+    t_old = timed(lambda: per_concept(text, concepts), max(1, args.runs // 2))
+    t_new = timed(lambda: engine.detect(text), args.runs)
+    print(f"  per-concept regex {t_old * 1e3:9.1f} ms")
+    print(f"  engine            {t_new * 1e3:9.1f} ms   ({t_old / t_new:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Time-to-first-byte of /api/feedback vs /api/feedback/stream.
+
+Starts scripts/llm_stub_server.py (streaming-capable) and the backend under
+uvicorn on local ports, then measures for each endpoint:
+
+  ttfb       first response byte
+  first tok  first `token` event (stream only)
+  first sec  first completed `section` event (stream only)
+  total      full response / `done` event
+
+    python scripts/bench_feedback_stream.py --latency-ms 4000 --ttft-ms 300 --runs 5
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, os, statistics, subprocess, sys, time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from bench_llm import free_port, wait_port
+
+PAYLOAD = {"caseId": "gi-001", "boardPrompt": "RLQ pain", "expectedAnswer": "Diagnosis: appendicitis",
+           "rubric": ["names study type", "mentions stranding"], "transcript": "CT shows appendicitis."}
+
+
+def time_plain(client):
+    t0 = time.perf_counter()
+    with client.stream("POST", "/api/feedback", json=PAYLOAD) as r:
+        it = r.iter_bytes()
+        next(it)
+        ttfb = time.perf_counter() - t0
+        for _ in it:
+            pass
+    return {"ttfb": ttfb, "total": time.perf_counter() - t0}
+
+
+def time_stream(client):
+    out = {}
+    t0 = time.perf_counter()
+    with client.stream("POST", "/api/feedback/stream", json=PAYLOAD) as r:
+        event = None
+        for line in r.iter_lines():
+            now = time.perf_counter() - t0
+            out.setdefault("ttfb", now)
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "token":
+                    out.setdefault("first tok", now)
+                elif event == "section":
+                    out.setdefault("first sec", now)
+                elif event == "done":
+                    out["total"] = now
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=4000)
+    ap.add_argument("--ttft-ms", type=float, default=300)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    stub_port, app_port = free_port(), free_port()
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1", OPENAI_API_KEY="stub",
+               AUTH_MODE="off")
+    procs = [
+        subprocess.Popen([sys.executable, os.path.join(HERE, "llm_stub_server.py"), "--port", str(stub_port),
+                          "--latency-ms", str(args.latency_ms), "--ttft-ms", str(args.ttft_ms), "--jitter-ms", "0"]),
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(app_port),
+                          "--log-level", "warning"], cwd=os.path.join(HERE, ".."), env=env),
+    ]
+    try:
+        wait_port(stub_port)
+        wait_port(app_port, timeout=30)
+        with httpx.Client(base_url=f"http://127.0.0.1:{app_port}", timeout=120) as client:
+            for name, fn in (("/api/feedback", time_plain), ("/api/feedback/stream", time_stream)):
+                runs = [fn(client) for _ in range(args.runs)]
+                cols = "  ".join(f"{k} {statistics.median(r[k] for r in runs) * 1e3:7.0f} ms"
+                                 for k in ("ttfb", "first tok", "first sec", "total") if k in runs[0])
+                print(f"{name:22s} {cols}")
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
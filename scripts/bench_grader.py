@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Throughput of heuristic rubric grading.
+
+Compares a port of the per-keyword substring scan in frontend/js/grade.js with
+the compiled single-pass grader (checking both agree on every transcript), then
+posts /api/grade/batch to the in-process app on a synthetic catalog.
+
+    python scripts/bench_grader.py --transcripts 5000 --batch 2000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, random, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+
+from rubric_grader import HIT_FRACTION, compile_rubric, rubric_keywords
+from bench_catalog import synth_cases
+
+VOCAB = ("periappendiceal stranding fluid appendix enlarged dilated appendicolith hyperemia "
+         "epididymis cortical sparing heterogeneous echotexture septated collection perforation "
+         "abscess contralateral comparison surgical consult follow-up ultrasound contrast enhancement "
+         "thickening obstruction mass lesion calcification edema").split()
+
+RUBRIC = [
+    "Identifies periappendiceal stranding and free fluid",
+    "Notes enlarged appendix greater than 6 mm",
+    "Looks for appendicolith",
+    "Excludes perforation or abscess",
+    "Recommends surgical consult",
+    "Mentions heterogeneous echotexture of the epididymis",
+    "Compares with the contralateral side",
+    "Describes wall thickening and contrast enhancement",
+]
+
+
+def old_grade(transcript, rubric):
+    """Per-item, per-keyword substring scan (gradeHeuristic)."""
+    t = transcript.lower()
+    hits = []
+    for item in rubric:
+        kws = rubric_keywords(item)
+        if kws and sum(kw in t for kw in kws) / len(kws) >= HIT_FRACTION:
+            hits.append(item)
+    return hits
+
+
+def synth_transcript(rng, words=180):
+    filler = "the there is a with and of no in this case i would".split()
+    return " ".join(rng.choice(VOCAB if rng.random() < 0.3 else filler) for _ in range(words)) + "."
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transcripts", type=int, default=5000)
+    ap.add_argument("--batch", type=int, default=2000)
+    ap.add_argument("--cases", type=int, default=200)
+    args = ap.parse_args()
+    rng = random.Random(7)
+    transcripts = [synth_transcript(rng) for _ in range(args.transcripts)]
+
+    t0 = time.perf_counter()
+    old = [old_grade(t, RUBRIC) for t in transcripts]
+    t_old = time.perf_counter() - t0
+
+    compiled = compile_rubric(RUBRIC)
+    t0 = time.perf_counter()
+    new = [compiled.score(t)["hits"] for t in transcripts]
+    t_new = time.perf_counter() - t0
+    print(f"{args.transcripts} transcripts x {len(RUBRIC)} items: substring scan {args.transcripts / t_old:9.0f}/s   "
+          f"compiled {args.transcripts / t_new:9.0f}/s   agree={old == new}")
+
+    long_rubric = RUBRIC * 6
+    compiled = compile_rubric(long_rubric)
+    t0 = time.perf_counter()
+    for t in transcripts:
+        old_grade(t, long_rubric)
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for t in transcripts:
+        compiled.score(t)
+    t_new = time.perf_counter() - t0
+    print(f"{args.transcripts} transcripts x {len(long_rubric)} items: substring scan {args.transcripts / t_old:9.0f}/s   "
+          f"compiled {args.transcripts / t_new:9.0f}/s")
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-grader-"), "cases.json")
+    cases = synth_cases(args.cases)
+    for c in cases:
+        c["rubric"] = rng.sample(RUBRIC, 5)
+    with open(path, "w") as f:
+        json.dump(cases, f)
+    os.environ.update(CASES_JSON=path, AUTH_MODE="off")
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    import httpx
+
+    payload = {"items": [{"caseId": rng.choice(cases)["id"], "transcript": rng.choice(transcripts)}
+                         for _ in range(args.batch)]}
+
+    async def post():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await client.post("/api/grade/batch", json=payload)  # warm: compiles rubrics
+            t0 = time.perf_counter()
+            r = await client.post("/api/grade/batch", json=payload)
+            assert r.status_code == 200, r.text
+            return time.perf_counter() - t0
+
+    t = asyncio.run(post())
+    print(f"POST /api/grade/batch ({args.batch} items, {args.cases} cases): {t * 1e3:8.1f} ms   "
+          f"{args.batch / t:9.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
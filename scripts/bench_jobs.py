@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Bulk rubric generation: one click per case vs. a background job.
+
+Starts scripts/llm_stub_server.py, builds a --cases catalog without rubrics and
+times three ways of filling them in through the in-process app:
+
+  clicks     POST /api/cases/{id}/generate-rubric + PUT /api/cases/{id}, one case
+             after another (what the admin UI does)
+  job        POST /api/admin/jobs {"kind": "rubric", "mode": "apply", "filter": {}},
+             polled on /api/admin/jobs/{id} until done, while a probe hits
+             /api/health every 10 ms
+  restart    the same job with the runner stopped half-way and started again;
+             reports how many cases were generated twice
+
+    python scripts/bench_jobs.py --cases 200 --latency-ms 300 --job-concurrency 4
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, statistics, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_catalog import synth_cases
+from bench_llm import free_port, pct, wait_port
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--job-concurrency", type=int, default=4)
+    ap.add_argument("--rate-per-min", type=float, default=0, help="0: no rate limit")
+    ap.add_argument("--clicks", type=int, default=40, help="cases generated click by click (extrapolated)")
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-jobs-")
+    cases = synth_cases(args.cases)
+    for c in cases:
+        c["rubric"] = []
+        c["deleted"] = False
+    path = os.path.join(root, "cases.json")
+    with open(path, "w") as f:
+        json.dump(cases, f)
+
+    port = free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(HERE, "llm_stub_server.py"), "--port", str(port),
+                             "--latency-ms", str(args.latency_ms)])
+    try:
+        wait_port(port)
+        os.environ.update({
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1", "OPENAI_API_KEY": "stub", "AUTH_MODE": "off",
+            "CASES_JSON": path, "JOBS_DIR": os.path.join(root, "jobs"), "LLM_CACHE_DIR": os.path.join(root, "llm-cache"),
+            "JOBS_CONCURRENCY": str(args.job_concurrency), "JOBS_RATE_PER_MIN": str(args.rate_per_min),
+            "REQUEST_LOG_SAMPLE": "0",
+        })
+        os.environ.pop("MONGO_URI", None)
+        sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+        import app as backend
+        asyncio.run(run(backend, cases, args))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+async def run(backend, cases, args):
+    import httpx
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        backend.job_runner.start()  # ASGITransport does not run the app's lifespan
+
+        clicks = cases[:args.clicks]
+        t0 = time.perf_counter()
+        for c in clicks:
+            r = await client.post(f"/api/cases/{c['id']}/generate-rubric", params={"force": True}, json=c)
+            assert r.status_code == 200, r.text
+            r = await client.put(f"/api/cases/{c['id']}", json={**c, "rubric": r.json()["rubric"]})
+            assert r.status_code == 200, r.text
+        per_case = (time.perf_counter() - t0) / len(clicks)
+        print(f"{args.cases} cases, stub latency {args.latency_ms:.0f} ms")
+        print(f"  clicks   {per_case * 1e3:7.0f} ms/case -> {per_case * args.cases:6.1f} s for all "
+              f"(first {len(clicks)} measured)")
+
+        async def job(stop_after: float = 0.0):
+            r = await client.post("/api/admin/jobs", json={"kind": "rubric", "mode": "apply", "filter": {},
+                                                           "overwrite": True, "force": True})
+            assert r.status_code == 202, r.text
+            job_id = r.json()["id"]
+            probes, done = [], asyncio.Event()
+
+            async def probe():
+                while not done.is_set():
+                    t = time.perf_counter()
+                    await client.get("/api/health")
+                    probes.append(time.perf_counter() - t)
+                    await asyncio.sleep(0.01)
+
+            p = asyncio.create_task(probe())
+            t0 = time.perf_counter()
+            calls0 = backend.llm.stats["calls"]
+            restarted = False
+            while True:
+                s = (await client.get(f"/api/admin/jobs/{job_id}")).json()
+                if s["status"] == "done":
+                    break
+                if stop_after and not restarted and s["done"] >= args.cases * stop_after:
+                    await backend.job_runner.stop()  # in-flight cases are lost, as in a crash
+                    backend.job_runner.start()
+                    restarted = True
+                await asyncio.sleep(0.05)
+            wall = time.perf_counter() - t0
+            done.set()
+            await p
+            return wall, s, backend.llm.stats["calls"] - calls0, probes
+
+        wall, s, calls, probes = await job()
+        print(f"  job      {wall * 1e3 / args.cases:7.0f} ms/case -> {wall:6.1f} s for all, {s['perMinute']} cases/min "
+              f"at concurrency {args.job_concurrency}; counts {s['counts']}")
+        print(f"           /api/health during the job: p50 {statistics.median(probes) * 1e3:.1f} ms, "
+              f"p99 {pct(probes, 99) * 1e3:.1f} ms ({len(probes)} probes)")
+        wall, s, calls, _ = await job(stop_after=0.5)
+        print(f"  restart  {wall:6.1f} s, {calls} completions for {args.cases} cases "
+              f"({calls - args.cases} redone after the restart); counts {s['counts']}")
+        await backend.job_runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Offline latency/throughput benchmark for the LLM routes.
+
+Starts scripts/llm_stub_server.py on a local port, points the backend's LLM
+gateway at it and fires concurrent /api/feedback requests through the ASGI app
+while a probe hits /api/health every 10 ms.  Probe latency shows whether the
+event loop stays responsive while completions are in flight.
+
+    python scripts/bench_llm.py --requests 64 --concurrency 32 --latency-ms 500
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, os, socket, statistics, subprocess, sys, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port: int, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("stub server did not start")
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))] if xs else 0.0
+
+
+async def run(app, n, concurrency):
+    import httpx
+    payload = {"caseId": "gi-001", "boardPrompt": "RLQ pain", "expectedAnswer": "Diagnosis: appendicitis",
+               "rubric": ["names study type", "mentions stranding"], "transcript": "CT shows appendicitis."}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        sem = asyncio.Semaphore(concurrency)
+        lat, probes = [], []
+        done = asyncio.Event()
+
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/api/feedback", json=payload)
+                r.raise_for_status()
+                lat.append(time.perf_counter() - t0)
+
+        async def probe():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/api/health")
+                probes.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.01)
+
+        p = asyncio.create_task(probe())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        wall = time.perf_counter() - t0
+        done.set()
+        await p
+    return wall, lat, probes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=64)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--latency-ms", type=float, default=500)
+    ap.add_argument("--llm-concurrency", type=int, default=8)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    port = free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(HERE, "llm_stub_server.py"), "--port", str(port),
+                             "--latency-ms", str(args.latency_ms), "--fail-rate", str(args.fail_rate)])
+    try:
+        wait_port(port)
+        os.environ.update({
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+            "OPENAI_API_KEY": "stub",
+            "AUTH_MODE": "off",
+            "LLM_MAX_CONCURRENCY": str(args.llm_concurrency),
+        })
+        sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+        import app as backend
+
+        wall, lat, probes = asyncio.run(run(backend.app, args.requests, args.concurrency))
+        print(f"stub latency {args.latency_ms:.0f} ms, gateway concurrency {args.llm_concurrency}, "
+              f"{args.requests} requests at client concurrency {args.concurrency}")
+        print(f"throughput      {args.requests / wall:8.1f} req/s  (wall {wall:.2f}s)")
+        print(f"feedback p50    {statistics.median(lat) * 1e3:8.0f} ms   p95 {pct(lat, 95) * 1e3:.0f} ms")
+        print(f"health probe    p50 {statistics.median(probes) * 1e3:.1f} ms   max {max(probes) * 1e3:.1f} ms"
+              f"   ({len(probes)} probes during load)")
+        print(f"gateway stats   {backend.llm.stats}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Login throughput and event-loop responsiveness under a burst of sign-ins.
+
+Fires --logins POST /api/auth/login requests, --concurrency at a time, at the
+in-process app (AUTH_MODE=jwt, file/in-memory user store) while a ticker
+coroutine measures how late the event loop wakes it up.  Two variants:
+
+  inline     the previous handler: bcrypt verify on the event loop, twice per
+             successful login (mounted here as /bench/login-inline)
+  pool       /api/auth/login: one verify per attempt in the password process pool
+
+Users are seeded with --seed-rounds hashes; when that differs from
+--rounds (BCRYPT_ROUNDS) the pool variant also rehashes them on first login.
+
+    python scripts/bench_login.py --logins 48 --concurrency 16 --rounds 10
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, statistics, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+async def ticker(stop: asyncio.Event, lags: list, every: float = 0.01):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(every)
+        lags.append(time.perf_counter() - t0 - every)
+
+
+async def run(app, path, users, logins, concurrency):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        stop, lags, latencies = asyncio.Event(), [], []
+        tick = asyncio.create_task(ticker(stop, lags))
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(path, data={"username": users[i % len(users)], "password": "bench-password"})
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200, r.text
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(logins)))
+        secs = time.perf_counter() - t0
+        stop.set()
+        await tick
+        return secs, lags, latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=48)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--users", type=int, default=16)
+    ap.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS for the app")
+    ap.add_argument("--seed-rounds", type=int, default=None, help="cost of the seeded hashes (default --rounds)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = ap.parse_args()
+    seed_rounds = args.seed_rounds or args.rounds
+
+    root = tempfile.mkdtemp(prefix="bench-login-")
+    cases = os.path.join(root, "cases.json")
+    with open(cases, "w") as f:
+        json.dump([], f)
+    os.environ.update(CASES_JSON=cases, AUTH_MODE="jwt", BCRYPT_ROUNDS=str(args.rounds),
+                      PASSWORD_HASH_WORKERS=str(args.workers),
+                      PASSWORD_HASH_MAX_PENDING=str(max(64, args.concurrency)))
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    from fastapi import Depends, HTTPException
+    from fastapi.security import OAuth2PasswordRequestForm
+    from password_hasher import make_context
+
+    seed_hash = make_context(seed_rounds).hash("bench-password")
+    users = [f"bench{i}@example.org" for i in range(args.users)]
+
+    def seed():
+        backend._users.clear()
+        for u in users:
+            backend._users[u] = {"email": u, "password_hash": seed_hash, "createdAt": 0}
+
+    @backend.app.post("/bench/login-inline")
+    async def login_inline(form: OAuth2PasswordRequestForm = Depends()):
+        user = backend._users.get(form.username)
+        if user:
+            backend.pwd_ctx.verify(form.password, user["password_hash"])  # the debug-log verify
+        if not user or not backend.pwd_ctx.verify(form.password, user["password_hash"]):
+            raise HTTPException(401, "Invalid credentials")
+        return {"access_token": backend.create_access_token(form.username), "token_type": "bearer"}
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent, {args.users} users, bcrypt cost "
+          f"{seed_rounds} -> {args.rounds}, {args.workers} hash worker(s), {os.cpu_count()} CPU(s)")
+    for name, path in (("inline", "/bench/login-inline"), ("pool", "/api/auth/login")):
+        seed()
+        if name == "pool":  # spawn the pool workers outside the timed run
+            asyncio.run(backend.passwords.hash("warm-up"))
+        secs, lags, lat = asyncio.run(run(backend.app, path, users, args.logins, args.concurrency))
+        lag_ms = sorted(l * 1e3 for l in lags) or [0.0]
+        lat_ms = [l * 1e3 for l in lat]
+        print(f"  {name:7s} {args.logins / secs:7.1f} logins/s  latency p50 {pct(lat_ms, 0.5):7.0f} ms"
+              f"  p95 {pct(lat_ms, 0.95):7.0f} ms   loop lag median {statistics.median(lag_ms):6.1f} ms"
+              f"  p99 {pct(lag_ms, 0.99):7.1f} ms  max {lag_ms[-1]:7.1f} ms")
+    upgraded = sum(1 for u in users if backend._users[u]["password_hash"] != seed_hash)
+    print(f"  pool stats {backend.passwords.snapshot()}, {upgraded}/{len(users)} hashes upgraded")
+    backend.passwords.shutdown()
+
+
+if __name__ == "__main__":
+    main()
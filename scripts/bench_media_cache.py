@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Cold vs cached fetches of case media through /api/media.
+
+Uses scripts/local_s3.py with S3-like per-request latency and bandwidth
+(--latency-ms, --link-mbps) as the origin and the in-process app in front:
+
+  direct S3      what presigned URLs cost: every view is an S3 GET
+  cold burst     --burst concurrent requests for one uncached clip (coalesced
+                 into a single S3 GET)
+  cached         the same clip from the disk cache, full and Range requests
+
+    python scripts/bench_media_cache.py --mb 8 --views 50 --burst 20
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, statistics, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+from local_s3 import LocalS3
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def line(name, times, nbytes):
+    ms = [t * 1e3 for t in times]
+    print(f"  {name:26s} p50 {pct(ms, 0.5):8.1f} ms   p95 {pct(ms, 0.95):8.1f} ms   "
+          f"{nbytes / sum(times) / 1e6:8.1f} MB/s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=int, default=8)
+    ap.add_argument("--views", type=int, default=50)
+    ap.add_argument("--burst", type=int, default=20)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--link-mbps", type=float, default=60.0)
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-media-")
+    cases = os.path.join(root, "cases.json")
+    with open(cases, "w") as f:
+        json.dump([], f)
+    os.environ.update(CASES_JSON=cases, AUTH_MODE="off", S3_BUCKET="bench-bucket",
+                      MEDIA_CACHE_DIR=os.path.join(root, "cache"))
+    os.environ.pop("MONGO_URI", None)
+    os.environ.pop("MEDIA_ACCEL_PREFIX", None)
+    import app as backend
+    import httpx
+
+    s3 = LocalS3(os.path.join(root, "s3"), latency_ms=args.latency_ms, mb_per_sec=args.link_mbps)
+    backend.s3_client = backend.media_cache.client = s3
+    size = args.mb * 1024 * 1024
+    s3.put_object(Bucket="bench-bucket", Key="cases/us-001/us_adenomyosis_cine.mp4", Body=os.urandom(size))
+    s3.put_object(Bucket="bench-bucket", Key="cases/us-001/burst.mp4", Body=os.urandom(size))
+    s3.calls.clear()
+
+    print(f"{args.mb} MiB clip, origin latency {args.latency_ms:.0f} ms, {args.link_mbps:.0f} MB/s per request")
+
+    direct = []
+    for _ in range(min(args.views, 10)):
+        t0 = time.perf_counter()
+        s3.get_object(Bucket="bench-bucket", Key="cases/us-001/us_adenomyosis_cine.mp4")["Body"].read()
+        direct.append(time.perf_counter() - t0)
+    line("direct S3 (every view)", direct, size * len(direct))
+
+    async def run():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            burst_url = backend.media_cache.sign("cases/us-001/burst.mp4", 3600)
+            before = s3.calls.get("get_object", 0)
+            t0 = time.perf_counter()
+            rs = await asyncio.gather(*(client.get(burst_url) for _ in range(args.burst)))
+            t_burst = time.perf_counter() - t0
+            assert all(r.status_code == 200 and len(r.content) == size for r in rs)
+            gets = s3.calls.get("get_object", 0) - before
+
+            url = backend.media_cache.sign("cases/us-001/us_adenomyosis_cine.mp4", 3600)
+            t0 = time.perf_counter()
+            r = await client.get(url)
+            cold = time.perf_counter() - t0
+            assert r.status_code == 200 and len(r.content) == size
+
+            full, ranged = [], []
+            for _ in range(args.views):
+                t0 = time.perf_counter()
+                r = await client.get(url)
+                full.append(time.perf_counter() - t0)
+                assert r.status_code == 200
+            for i in range(args.views):
+                start = (i * 1024 * 1024) % size
+                t0 = time.perf_counter()
+                r = await client.get(url, headers={"Range": f"bytes={start}-{start + 1024 * 1024 - 1}"})
+                ranged.append(time.perf_counter() - t0)
+                assert r.status_code == 206 and len(r.content) == 1024 * 1024, r.status_code
+            stats = (await client.get("/api/admin/media-cache")).json()
+            return t_burst, gets, cold, full, ranged, stats
+
+    t_burst, gets, cold, full, ranged, stats = asyncio.run(run())
+    print(f"  cold burst x{args.burst:<3d}             {t_burst * 1e3:8.1f} ms total, {gets} S3 GET(s)")
+    line("cold miss (1 request)", [cold], size)
+    line("cached, full", full, size * len(full))
+    line("cached, 1 MiB Range", ranged, 1024 * 1024 * len(ranged))
+    print(f"  hit rate {stats['hit_rate']:.3f}  (hits {stats['hits']}, misses {stats['misses']}, "
+          f"coalesced {stats['coalesced']}, fills {stats['fills']}, {stats['bytes'] / 1e6:.0f} MB on disk)")
+
+
+if __name__ == "__main__":
+    main()
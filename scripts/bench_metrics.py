@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Per-request cost of request logging and metrics.
+
+Sends --requests sequential GETs through the in-process app with three
+middleware setups, logging to a file at INFO like uvicorn does:
+
+  bare       no request middleware
+  log_both   the previous log_requests middleware (BaseHTTPMiddleware, two INFO
+             lines per request with origin/CORS headers)
+  metrics    MetricsMiddleware: per-route histograms/counters/in-flight gauges
+             and a REQUEST_LOG_SAMPLE fraction of one-line access logs
+
+then checks the /api/metrics exposition and reports how long rendering takes.
+
+    python scripts/bench_metrics.py --requests 5000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, logging, os, statistics, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-metrics-")
+    cases = os.path.join(root, "cases.json")
+    with open(cases, "w") as f:
+        json.dump([{"id": "gi-001", "title": "Bench case", "subspecialty": "GI"}], f)
+    os.environ.update(CASES_JSON=cases, AUTH_MODE="off", METRICS_DIR=os.path.join(root, "metrics"))
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    import httpx
+    from starlette.middleware import Middleware
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    handler = logging.FileHandler(os.path.join(root, "server.log"))
+    handler.setFormatter(logging.Formatter("%(levelname)s:     %(message)s"))
+    backend.log.addHandler(handler)
+    backend.log.setLevel(logging.INFO)
+    backend.log.propagate = False
+
+    async def log_requests(request, call_next):  # the previous middleware
+        backend.log.info(
+            ">>> %s %s origin=%s ACRM=%s ACRH=%s",
+            request.method, request.url.path,
+            request.headers.get("origin"),
+            request.headers.get("access-control-request-method"),
+            request.headers.get("access-control-request-headers"),
+        )
+        resp = await call_next(request)
+        backend.log.info("<<< %s %s %s", request.method, request.url.path, resp.status_code)
+        return resp
+
+    metrics_mw = [m for m in backend.app.user_middleware if m.cls is backend.MetricsMiddleware]
+    others = [m for m in backend.app.user_middleware if m.cls is not backend.MetricsMiddleware]
+    setups = {
+        "bare": others,
+        "log_both": [Middleware(BaseHTTPMiddleware, dispatch=log_requests)] + others,
+        "metrics": metrics_mw + others,
+    }
+    paths = ["/api/health", "/api/cases/gi-001"]
+
+    async def run(n):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for i in range(50):
+                await client.get(paths[i % 2])
+            t0 = time.perf_counter()
+            for i in range(n):
+                r = await client.get(paths[i % 2], headers={"Origin": "http://localhost:8080"})
+                assert r.status_code == 200, r.text
+            return (time.perf_counter() - t0) / n * 1e6
+
+    originals = {id(r): r.app for r in backend.app.router.routes if hasattr(r, "app")}
+    results = {name: [] for name in setups}
+    for _ in range(args.rounds):  # interleave setups so drift hits all of them
+        for name, stack in setups.items():
+            for r in backend.app.router.routes:  # undo MetricsMiddleware's per-route wrappers
+                if id(r) in originals:
+                    r.app = originals[id(r)]
+                    r._metrics_wrapped = False
+            backend.app.user_middleware = stack
+            backend.app.middleware_stack = None  # rebuilt on the next request
+            results[name].append(asyncio.run(run(args.requests)))
+
+    bare = statistics.median(results["bare"])
+    print(f"{args.requests} sequential GETs x {args.rounds} rounds (median of rounds), "
+          f"REQUEST_LOG_SAMPLE={os.getenv('REQUEST_LOG_SAMPLE', '0.01')}")
+    for name, xs in results.items():
+        us = statistics.median(xs)
+        print(f"  {name:9s} {us:7.1f} us/request   overhead {us - bare:+6.1f} us ({(us - bare) / bare * 100:+5.1f}%)")
+    with open(os.path.join(root, "server.log")) as f:
+        print(f"  log lines written: {sum(1 for _ in f)}")
+
+    t0 = time.perf_counter()
+    text = backend.metrics.render()
+    render_ms = (time.perf_counter() - t0) * 1e3
+    count = [l for l in text.splitlines()
+             if l.startswith('http_request_duration_seconds_count{method="GET",route="/api/cases/{case_id}"')]
+    print(f"  /api/metrics render {render_ms:.1f} ms, {len(text.splitlines())} lines; {count[0] if count else 'missing'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Case search: BM25 inverted index vs. scanning the catalog.
+
+Builds --cases synthetic cases whose words follow a Zipf distribution over a
+radiology vocabulary plus a long tail of rare terms, then reports:
+
+  build        SearchIndex.rebuild time and postings size
+  queries      p50/p95 latency per query shape (common word, two words, as-you-type
+               prefix, rare term, subspecialty filter, browse), next to the
+               substring scan store.js does for every keystroke
+  updates      put (new and changed case), soft delete and remove, plus a sync
+               after a full catalog reload with --changed cases edited
+  http         GET /api/cases/search through the in-process app (file backend)
+
+    python scripts/bench_search.py --cases 50000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, random, statistics, sys, tempfile, time, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+
+SUBS = ["Neuroradiology", "Musculoskeletal Radiology", "Gastrointestinal Radiology",
+        "Genitourinary Radiology", "Ultrasound", "Thoracic Radiology", "Breast Imaging", "Pediatric Radiology"]
+WORDS = """mass lesion enhancement contrast ct mri ultrasound radiograph axial coronal sagittal t1 t2 flair
+diffusion restricted hyperintense hypointense hyperdense hypodense calcification edema effusion fluid air
+wall thickening stranding fat obstruction dilated bowel appendix colon liver spleen kidney pancreas gallbladder
+biliary duct stone cyst abscess hematoma hemorrhage infarct ischemia fracture dislocation cortex marrow
+periosteal reaction lytic sclerotic tumor metastasis lymphoma carcinoma adenoma hemangioma sarcoma nodule
+consolidation pneumothorax pleural mediastinal lymph node aorta aneurysm dissection embolism thrombus vein
+artery stenosis occlusion ring enhancing necrosis midline shift herniation ventricle hydrocephalus sulci
+patient presents pain fever trauma history year old male female acute chronic progressive recurrent
+findings diagnosis differential management surgical consult follow imaging recommend biopsy""".split()
+
+
+def synth_cases(n: int, rng: random.Random):
+    tail = [f"term{i}" for i in range(20000)]  # rare words: eponyms, drug names, ...
+    vocab = WORDS + tail
+    weights = [1.0 / (r + 1) ** 1.05 for r in range(len(vocab))]
+
+    def words(k):
+        return " ".join(rng.choices(vocab, weights, k=k))
+    out = []
+    for i in range(n):
+        sub = SUBS[i % len(SUBS)]
+        out.append({"id": f"syn-{i:06d}", "title": words(rng.randint(2, 5)).title(), "subspecialty": sub,
+                    "tags": rng.sample(WORDS[:60], 3), "boardPrompt": words(rng.randint(20, 40)),
+                    "expectedAnswer": words(rng.randint(40, 90)), "deleted": (i % 50 == 0)})
+    return out
+
+
+def scan(cases, query, subs=None):
+    """What store.js filteredCases does per keystroke"""
+    q = query.lower()
+    out = []
+    for c in cases:
+        if subs and c["subspecialty"] not in subs:
+            continue
+        hay = " ".join([c["title"], c["boardPrompt"], c["expectedAnswer"], " ".join(c["tags"]),
+                        c["subspecialty"]]).lower()
+        if q in hay:
+            out.append(c)
+    return out
+
+
+def lat(fn, n):
+    xs = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        xs.append((time.perf_counter() - t0) * 1e3)
+    xs.sort()
+    return statistics.median(xs), xs[min(len(xs) - 1, int(len(xs) * 0.95))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=200, help="runs per query shape")
+    ap.add_argument("--changed", type=int, default=100, help="cases edited before the reload sync")
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    from case_search import SearchIndex
+
+    cases = synth_cases(args.cases, rng)
+    idx = SearchIndex()
+    t0 = time.perf_counter()
+    idx.rebuild(cases)
+    build = time.perf_counter() - t0
+    tracemalloc.start()  # separate pass: tracing slows the build ~10x
+    SearchIndex().rebuild(cases[:len(cases) // 10])
+    mem = tracemalloc.get_traced_memory()[1] / 1e6 * 10
+    tracemalloc.stop()
+    snap = idx.snapshot()
+    print(f"{args.cases} cases: build {build:.2f} s, {snap['terms']} terms, {snap['postings']} postings, "
+          f"~{mem:.0f} MB peak (tracemalloc on a 10% build, x10)")
+
+    shapes = [
+        ("common word", "contrast", None),
+        ("two words", "ring enhancing", None),
+        ("three words", "wall thickening stranding", None),
+        ("as-you-type prefix", "pneumoth", None),
+        ("rare term", "term15000", None),
+        ("word + sub filter", "fracture", ["Musculoskeletal Radiology"]),
+        ("browse (empty q)", "", None),
+    ]
+    print(f"\n  {'query':22s} {'hits':>7s} {'index p50':>10s} {'p95':>7s}   {'scan p50':>9s}")
+    runs = max(3, args.queries // 20)
+    for name, q, subs in shapes:
+        res = idx.search(q, subs)
+        p50, p95 = lat(lambda: idx.search(q, subs), args.queries)
+        s50, _ = lat(lambda: scan(cases, q, subs), runs)
+        print(f"  {name:22s} {res['total']:7d} {p50:8.2f} ms {p95:5.2f} ms   {s50:7.1f} ms")
+
+    print()
+    new = synth_cases(1, random.Random(99))[0]
+    new["id"] = "new-000001"
+    t0 = time.perf_counter(); idx.put(new); t_new = time.perf_counter() - t0
+    changed = dict(cases[10], title="Edited title pneumothorax", expectedAnswer=cases[11]["expectedAnswer"])
+    t0 = time.perf_counter(); idx.put(changed); t_chg = time.perf_counter() - t0
+    t0 = time.perf_counter(); idx.set_deleted(cases[12]["id"], True); t_del = time.perf_counter() - t0
+    t0 = time.perf_counter(); idx.remove(cases[13]["id"]); t_rm = time.perf_counter() - t0
+    print(f"  put new {t_new * 1e3:.2f} ms, put changed {t_chg * 1e3:.2f} ms, "
+          f"soft delete {t_del * 1e3:.3f} ms, remove {t_rm * 1e3:.2f} ms")
+    reloaded = [dict(c) for c in cases]  # a reload parses fresh dicts/strings
+    for c in rng.sample(reloaded, args.changed):
+        c["title"] = c["title"] + " revised"
+    t0 = time.perf_counter(); idx.sync(reloaded); t_sync = time.perf_counter() - t0
+    t0 = time.perf_counter(); SearchIndex().rebuild(reloaded); t_full = time.perf_counter() - t0
+    print(f"  sync after reload ({args.changed} changed) {t_sync:.2f} s vs full rebuild {t_full:.2f} s")
+
+    # In-process HTTP
+    root = tempfile.mkdtemp(prefix="bench-search-")
+    path = os.path.join(root, "cases.json")
+    with open(path, "w") as f:
+        json.dump(cases, f)
+    os.environ.update(CASES_JSON=path, AUTH_MODE="off", REQUEST_LOG_SAMPLE="0",
+                      REVOCATIONS_FILE=os.path.join(root, "revocations.json"))
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    import httpx
+    t0 = time.perf_counter()
+    backend._catalog.refresh(force=True)
+    load = time.perf_counter() - t0
+    queries = ["contrast", "ring enhancing", "pneumoth", "wall thick", "fracture", "term12", "lymph node"]
+
+    async def drive():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            xs = []
+            for i in range(args.requests):
+                t = time.perf_counter()
+                r = await client.get("/api/cases/search", params={"q": queries[i % len(queries)]})
+                assert r.status_code == 200, r.text
+                xs.append((time.perf_counter() - t) * 1e3)
+            return xs
+    xs = sorted(asyncio.run(drive()))
+    print(f"\n  catalog load + index build in the app {load:.2f} s")
+    print(f"  GET /api/cases/search x{args.requests}: p50 {statistics.median(xs):.2f} ms, "
+          f"p95 {xs[int(len(xs) * 0.95)]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Microbenchmark: signing a 50-asset case with and without the URL cache.
+
+"boto3" signs with a real boto3 S3 client using dummy credentials (presigning
+is local computation, no network); "local" uses scripts/local_s3.py.
+
+    python scripts/bench_signer.py --assets 50 --iters 200
+"""
+import argparse, copy, os, sys, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+
+from s3_signer import UrlSigner
+from local_s3 import LocalS3
+
+BUCKET = "cm-boards-cases"
+
+
+def synth_case(n_assets: int):
+    base = f"https://{BUCKET}.s3.amazonaws.com/cases/bench-001"
+    n_img = n_assets * 3 // 5
+    n_vid = (n_assets - n_img) // 2
+    return {
+        "id": "bench-001",
+        "images": [f"{base}/image-{i}.png?v=4" for i in range(n_img)],
+        "media": [{"type": "video", "src": f"{base}/video-{i}.mp4", "poster": f"{base}/poster-{i}.png"}
+                  for i in range(n_vid)],
+        "references": [f"https://{BUCKET}.s3.amazonaws.com/references/bench-001/ref-{i}.pdf"
+                       for i in range(n_assets - n_img - 2 * n_vid)],
+    }
+
+
+def old_sign_case(client, case):
+    """The per-request signing loop the signer replaced."""
+    def sign(url):
+        if not url or BUCKET not in url:
+            return url
+        key = url.split(f"{BUCKET}.s3.amazonaws.com/")[-1].split("?")[0]
+        return client.generate_presigned_url("get_object", Params={"Bucket": BUCKET, "Key": key}, ExpiresIn=3600)
+    case["images"] = [sign(u) for u in case["images"]]
+    for m in case["media"]:
+        m["src"] = sign(m["src"])
+        m["poster"] = sign(m["poster"])
+    case["references"] = [sign(r) for r in case["references"]]
+    return case
+
+
+def bench(fn, iters):
+    fn()  # warm
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) / iters
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--assets", type=int, default=50)
+    ap.add_argument("--iters", type=int, default=200)
+    args = ap.parse_args()
+    case = synth_case(args.assets)
+
+    clients = {"local": LocalS3(os.path.join("/tmp", "bench-local-s3"))}
+    try:
+        import boto3
+        from botocore.config import Config
+        clients["boto3"] = boto3.client("s3", region_name="us-east-1", aws_access_key_id="AKIABENCH",
+                                        aws_secret_access_key="bench", config=Config(signature_version="s3v4"))
+    except ImportError:
+        pass
+
+    for name, client in clients.items():
+        uncached = bench(lambda: old_sign_case(client, copy.deepcopy(case)), args.iters)
+        signer = UrlSigner(client, BUCKET)
+        cached = bench(lambda: signer.sign_case(copy.deepcopy(case)), args.iters)
+        copy_only = bench(lambda: copy.deepcopy(case), args.iters)
+        print(f"{name:6s} {args.assets} assets: uncached {uncached * 1e3:7.3f} ms   cached {cached * 1e3:7.3f} ms"
+              f"   ({uncached / cached:5.1f}x, deepcopy alone {copy_only * 1e3:.3f} ms)   stats {signer.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Throughput of transcript-to-answer similarity scoring.
+
+Fits the n-gram IDF on --cases synthetic cases, then scores transcripts one at
+a time (p50/p95 per transcript) and as one vectorized batch spread over
+--batch-cases cases, checking that both paths agree, and finally posts
+/api/similarity/batch to the in-process app.
+
+    python scripts/bench_similarity.py --cases 5000 --batch 5000
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, json, os, random, statistics, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+
+from answer_similarity import SimilarityEngine
+from bench_grader import RUBRIC, synth_transcript
+from bench_search import synth_cases
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=5000)
+    ap.add_argument("--single", type=int, default=1000, help="transcripts scored one at a time")
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--batch-cases", type=int, default=200)
+    args = ap.parse_args()
+    rng = random.Random(7)
+
+    cases = synth_cases(args.cases, rng)
+    for c in cases:
+        c["rubric"] = rng.sample(RUBRIC, 5)
+    engine = SimilarityEngine()
+    t0 = time.perf_counter()
+    engine.fit(" ".join([c["expectedAnswer"]] + c["rubric"]) for c in cases)
+    print(f"IDF fit on {args.cases} cases: {(time.perf_counter() - t0) * 1e3:.0f} ms")
+
+    pool = cases[:args.batch_cases]
+    transcripts = [synth_transcript(rng) for _ in range(max(args.single, args.batch))]
+    t0 = time.perf_counter()
+    for c in pool:
+        engine.compile(c["id"], c["expectedAnswer"], c["rubric"])
+    print(f"compile {len(pool)} targets: {(time.perf_counter() - t0) / len(pool) * 1e6:.0f} us/case")
+
+    jobs = [(c["id"], c["expectedAnswer"], c["rubric"], t)
+            for c, t in zip((rng.choice(pool) for _ in transcripts), transcripts)]
+    xs = []
+    single = []
+    for job in jobs[:args.single]:
+        t0 = time.perf_counter()
+        single.append(engine.score(*job))
+        xs.append((time.perf_counter() - t0) * 1e6)
+    xs.sort()
+    print(f"single: p50 {statistics.median(xs):.0f} us, p95 {xs[int(len(xs) * 0.95)]:.0f} us per transcript")
+
+    batch = jobs[:args.batch]
+    engine.score_many(batch[:100])
+    t0 = time.perf_counter()
+    scored = engine.score_many(batch)
+    t = time.perf_counter() - t0
+    agree = scored[:args.single] == single[:len(scored)]
+    print(f"batch: {len(batch)} transcripts over {len(pool)} cases in {t * 1e3:.0f} ms, "
+          f"{t / len(batch) * 1e6:.0f} us/transcript, agrees with single={agree}")
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-similarity-"), "cases.json")
+    with open(path, "w") as f:
+        json.dump(cases, f)
+    os.environ.update(CASES_JSON=path, AUTH_MODE="off", REQUEST_LOG_SAMPLE="0")
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    import httpx
+
+    payload = {"items": [{"caseId": cid, "transcript": tr} for cid, _, _, tr in batch]}
+
+    async def post():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await client.post("/api/similarity/batch", json=payload)  # warm: fits the IDF, compiles targets
+            t0 = time.perf_counter()
+            r = await client.post("/api/similarity/batch", json=payload)
+            assert r.status_code == 200, r.text
+            return time.perf_counter() - t0
+
+    t = asyncio.run(post())
+    print(f"POST /api/similarity/batch ({len(batch)} items, {len(pool)} cases): {t * 1e3:8.1f} ms   "
+          f"{len(batch) / t:9.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Upload throughput and event-loop responsiveness during concurrent uploads.
+
+Posts --uploads concurrent video uploads of --mb MiB each to the in-process app,
+backed by scripts/local_s3.py with a per-request bandwidth cap (--link-mbps,
+like one TCP stream to S3), while a ticker coroutine measures how late the event
+loop wakes it up.  Two variants:
+
+  inline     the previous handler: s3_client.upload_fileobj called directly
+             in the async route (mounted here as /bench/upload-inline)
+  pipeline   /api/admin/upload-video: pooled thread, parallel multipart parts
+
+Stored objects are checked against the sha256 the pipeline reports.
+
+    python scripts/bench_uploads.py --uploads 4 --mb 48 --link-mbps 40
+
+Needs httpx in addition to backend/requirements.txt.
+"""
+import argparse, asyncio, hashlib, json, os, statistics, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+from local_s3 import LocalS3
+
+
+async def ticker(stop: asyncio.Event, lags: list, every: float = 0.01):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(every)
+        lags.append(time.perf_counter() - t0 - every)
+
+
+async def run(app, path, payloads):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        stop, lags = asyncio.Event(), []
+        tick = asyncio.create_task(ticker(stop, lags))
+
+        async def one(i, data):
+            r = await client.post(path, data={"case_id": f"bench-{i:03d}", "upload_id": f"bench-{i}"},
+                                  files={"file": (f"clip{i}.mp4", data, "video/mp4")})
+            assert r.status_code == 200, r.text
+            return r.json()
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(one(i, d) for i, d in enumerate(payloads)))
+        secs = time.perf_counter() - t0
+        stop.set()
+        await tick
+        return secs, lags, results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uploads", type=int, default=4)
+    ap.add_argument("--mb", type=int, default=48)
+    ap.add_argument("--link-mbps", type=float, default=40.0)
+    ap.add_argument("--part-mb", type=int, default=8)
+    ap.add_argument("--concurrency", type=int, default=4)
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-uploads-")
+    cases = os.path.join(root, "cases.json")
+    with open(cases, "w") as f:
+        json.dump([], f)
+    os.environ.update(CASES_JSON=cases, AUTH_MODE="off", S3_BUCKET="bench-bucket",
+                      UPLOAD_PART_MB=str(args.part_mb), UPLOAD_CONCURRENCY=str(args.concurrency))
+    os.environ.pop("MONGO_URI", None)
+    import app as backend
+    from fastapi import File, Form, UploadFile
+
+    s3 = LocalS3(os.path.join(root, "s3"), mb_per_sec=args.link_mbps)
+    backend.s3_client = backend.uploader.client = s3
+
+    @backend.app.post("/bench/upload-inline")
+    async def upload_inline(case_id: str = Form(...), file: UploadFile = File(...), upload_id: str = Form(None)):
+        s3_key = f"cases/{case_id}/inline-{upload_id}.mp4"
+        backend.s3_client.upload_fileobj(file.file, backend.S3_BUCKET, s3_key,
+                                         ExtraArgs={"ContentType": file.content_type})
+        return {"s3_key": s3_key}
+
+    payloads = [os.urandom(args.mb * 1024 * 1024) for _ in range(args.uploads)]
+    total_mb = args.uploads * args.mb * 1024 * 1024 / 1e6
+    print(f"{args.uploads} concurrent uploads x {args.mb} MiB, link {args.link_mbps:.0f} MB/s per request, "
+          f"parts {args.part_mb} MiB x {args.concurrency} in flight")
+    for name, path in (("inline", "/bench/upload-inline"), ("pipeline", "/api/admin/upload-video")):
+        secs, lags, results = asyncio.run(run(backend.app, path, payloads))
+        lag_ms = sorted(l * 1e3 for l in lags) or [0.0]
+        p99 = lag_ms[min(len(lag_ms) - 1, int(len(lag_ms) * 0.99))]
+        print(f"  {name:9s} {secs:7.2f} s  {total_mb / secs:7.1f} MB/s   loop lag median {statistics.median(lag_ms):7.1f} ms"
+              f"  p99 {p99:7.1f} ms  max {lag_ms[-1]:7.1f} ms  ({len(lags)} ticks)")
+        if name == "pipeline":
+            for data, res in zip(payloads, results):
+                with open(os.path.join(s3.root, "bench-bucket", res["s3_key"]), "rb") as f:
+                    stored = f.read()
+                assert hashlib.sha256(stored).hexdigest() == res["sha256"] == hashlib.sha256(data).hexdigest()
+            print(f"  sha256 verified for {len(results)} stored objects")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI chat-completions API.
+
+Answers POST /v1/chat/completions with canned content shaped like what each
+route expects (MCQ JSON, rubric JSON, or oral-boards feedback text) after a
+configurable delay, so LLM routes can be load-tested without network access.
+With ``"stream": true`` it sends chat.completion.chunk SSE frames: the first one
+after --ttft-ms, the rest spread evenly so the whole completion still takes
+--latency-ms.
+
+    python scripts/llm_stub_server.py --port 9100 --latency-ms 800
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub uvicorn backend.app:app
+
+Set --fail-rate to inject 503s and exercise the gateway's retries.
+"""
+import argparse, asyncio, json, os, random, time, uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "500"))
+JITTER_MS = float(os.getenv("STUB_JITTER_MS", "50"))
+FAIL_RATE = float(os.getenv("STUB_FAIL_RATE", "0"))
+TTFT_MS = float(os.getenv("STUB_TTFT_MS", "100"))
+
+MCQ_JSON = json.dumps({"questions": [{
+    "stem": "Which finding is most specific for acute appendicitis?",
+    "multi_select": False,
+    "choices": [
+        {"id": "a", "text": "Appendiceal diameter > 6 mm with wall thickening", "correct": True},
+        {"id": "b", "text": "Air in the cecum", "correct": False},
+        {"id": "c", "text": "Mesenteric lymph nodes", "correct": False},
+        {"id": "d", "text": "Free pelvic fluid in a female", "correct": False},
+    ],
+    "explanation": "A dilated, thick-walled appendix is the primary sign.",
+}]})
+
+RUBRIC_JSON = json.dumps({"rubric": [
+    "Identifies the study type and technique",
+    "Describes the key imaging findings systematically",
+    "Provides a differential diagnosis with at least 2-3 possibilities",
+    "States the most likely diagnosis with supporting evidence",
+    "Discusses appropriate management or next steps",
+]})
+
+FEEDBACK_TEXT = """1) **What was done well:**
+- Named the study and led with the diagnosis.
+
+2) **Specific gaps or incorrect statements:**
+- Did not address complications.
+
+3) **Rubric mapping:**
+- names study type: **Hit** - stated CT with contrast
+- mentions stranding: **Hit** - described fat stranding
+- addresses complications: **Miss** - not discussed
+
+4) **Coaching paragraph:**
+Lead with the diagnosis, then support it with the key findings and close with management."""
+
+
+def pick_content(messages):
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    if "multiple choice" in system:
+        return MCQ_JSON
+    if "rubric" in system:
+        return RUBRIC_JSON
+    return FEEDBACK_TEXT
+
+
+def usage(messages, content):
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def stream_chunks(body, content):
+    cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "stub")
+    # ~4 characters per token, like the real tokenizer on English text
+    pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+    gap = max(0.0, LATENCY_MS - TTFT_MS) / 1000 / max(1, len(pieces) - 1)
+
+    def frame(delta, finish=None):
+        return "data: " + json.dumps({
+            "id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }) + "\n\n"
+
+    async def gen():
+        await asyncio.sleep(TTFT_MS / 1000)
+        yield frame({"role": "assistant", "content": ""})
+        for i, p in enumerate(pieces):
+            if i:
+                await asyncio.sleep(gap)
+            yield frame({"content": p})
+        yield frame({}, "stop")
+        yield "data: [DONE]\n\n"
+    return gen()
+
+
+app = FastAPI(title="LLM stub")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        return JSONResponse({"error": {"message": "stub overloaded", "type": "server_error"}}, status_code=503)
+    messages = body.get("messages") or []
+    content = pick_content(messages)
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(body, content), media_type="text/event-stream")
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": usage(messages, content),
+    }
+
+
+def main():
+    global LATENCY_MS, JITTER_MS, FAIL_RATE, TTFT_MS
+    import uvicorn
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    ap.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    ap.add_argument("--fail-rate", type=float, default=FAIL_RATE)
+    ap.add_argument("--ttft-ms", type=float, default=TTFT_MS)
+    args = ap.parse_args()
+    LATENCY_MS, JITTER_MS, FAIL_RATE = args.latency_ms, args.jitter_ms, args.fail_rate
+    TTFT_MS = args.ttft_ms
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
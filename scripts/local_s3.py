@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Directory-backed stand-in for the boto3 S3 client (moto-style).
+
+Implements the subset of the client API the backend uses, storing objects as
+files under ``root/<bucket>/<key>``, so benchmarks and local runs need neither
+AWS credentials nor network.  Swap it in with::
+
+    import app; app.s3_client = LocalS3("/tmp/s3"); app.s3_signer.client = app.s3_client
+
+Presigned URLs are HMAC-signed fakes with the same shape as real ones.
+"""
+import hashlib, hmac, io, os, shutil, threading, time, uuid
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+
+class ClientError(Exception):
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class LocalS3:
+    def __init__(self, root: str, region: str = "us-east-1", sign_cost_us: float = 0.0, latency_ms: float = 0.0,
+                 mb_per_sec: float = 0.0):
+        self.root = root
+        self.region = region
+        # Optional artificial costs to mimic real signing / network round trips.
+        self.sign_cost_us = sign_cost_us
+        self.latency_ms = latency_ms
+        # Per-request bandwidth cap (0 = unlimited), like one TCP stream to S3.
+        self.mb_per_sec = mb_per_sec
+        self._uploads: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _transfer(self, nbytes: int):
+        if self.mb_per_sec:
+            time.sleep(nbytes / (self.mb_per_sec * 1e6))
+
+    def _path(self, bucket: str, key: str) -> str:
+        p = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not p.startswith(os.path.normpath(os.path.join(self.root, bucket)) + os.sep):
+            raise ClientError("InvalidKey", key)
+        return p
+
+    # ---- presign ---------------------------------------------------------
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any], ExpiresIn: int = 3600) -> str:
+        with self._lock:
+            self.calls["generate_presigned_url"] = self.calls.get("generate_presigned_url", 0) + 1
+        if self.sign_cost_us:
+            end = time.perf_counter() + self.sign_cost_us / 1e6
+            while time.perf_counter() < end:
+                pass
+        bucket, key = Params["Bucket"], Params["Key"]
+        expires = int(time.time()) + ExpiresIn
+        sig = hmac.new(b"local-s3", f"{ClientMethod}:{bucket}:{key}:{expires}".encode(), hashlib.sha256).hexdigest()
+        return (f"https://{bucket}.s3.amazonaws.com/{quote(key)}"
+                f"?X-Amz-Expires={ExpiresIn}&X-Amz-Date={expires}&X-Amz-Signature={sig}")
+
+    # ---- objects ---------------------------------------------------------
+    def put_object(self, Bucket: str, Key: str, Body=b"", **extra) -> Dict[str, Any]:
+        self._count("put_object")
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = Body.read() if hasattr(Body, "read") else Body
+        self._transfer(len(data))
+        with open(path, "wb") as f:
+            f.write(data)
+        return {"ETag": '"%s"' % hashlib.md5(data).hexdigest()}
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, ExtraArgs: Optional[Dict[str, Any]] = None, **kw):
+        self._count("upload_fileobj")
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            while True:
+                buf = Fileobj.read(1024 * 1024)
+                if not buf:
+                    break
+                self._transfer(len(buf))
+                f.write(buf)
+
+    def head_object(self, Bucket: str, Key: str, **kw) -> Dict[str, Any]:
+        self._count("head_object")
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ClientError("404", "Not Found")
+        st = os.stat(path)
+        return {"ContentLength": st.st_size, "LastModified": st.st_mtime,
+                "ETag": '"%x-%x"' % (st.st_mtime_ns, st.st_size)}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **kw) -> Dict[str, Any]:
+        self._count("get_object")
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ClientError("NoSuchKey", Key)
+        with open(path, "rb") as f:
+            data = f.read()
+        if Range and Range.startswith("bytes="):
+            start, _, end = Range[6:].partition("-")
+            data = data[int(start or 0):(int(end) + 1 if end else None)]
+        self._transfer(len(data))
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def download_fileobj(self, Bucket: str, Key: str, Fileobj, **kw):
+        body = self.get_object(Bucket=Bucket, Key=Key)["Body"]
+        shutil.copyfileobj(body, Fileobj, 1024 * 1024)
+
+    def delete_object(self, Bucket: str, Key: str, **kw):
+        self._count("delete_object")
+        try:
+            os.unlink(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    # ---- multipart -------------------------------------------------------
+    def create_multipart_upload(self, Bucket: str, Key: str, **extra) -> Dict[str, Any]:
+        self._count("create_multipart_upload")
+        uid = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[uid] = {"Bucket": Bucket, "Key": Key, "parts": {}}
+        return {"UploadId": uid, "Bucket": Bucket, "Key": Key}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body, **kw) -> Dict[str, Any]:
+        self._count("upload_part")
+        data = Body.read() if hasattr(Body, "read") else Body
+        self._transfer(len(data))
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        with self._lock:
+            self._uploads[UploadId]["parts"][PartNumber] = (etag, bytes(data))
+        return {"ETag": etag}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str,
+                                  MultipartUpload: Dict[str, Any], **kw) -> Dict[str, Any]:
+        self._count("complete_multipart_upload")
+        with self._lock:
+            up = self._uploads.pop(UploadId)
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            for p in MultipartUpload["Parts"]:
+                etag, data = up["parts"][p["PartNumber"]]
+                if etag != p["ETag"]:
+                    raise ClientError("InvalidPart", str(p["PartNumber"]))
+                f.write(data)
+        return {"Bucket": Bucket, "Key": Key}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kw):
+        self._count("abort_multipart_upload")
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
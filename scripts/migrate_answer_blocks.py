@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Backfill `answerBlocks` on existing cases.
+
+New and edited cases get their parsed Diagnosis/Key/Differential/Management
+blocks at write time; this fills in cases written before that (or parsed by an
+older ANSWER_BLOCKS_VERSION).  Uses the same environment as the API:
+
+    python scripts/migrate_answer_blocks.py [--dry-run]                 # cases.json
+    MONGO_URI=mongodb://... python scripts/migrate_answer_blocks.py     # Mongo
+"""
+import argparse, asyncio, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+
+def stale(app, case):
+    ab = case.get("answerBlocks") or {}
+    return ab.get("v") != app.ANSWER_BLOCKS_VERSION or ab.get("src") != app._answer_hash(case.get("expectedAnswer"))
+
+
+async def migrate_mongo(app, dry_run):
+    from pymongo import UpdateOne
+    ops, seen = [], 0
+    async for c in app.db.cases.find({}, {"_id": 1, "id": 1, "expectedAnswer": 1, "answerBlocks": 1}):
+        seen += 1
+        if stale(app, c):
+            ops.append(UpdateOne({"_id": c["_id"]}, {"$set": {"answerBlocks": app._answer_blocks(c.get("expectedAnswer"))}}))
+    if ops and not dry_run:
+        for i in range(0, len(ops), 1000):
+            await app.db.cases.bulk_write(ops[i:i + 1000], ordered=False)
+        await app._cases_changed()
+    return seen, len(ops)
+
+
+def migrate_file(app, dry_run):
+    items = app._catalog.items()
+    todo = [app._with_answer_blocks(dict(c)) for c in items if stale(app, c)]
+    if todo and not dry_run:
+        app._store.put_many(todo)
+        app._store.compact()
+    return len(items), len(todo)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true", help="only count cases that need blocks")
+    args = ap.parse_args()
+    import app
+    if app.USE_MONGO:
+        seen, n = asyncio.run(migrate_mongo(app, args.dry_run))
+    else:
+        seen, n = migrate_file(app, args.dry_run)
+    print(f"{seen} cases, {n} {'need' if args.dry_run else 'updated with'} answerBlocks")
+
+
+if __name__ == "__main__":
+    main()